@@ -0,0 +1,194 @@
+from collections import deque
+from logging import getLogger, DEBUG
+import os
+import time
+
+from mission import dispatch_packet, FrameDecoder
+from mission.capture import CaptureWriter
+from mission.metrics import Histogram
+from transmit import BITS_PER_BYTE, RateLimiter
+
+READ_SIZE = 4096  # most bytes taken per wake up
+
+
+class AsyncTransport(object):
+    """Receives and transmits on one asyncio event loop
+
+    The connection's file descriptor is watched with add_reader, so frames are decoded and dispatched on the loop as
+    soon as bytes arrive instead of after a read timeout. Packets are written without blocking. What the port can't
+    take right away is written from an add_writer callback once it can, and pacing waits are loop timers instead of
+    sleeps.
+    """
+    def __init__(self, connection, loop, baudrate=None, rx_buffer_size=64, frame_interval=0.0, capture=None,
+                 publisher=None):
+        """
+        :param connection: serial.Serial type object with a non-blocking fileno(), which pyserial opens on posix
+        :param loop: asyncio event loop to run on. Must support add_reader, which excludes the Windows proactor loop
+        :param int baudrate: line rate. Defaults to connection.baudrate. No pacing if neither is known
+        :param int rx_buffer_size: bytes the vehicle can buffer. None to only pace at the line rate
+        :param float frame_interval: minimum seconds between packets
+        :param str capture: append every raw frame to this capture file
+        :param publisher: shared_ring.RingWriter to publish every valid frame to
+        """
+        self.log = getLogger(self.__class__.__name__)
+
+        self.connection = connection
+        self._loop = loop
+        self._fd = connection.fileno()
+
+        self._decoder = FrameDecoder()
+        self._capture = capture
+        self._recorder = None
+        self._capture_timer = None
+        self._publisher = publisher
+        self._limiter = None
+
+        baudrate = baudrate or getattr(connection, 'baudrate', None)
+
+        if baudrate:
+            rate = baudrate / BITS_PER_BYTE
+            self._limiter = RateLimiter(rate, rx_buffer_size or rate, frame_interval)
+
+        self._outgoing = deque()
+        self._writing = b''  # rest of a packet the port only took part of
+        self._writer = False
+        self._timer = None
+
+        self.frames = 0
+        self.packets = 0
+        self.dispatch_latency = Histogram()  # seconds from the read that completed a frame returning to its dispatch
+
+    @property
+    def decoder(self):
+        return self._decoder
+
+    def start(self):
+        if self._capture is not None:
+            self._recorder = CaptureWriter(self._capture)
+            self._decoder.on_invalid = lambda buf, first, last: self._recorder.write(buf[first:last], False)
+            self.log.info('Recording frames to {}'.format(self._capture))
+            self._poll_capture()
+
+        self._loop.add_reader(self._fd, self._on_readable)
+        self.log.info('Starting')
+
+    def stop(self):
+        self._loop.remove_reader(self._fd)
+        self._loop.remove_writer(self._fd)
+        self._writer = False
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if self._capture_timer is not None:
+            self._capture_timer.cancel()
+            self._capture_timer = None
+
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+        latency = self.dispatch_latency.snapshot()
+        self.log.info('Stopping. {} frames received, {} packets sent, dispatch latency p50 {:.1f} us p99 {:.1f} us'
+                      .format(self.frames, self.packets, latency['p50'] * 1e6, latency['p99'] * 1e6))
+        self.log.info('Link stats {}'.format(self._decoder.stats()))
+
+    def _poll_capture(self):
+        """Flush frames the recorder buffered while the link is quiet"""
+        self._recorder.poll()
+        self._capture_timer = self._loop.call_later(self._recorder.flush_interval, self._poll_capture)
+
+    def _on_readable(self):
+        # the fd is readable, so one read() of the fd takes what's waiting. no in_waiting ioctl or select like
+        # serial.Serial.read
+        try:
+            chunk = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            self.log.critical("")  # Add some extra emphasis
+            self.log.critical("Device disconnected. Exiting ...")
+            self._loop.remove_reader(self._fd)
+            return
+
+        woke = time.monotonic()
+        discarded = self._decoder.bytes_discarded
+
+        for p in self._decoder.feed(chunk):
+            self.log.debug('Received packet {}'.format(p))
+
+            if self._recorder is not None:
+                self._recorder.write(p.raw)
+
+            self.dispatch_latency.record(time.monotonic() - woke)
+            dispatch_packet(p)
+            self.frames += 1
+
+            if self._publisher is not None:
+                self._publisher.publish(p.op_code, p.data)
+
+        if self._decoder.bytes_discarded != discarded:
+            self.log.warning('Discarded {} bytes'.format(self._decoder.bytes_discarded - discarded))
+
+    def send(self, packet):
+        """Queue a packet and write as much of the queue as the port and pacing allow. Called on the loop
+
+        :param packet: bytes type object or list of ints
+        """
+        data = bytes(packet)
+
+        if self.log.isEnabledFor(DEBUG):
+            self.log.debug('Sending {}'.format(list(data)))
+
+        self._outgoing.append(data)
+        self._flush()
+
+    def _on_timer(self):
+        self._timer = None
+        self._flush()
+
+    def _flush(self):
+        self._write_queued()
+
+        # only wait for the port to be writable while it holds up part of a packet
+        if self._writing and not self._writer:
+            self._loop.add_writer(self._fd, self._flush)
+            self._writer = True
+        elif not self._writing and self._writer:
+            self._loop.remove_writer(self._fd)
+            self._writer = False
+
+    def _write_queued(self):
+        """Write queued packets until the queue empties, pacing calls for a wait or the port takes only part of one"""
+        while True:
+            if not self._writing:
+                if not self._outgoing or self._timer is not None:
+                    return
+
+                if self._limiter is not None:
+                    delay = self._limiter.delay(len(self._outgoing[0]), time.monotonic())
+
+                    if delay > 0:
+                        self._timer = self._loop.call_later(delay, self._on_timer)
+                        return
+
+                    self._limiter.consume(len(self._outgoing[0]), time.monotonic())
+
+                self._writing = self._outgoing.popleft()
+                self.packets += 1
+
+            # os.write returns with what the port took. serial.Serial.write with a write_timeout of 0 retries EAGAIN
+            # until everything is written, spinning on the loop once the tty's buffer fills
+            try:
+                written = os.write(self._fd, self._writing)
+            except BlockingIOError:
+                written = 0  # port's buffer is full
+            except OSError:
+                self.log.warning('Failed to write to connection')
+                written = len(self._writing)
+
+            self._writing = self._writing[written:]
+
+            if self._writing:
+                return
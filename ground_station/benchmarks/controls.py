@@ -0,0 +1,100 @@
+"""Compare uplink tick latency and consistency of the seqlock Controls against the locked Array Controls
+
+A writer process stands in for heavy joystick input, setting all four axes to the same value as fast as it can.
+The uplink side calls get() like the Controls service does every tick, and counts frames whose axes differ, which
+mix two inputs.
+
+Run from the ground_station directory:
+    python -m benchmarks.controls [-n TICKS]
+"""
+from argparse import ArgumentParser
+from ctypes import c_uint8
+import multiprocessing
+import time
+
+from mission.controls import Controls
+from mission.metrics import Histogram
+from mission.opcodes import opcode_to_hex
+from mission.packet import generate_packet
+
+context = multiprocessing.get_context('fork')
+
+
+class LockedControls(object):
+    """Controls as they were before the seqlock. Every axis read and write takes the Array's lock"""
+    def __init__(self):
+        self.values = context.Array(c_uint8, (50, 50, 50, 0))
+
+    @property
+    def yaw(self):
+        return self.values[0]
+
+    @property
+    def pitch(self):
+        return self.values[1]
+
+    @property
+    def roll(self):
+        return self.values[2]
+
+    @property
+    def throttle(self):
+        return self.values[3]
+
+    def update(self, yaw, pitch, roll, throttle):
+        """One property write per axis, like the input thread did"""
+        for index, value in enumerate((yaw, pitch, roll, throttle)):
+            self.values[index] = value
+
+    def get(self, block=False):
+        controls = [self.yaw, self.pitch, self.roll, self.throttle]
+        return generate_packet(opcode_to_hex['controls'], controls)
+
+
+def write(controls, stop):
+    i = 0
+
+    while not stop.is_set():
+        value = i % 200
+        controls.update(value, value, value, value)
+        i += 1
+
+
+def run(controls, ticks):
+    controls.update(0, 0, 0, 0)
+    latency = Histogram()
+    torn = 0
+
+    stop = context.Event()
+    writer = context.Process(target=write, args=(controls, stop))
+    writer.start()
+
+    try:
+        for _ in range(ticks):
+            start = time.perf_counter()
+            frame = controls.get()
+            latency.record(time.perf_counter() - start)
+
+            if len(set(frame[3:7])) != 1:
+                torn += 1
+    finally:
+        stop.set()
+        writer.join()
+
+    return latency.snapshot(), torn
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--ticks', type=int, default=200000, help='Number of uplink ticks')
+    args = parser.parse_args()
+
+    for name, controls in (('locked', LockedControls()), ('seqlock', Controls())):
+        latency, torn = run(controls, args.ticks)
+        print('{name:>8}: get() p50 {p50:>6.2f} us p99 {p99:>7.2f} us max {max:>8.1f} us, {torn} of {ticks} frames torn'
+              .format(name=name, torn=torn, ticks=args.ticks,
+                      **{key: latency[key] * 1e6 for key in ('p50', 'p99', 'max')}))
+
+
+if __name__ == '__main__':
+    main()
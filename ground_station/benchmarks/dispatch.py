@@ -0,0 +1,61 @@
+"""Compare the op-code dispatch table against the old reflection based dispatch
+
+Both paths route to the same no-op handler so only the dispatch overhead is measured.
+
+Run from the ground_station directory:
+    python -m benchmarks.dispatch [-n PACKETS]
+"""
+from argparse import ArgumentParser
+import sys
+import timeit
+
+from mission import packet_handlers
+from mission.opcodes import opcode_to_hex, opcode_to_str
+from mission.packet import generate_packet, packet
+
+
+def reflective_dispatch(packet):
+    """dispatch_packet as it was before the dispatch table"""
+    log = packet_handlers.log
+
+    if packet.op_code not in opcode_to_str:
+        log.warning('Invalid op-code \'{}\''.format(packet.op_code))
+
+    else:
+        handler = 'handle_' + opcode_to_str[packet.op_code]
+
+        log.debug('Dispatching packet to {}'.format(handler))
+
+        if not hasattr(sys.modules[packet_handlers.__name__], handler):
+            log.warning('No handler for {}'.format(handler))
+
+        else:
+            getattr(sys.modules[packet_handlers.__name__], handler)(packet)
+
+
+def noop(packet):
+    pass
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--packets', type=int, default=1000000, help='Number of packets to dispatch')
+    args = parser.parse_args()
+
+    p = packet(generate_packet(opcode_to_hex['byte'], [1]))
+
+    original = packet_handlers.handle_byte
+    packet_handlers.handle_byte = noop
+    packet_handlers.register_handler(noop, 'byte')
+
+    try:
+        for name, dispatch in (('reflection', reflective_dispatch), ('table', packet_handlers.dispatch_packet)):
+            elapsed = timeit.timeit(lambda: dispatch(p), number=args.packets)
+            print('{name:>10}: {ns:>8.1f} ns/packet'.format(name=name, ns=elapsed / args.packets * 1e9))
+    finally:
+        packet_handlers.handle_byte = original
+        packet_handlers.register_handler(original, 'byte')
+
+
+if __name__ == '__main__':
+    main()
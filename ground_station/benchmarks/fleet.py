@@ -0,0 +1,80 @@
+"""Measure how receive throughput scales with the number of links
+
+Every link is a Receiver in its own process, pinned to its own core like fleet.run_fleet does, decoding an
+in-memory telemetry stream.
+
+Run from the ground_station directory:
+    python -m benchmarks.fleet [-n FRAMES] [-l LINKS ...]
+"""
+from argparse import ArgumentParser
+import logging
+import multiprocessing
+import os
+import time
+
+from fleet import _pin
+from receiver import Receiver
+
+from .receiver import StreamConnection, telemetry_stream
+
+context = multiprocessing.get_context('fork')
+
+
+def receive(stream, cpu, ready, go, frames):
+    _pin(cpu)
+    connection = StreamConnection(stream)
+    receiver = Receiver(connection, lambda: connection.exhausted)
+
+    ready.release()
+    go.wait()
+    receiver.run()
+    frames.value = receiver.frames
+
+
+def run(links, stream):
+    """Aggregate frames per second of links receiving the same stream at once"""
+    ready = context.Semaphore(0)
+    go = context.Event()
+    counts = [context.Value('q', 0) for _ in range(links)]
+    processes = [context.Process(target=receive, args=(stream, cpu, ready, go, counts[cpu])) for cpu in range(links)]
+
+    for process in processes:
+        process.start()
+
+    for _ in processes:
+        ready.acquire()
+
+    start = time.perf_counter()
+    go.set()
+
+    for process in processes:
+        process.join()
+
+    elapsed = time.perf_counter() - start
+
+    return sum(count.value for count in counts) / elapsed
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--frames', type=int, default=50000, help='Frames per link')
+    parser.add_argument('-l', '--links', type=int, nargs='+', default=None,
+                        help='Numbers of links to run. Defaults to 1, 2, 4, ... up to the number of cores')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    links = args.links or [2 ** i for i in range(os.cpu_count().bit_length()) if 2 ** i <= os.cpu_count()]
+    stream = telemetry_stream(args.frames)
+    single = None
+
+    for count in links:
+        rate = run(count, stream)
+        single = single or rate / count
+
+        print('{count:>3} links: {rate:>10.0f} frames/s, {efficiency:>4.0%} of a single link\'s rate per link'
+              .format(count=count, rate=rate, efficiency=rate / count / single))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Compare allocations and throughput of the compact Packet against the list backed Packet it replaced
+
+Run from the ground_station directory:
+    python -m benchmarks.packet [-n PACKETS]
+"""
+from argparse import ArgumentParser
+import time
+import tracemalloc
+
+from mission.opcodes import opcode_to_hex
+from mission.packet import generate_packet, Packet
+
+
+class ListPacket(object):
+    """Packet as it was before __slots__ and offsets into the receive buffer"""
+    def __init__(self, header, op_code, data_size, data, checksum, raw):
+        self.header = header
+        self.op_code = op_code
+        self.data_size = data_size
+        self.data = data
+        self.checksum = checksum
+        self.raw = raw
+
+
+def list_packet(stream, start, stop):
+    data = list(stream[start:stop])
+    return ListPacket(data[0], data[2], data[1] - 1, data[3:-1], data[-1], data)
+
+
+def compact_packet(stream, start, stop):
+    return Packet(stream, start, stop)
+
+
+def build(frames, stream, factory):
+    """Build a packet per frame and touch the fields a handler would"""
+    packets = []
+
+    for start, stop in frames:
+        p = factory(stream, start, stop)
+        p.op_code
+        p.data[0]
+        packets.append(p)
+
+    return packets
+
+
+def measure(frames, stream, factory):
+    start = time.perf_counter()
+    build(frames, stream, factory)
+    elapsed = time.perf_counter() - start
+
+    # keep every packet alive so the snapshot counts what each one holds on to
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    packets = build(frames, stream, factory)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+
+    return len(packets) / elapsed, blocks / len(packets), size / len(packets)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--packets', type=int, default=100000, help='Number of packets to build')
+    args = parser.parse_args()
+
+    stream = bytearray()
+    frames = []
+
+    for i in range(args.packets):
+        frame = bytes(generate_packet(opcode_to_hex['register'], [i & 0xff, 0, 1, 0]))
+        frames.append((len(stream), len(stream) + len(frame)))
+        stream += frame
+
+    stream = bytes(stream)
+
+    for name, source, factory in (('list', stream, list_packet), ('compact', stream, compact_packet)):
+        rate, blocks, size = measure(frames, source, factory)
+        print('{name:>8}: {rate:>10.0f} packets/s {blocks:>5.1f} blocks/packet {size:>6.1f} bytes/packet'
+              .format(**locals()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compare the buffered frame decoder against the byte-at-a-time receive path
+
+Run from the ground_station directory:
+    python -m benchmarks.receiver [-n FRAMES]
+"""
+from argparse import ArgumentParser
+import time
+
+from mission.opcodes import opcode_to_hex
+from mission.packet import generate_packet
+from receiver import Receiver
+
+
+class StreamConnection(object):
+    """In-memory connection that hands out a fixed byte stream like a serial port would"""
+    def __init__(self, stream):
+        self._stream = bytes(stream)
+        self._pos = 0
+        self.timeout = 0
+
+    @property
+    def in_waiting(self):
+        return len(self._stream) - self._pos
+
+    @property
+    def exhausted(self):
+        return self._pos >= len(self._stream)
+
+    def read(self, size=1):
+        data = self._stream[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    def write(self, data):
+        return len(data)
+
+
+def telemetry_stream(frames):
+    """Stream of word telemetry frames"""
+    stream = bytearray()
+
+    for i in range(frames):
+        stream += bytes(generate_packet(opcode_to_hex['word'], [i & 0xff, (i >> 8) & 0x3f]))
+
+    return stream
+
+
+def run(stream, buffered):
+    connection = StreamConnection(stream)
+    receiver = Receiver(connection, lambda: connection.exhausted, buffered=buffered)
+
+    start = time.perf_counter()
+    receiver.run()
+    elapsed = time.perf_counter() - start
+
+    return receiver.frames, elapsed, receiver.cpu_per_frame()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--frames', type=int, default=100000, help='Number of frames to decode')
+    args = parser.parse_args()
+
+    stream = telemetry_stream(args.frames)
+
+    for name, buffered in (('byte-at-a-time', False), ('buffered', True)):
+        frames, elapsed, cpu = run(stream, buffered)
+        print('{name:>16}: {frames} frames {rate:>10.0f} frames/s {cpu:>8.2f} us cpu/frame'
+              .format(name=name, frames=frames, rate=frames / elapsed, cpu=cpu * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""Benchmark every stage of the packet pipeline and compare runs
+
+Streams are synthetic: frames of a weighted op-code mix, a fraction of them corrupted by one flipped bit. Op-codes
+with a payload schema get payloads of their schema's size, the rest get random text of a size in the given range.
+
+Run from the ground_station directory:
+    python -m benchmarks.suite run [-o RESULTS] [-n FRAMES] [--mix word=4,string=1] [--corruption 0.01]
+    python -m benchmarks.suite compare BASELINE RESULTS [--threshold 0.1]
+
+compare exits with status 1 if any benchmark got slower by more than the threshold.
+"""
+from argparse import ArgumentParser
+from datetime import datetime
+import json
+import logging
+import platform
+import random
+import sys
+import time
+
+from mission.checksum import get_checksum
+from mission.codecs import get_codec
+from mission.controls import Controls
+from mission.encoder import command, FrameTemplate
+from mission.framing import FrameDecoder
+from mission.opcodes import opcode_to_hex
+from mission.packet import generate_packet, MAX_PACKET_DATA_SIZE, packet
+from mission.packet_handlers import dispatch_packet
+from receiver import Receiver
+
+from .receiver import StreamConnection
+
+DEFAULT_MIX = 'word=4,register=2,motor_values=2,pid_outputs=2,byte=1,string=1'
+
+TEXT = b'abcdefghijklmnopqrstuvwxyz0123456789 '
+
+# run settings that change what is measured. compare warns when two runs differ in them
+STREAM_SETTINGS = ('frames', 'mix', 'corruption', 'payload_sizes', 'seed')
+
+CHUNK_SIZE = 256  # bytes per read when feeding the frame decoder on its own
+
+
+def parse_mix(mix):
+    """Parse 'name=weight,...' into {op-code: weight}"""
+    weights = dict()
+
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        weights[opcode_to_hex[name.strip()]] = float(weight or 1)
+
+    return weights
+
+
+def payload(op_code, sizes, rng):
+    codec = get_codec(op_code)
+
+    if codec is not None:
+        return [rng.randrange(256) for _ in range(codec.size)]
+
+    size = min(rng.randint(*sizes), MAX_PACKET_DATA_SIZE)
+    return [rng.choice(TEXT) for _ in range(size)]
+
+
+def synthetic_frames(frames, mix, sizes=(4, 32), seed=0):
+    """Valid frames as lists of ints
+
+    :param int frames: number of frames
+    :param dict mix: {op-code: weight}
+    :param tuple sizes: (smallest, largest) payload size of op-codes without a schema
+    :param seed: random seed, so runs with the same arguments benchmark the same stream
+    """
+    rng = random.Random(seed)
+    op_codes = rng.choices(list(mix), weights=list(mix.values()), k=frames)
+
+    return [generate_packet(op_code, payload(op_code, sizes, rng)) for op_code in op_codes]
+
+
+def synthetic_stream(frames, corruption=0.0, seed=0):
+    """Byte stream of frames with a fraction of them corrupted by flipping one bit"""
+    rng = random.Random(seed)
+    stream = bytearray()
+
+    for frame in frames:
+        frame = bytearray(frame)
+
+        if rng.random() < corruption:
+            frame[rng.randrange(len(frame))] ^= 1 << rng.randrange(8)
+
+        stream += frame
+
+    return bytes(stream)
+
+
+def best(function, items, repeat):
+    """Fastest of repeat calls of function, in seconds"""
+    times = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return {
+        'items': items,
+        'seconds': min(times),
+        'ns_per_item': min(times) / items * 1e9 if items else 0.0,
+        'per_second': items / min(times) if min(times) else 0.0,
+    }
+
+
+def run_receiver(stream, buffered):
+    connection = StreamConnection(stream)
+    receiver = Receiver(connection, lambda: connection.exhausted, buffered=buffered)
+    receiver.run()
+
+    return receiver.frames
+
+
+def run_decoder(stream):
+    decoder = FrameDecoder()
+
+    for i in range(0, len(stream), CHUNK_SIZE):
+        decoder.feed(stream[i:i + CHUNK_SIZE])
+
+    return decoder.frames
+
+
+def benchmarks(frames, stream, repeat, bytewise=True):
+    """Results of every benchmark as {name: result}"""
+    raw = [bytes(frame) for frame in frames]
+    unchecked = [frame[:-1] for frame in raw]
+    packets = [packet(frame) for frame in raw]
+    requests = [(frame[2], frame[3:-1]) for frame in frames]
+    controls = Controls()
+    template = FrameTemplate('controls')
+    axes = [(i & 0xff, (i >> 8) & 0xff, 50, 200) for i in range(len(raw))]
+
+    received = run_receiver(stream, True)
+
+    results = {
+        'receiver_buffered': best(lambda: run_receiver(stream, True), received, repeat),
+        'frame_decoder': best(lambda: run_decoder(stream), received, repeat),
+        'get_checksum': best(lambda: [get_checksum(frame) for frame in unchecked], len(raw), repeat),
+        'packet': best(lambda: [packet(frame) for frame in raw], len(raw), repeat),
+        'dispatch_packet': best(lambda: [dispatch_packet(p) for p in packets], len(packets), repeat),
+        'generate_packet': best(lambda: [generate_packet(op_code, data) for op_code, data in requests],
+                                len(requests), repeat),
+        'controls_get': best(lambda: [controls.get() for _ in range(len(raw))], len(raw), repeat),
+        'frame_template': best(lambda: [template.encode(*values) for values in axes], len(axes), repeat),
+        'command_frame': best(lambda: [command('flight_mode') for _ in range(len(raw))], len(raw), repeat),
+    }
+
+    if bytewise:
+        results['receiver_bytewise'] = best(lambda: run_receiver(stream, False), run_receiver(stream, False), repeat)
+
+    return results
+
+
+def run(args):
+    mix = parse_mix(args.mix)
+    frames = synthetic_frames(args.frames, mix, (args.min_payload, args.max_payload), args.seed)
+    stream = synthetic_stream(frames, args.corruption, args.seed)
+
+    # handlers log every string and every corrupt frame. benchmark the pipeline, not the log handlers
+    logging.disable(logging.CRITICAL)
+
+    try:
+        results = benchmarks(frames, stream, args.repeat, bytewise=not args.no_bytewise)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    report = {
+        'meta': {
+            'time': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'frames': args.frames,
+            'mix': args.mix,
+            'corruption': args.corruption,
+            'payload_sizes': [args.min_payload, args.max_payload],
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+    for name, result in sorted(results.items()):
+        print('{name:>18}: {per_second:>12.0f} /s {ns_per_item:>10.1f} ns'.format(name=name, **result))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+        print('Results written to {}'.format(args.output))
+
+
+def compare(args):
+    """Print the change of every benchmark in both runs. Return 1 if any regressed"""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    with open(args.results) as f:
+        results = json.load(f)
+
+    for key in STREAM_SETTINGS:
+        if baseline['meta'].get(key) != results['meta'].get(key):
+            print('Runs differ in {}: {} and {}'.format(key, baseline['meta'].get(key), results['meta'].get(key)))
+
+    baseline, results = baseline['results'], results['results']
+    regressions = []
+
+    for name in sorted(set(baseline) & set(results)):
+        before = baseline[name]['ns_per_item']
+        after = results[name]['ns_per_item']
+        change = after / before - 1 if before else 0.0
+        regressed = change > args.threshold
+
+        if regressed:
+            regressions.append(name)
+
+        print('{name:>18}: {before:>10.1f} ns -> {after:>10.1f} ns {change:>+7.1%}{flag}'
+              .format(name=name, before=before, after=after, change=change, flag='  REGRESSION' if regressed else ''))
+
+    for name in sorted(set(baseline) ^ set(results)):
+        print('{name:>18}: only in {run}'.format(name=name, run=args.baseline if name in baseline else args.results))
+
+    return 1 if regressions else 0
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    run_parser = commands.add_parser('run', help='Run the benchmarks')
+    run_parser.add_argument('-o', '--output', default=None, help='JSON file to write results to')
+    run_parser.add_argument('-n', '--frames', type=int, default=20000, help='Frames in the stream')
+    run_parser.add_argument('-m', '--mix', default=DEFAULT_MIX,
+                            help='Op-code weights as name=weight,... (Default = {})'.format(DEFAULT_MIX))
+    run_parser.add_argument('-c', '--corruption', type=float, default=0.01, help='Fraction of frames corrupted')
+    run_parser.add_argument('--min-payload', type=int, default=4, help='Smallest payload of op-codes without a schema')
+    run_parser.add_argument('--max-payload', type=int, default=32, help='Largest payload of op-codes without a schema')
+    run_parser.add_argument('-r', '--repeat', type=int, default=5, help='Runs per benchmark. The fastest is kept')
+    run_parser.add_argument('--seed', type=int, default=0, help='Random seed of the stream')
+    run_parser.add_argument('--no-bytewise', action='store_true', help='Skip the byte-at-a-time receiver')
+    run_parser.set_defaults(function=run)
+
+    compare_parser = commands.add_parser('compare', help='Compare two result files')
+    compare_parser.add_argument('baseline', help='Results to compare against')
+    compare_parser.add_argument('results', help='New results')
+    compare_parser.add_argument('-t', '--threshold', type=float, default=0.1,
+                                help='Slowdown flagged as a regression (Default = 0.1, 10%%)')
+    compare_parser.set_defaults(function=compare)
+
+    args = parser.parse_args()
+
+    return args.function(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Compare frame latency of the process model against the asyncio event loop
+
+A pseudo terminal stands in for the serial port. A sender thread writes numbered size32 frames to it at a fixed
+rate while controls are uplinked at the uplink frequency, and each frame's latency from its write to its dispatch is
+recorded. The process model is the Receiver in one process and the uplink services in another, sharing the port
+with a 0.1 s read timeout. The event loop is AsyncTransport and AsyncServiceManager on one loop.
+
+Run from the ground_station directory:
+    python -m benchmarks.transport [-n FRAMES] [-r RATE] [-u UPLINK_FREQUENCY]
+"""
+from argparse import ArgumentParser
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+import serial
+
+from async_transport import AsyncTransport
+from mission import packet_handlers
+from mission.controls import Controls
+from mission.metrics import Histogram
+from mission.opcodes import opcode_to_hex
+from mission.packet import generate_packet
+from receiver import Receiver
+from service import AsyncServiceManager, Service, ServiceManager
+from transmit import Transmitter
+
+DRAIN_TIME = 0.5  # seconds the receivers get to dispatch the last frames
+
+context = multiprocessing.get_context('fork')
+
+
+class Link(object):
+    """Pseudo terminal with the device end driven by a sender thread"""
+    def __init__(self, frames, rate):
+        self.frames = frames
+        self.rate = rate
+        self.sent = context.RawArray('d', frames)  # monotonic time each frame was written
+        self.latency = context.RawArray('d', frames)  # seconds from write to dispatch, 0 if never dispatched
+
+        self._device, port = os.openpty()
+        self.port = os.ttyname(port)
+        self._port = port  # kept open so the pseudo terminal outlives the serial connections
+
+        os.set_blocking(self._device, False)
+
+    def connect(self):
+        return serial.Serial(self.port, baudrate=38400, timeout=0.1)
+
+    def on_frame(self, packet):
+        number = int.from_bytes(packet.data, 'little')
+        self.latency[number] = time.monotonic() - self.sent[number]
+
+    def send(self):
+        start = time.monotonic()
+
+        for i in range(self.frames):
+            delay = start + i / self.rate - time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            frame = bytes(generate_packet(opcode_to_hex['size32'], list(i.to_bytes(4, 'little'))))
+            self.sent[i] = time.monotonic()
+            os.write(self._device, frame)
+            self.drain()
+
+    def drain(self):
+        """Throw away what the ground station uplinked"""
+        try:
+            while os.read(self._device, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def histogram(self):
+        histogram = Histogram()
+
+        for latency in self.latency:
+            if latency:
+                histogram.record(latency)
+
+        return histogram
+
+    def close(self):
+        os.close(self._device)
+        os.close(self._port)
+
+
+def uplink(connection, frequency, stop):
+    """Commanding process: uplink controls on the scheduler thread until stop is set"""
+    transmitter = Transmitter(connection)
+    services = ServiceManager([Service('Controls', transmitter.send, Controls(), frequency)], summary_interval=None)
+    services.start_all()
+    stop.wait()
+    services.shutdown(1)
+
+
+def receive(connection, stop, results):
+    receiver = Receiver(connection, stop.is_set)
+    receiver.run()
+    results.send(receiver.dispatch_latency.snapshot())
+
+
+def run_processes(link, frequency):
+    stop = context.Event()
+    results, child_results = context.Pipe(duplex=False)
+    connection = link.connect()
+
+    processes = [context.Process(target=receive, args=(connection, stop, child_results)),
+                 context.Process(target=uplink, args=(connection, frequency, stop))]
+
+    for process in processes:
+        process.start()
+
+    sender = threading.Thread(target=link.send)
+    sender.start()
+    sender.join()
+    time.sleep(DRAIN_TIME)
+    link.drain()
+    stop.set()
+
+    wake = results.recv()
+
+    for process in processes:
+        process.join(5)
+
+    connection.close()
+    return wake
+
+
+def run_event_loop(link, frequency):
+    loop = asyncio.new_event_loop()
+    connection = link.connect()
+    transport = AsyncTransport(connection, loop)
+    services = AsyncServiceManager([Service('Controls', transport.send, Controls(), frequency)], loop,
+                                   summary_interval=None)
+
+    sender = threading.Thread(target=link.send)
+
+    async def run():
+        transport.start()
+        services.start_all()
+        sender.start()
+
+        while sender.is_alive():
+            await asyncio.sleep(0.1)
+
+        await asyncio.sleep(DRAIN_TIME)
+        link.drain()
+
+        services.shutdown()
+        transport.stop()
+
+    loop.run_until_complete(run())
+    loop.close()
+    connection.close()
+
+    return transport.dispatch_latency.snapshot()
+
+
+def report(name, link, wake):
+    latency = link.histogram().snapshot()
+
+    print('{name:>12}: {count}/{frames} frames, write to dispatch p50 {p50:>7.1f} us p99 {p99:>8.1f} us '
+          'max {max:>8.1f} us, wake to dispatch p50 {wake_p50:>5.1f} us p99 {wake_p99:>6.1f} us'
+          .format(name=name, frames=link.frames, wake_p50=wake['p50'] * 1e6, wake_p99=wake['p99'] * 1e6,
+                  **{key: value * 1e6 if key != 'count' else value for key, value in latency.items()}))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-n', '--frames', type=int, default=2000, help='Number of frames to send')
+    parser.add_argument('-r', '--rate', type=float, default=200.0, help='Frames per second')
+    parser.add_argument('-u', '--uplink-frequency', type=float, default=50.0, help='Controls uplink frequency')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    for name, run in (('processes', run_processes), ('event loop', run_event_loop)):
+        link = Link(args.frames, args.rate)
+        packet_handlers.register_handler(link.on_frame, 'size32')
+
+        try:
+            report(name, link, run(link, args.uplink_frequency))
+        finally:
+            packet_handlers.register_handler(packet_handlers.handle_size32, 'size32')
+            link.close()
+
+
+if __name__ == '__main__':
+    main()
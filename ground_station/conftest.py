@@ -0,0 +1,5 @@
+# the top-level modules import each other and mission by name, as when run from this directory
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
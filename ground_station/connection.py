@@ -0,0 +1,328 @@
+from errno import EPERM, EACCES
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+import time
+
+import serial
+from serial.tools import list_ports
+
+from mission.metrics import Histogram
+
+DEFAULT_PORTS = ['/dev/ttyACM0', '/dev/ttyACM1', '/dev/ttyACM2', '/dev/ttyUSB0']
+
+SERIAL_SETTINGS = {
+    'baudrate': 38400,
+    'bytesize': serial.EIGHTBITS,
+    'parity': serial.PARITY_NONE,
+    'stopbits': serial.STOPBITS_ONE,
+    'timeout': 2,
+}
+
+LAST_PORT_FILE = Path.home() / '.ground_station' / 'last_port'
+
+
+class ConnectionManager(object):
+    """Finds and opens the device's serial port
+
+    The port that last worked is tried first, so a device that didn't move connects right away. Then the candidate
+    ports are probed one at a time, stopping at the first that opens: the configured ports and any USB serial port
+    plugged in since. Opening a port resets most Arduinos, so ports are never opened just to be closed again, and
+    usb_ids keeps discovery away from other USB serial devices. Passes that find nothing are spaced by a backoff that
+    doubles up to max_backoff, so waiting for a device costs no CPU.
+    """
+    def __init__(self, ports=None, last_port_file=LAST_PORT_FILE, backoff=0.1, max_backoff=2.0, settings=None,
+                 discover=True, usb_ids=None):
+        """
+        :param list ports: ports to try. Defaults to DEFAULT_PORTS
+        :param last_port_file: file the last port that worked is kept in. None to not remember it
+        :param float backoff: seconds between the first passes over the ports
+        :param float max_backoff: most seconds between passes
+        :param dict settings: serial.Serial keyword arguments. Defaults to SERIAL_SETTINGS
+        :param bool discover: also try USB serial ports that aren't in ports
+        :param list usb_ids: (vendor id, product id) of the USB serial devices discovery may try, product id None for
+            any of the vendor's. None to try every USB serial device
+        """
+        self.log = getLogger(self.__class__.__name__)
+
+        self.ports = list(DEFAULT_PORTS if ports is None else ports)
+        self.last_port_file = Path(last_port_file) if last_port_file is not None else None
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.settings = dict(SERIAL_SETTINGS if settings is None else settings)
+        self.discover = discover
+        self.usb_ids = None if usb_ids is None else list(usb_ids)
+
+        self.port = None  # port of the last connection opened
+        self.connect_time = Histogram(minimum=1e-4, maximum=3600.0, buckets_per_decade=10)
+
+        self._denied = set()  # ports already logged as permission denied
+
+    @property
+    def last_port(self):
+        if self.last_port_file is None:
+            return None
+
+        try:
+            return self.last_port_file.read_text().strip() or None
+        except OSError:
+            return None
+
+    def _remember(self, port):
+        if self.last_port_file is None:
+            return
+
+        try:
+            self.last_port_file.parent.mkdir(parents=True, exist_ok=True)
+            self.last_port_file.write_text(port)
+        except OSError as e:
+            self.log.debug('Could not remember port {}: {}'.format(port, e))
+
+    def candidates(self):
+        """Ports to probe, in order of preference"""
+        ports = list(self.ports)
+
+        if not self.discover:
+            return ports
+
+        for port in list_ports.comports():
+            if port.vid is not None and port.device not in ports and self._wanted(port):  # USB serial devices only
+                ports.append(port.device)
+
+        return ports
+
+    def _wanted(self, port):
+        if self.usb_ids is None:
+            return True
+
+        return any(port.vid == vid and pid in (None, port.pid) for vid, pid in self.usb_ids)
+
+    def probe(self, port):
+        """Open a port
+
+        :return: serial.Serial, or None if it couldn't be opened
+        """
+        try:
+            return serial.Serial(port=port, **self.settings)
+        except Exception as e:
+            errno = getattr(e, 'errno', None)
+
+            # Check if the exception was due to permissions
+            if (errno == EPERM or errno == EACCES) and port not in self._denied:
+                self._denied.add(port)
+                self.log.error('Permissions denied to create serial connection on {}'.format(port))
+
+            return None
+
+    def _probe_first(self, ports):
+        """Probe ports in order until one opens
+
+        :return: (port, connection) of the first port in ports that opened, or (None, None)
+        """
+        for port in ports:
+            connection = self.probe(port)
+
+            if connection is not None:
+                return port, connection
+
+        return None, None
+
+    def open(self, timeout=None, stop=None):
+        """Connect to the device, waiting for it to show up
+
+        :param float timeout: most seconds to wait. None to wait until a port opens
+        :param callable stop: returns True to give up waiting
+        :return: serial.Serial, or None if timed out or stopped
+        """
+        start = time.monotonic()
+        backoff = self.backoff
+        last_port = self.last_port
+
+        self.log.info('Attempting to connect to device')
+
+        while True:
+            port, connection = self._probe_first([last_port]) if last_port else (None, None)
+
+            if connection is None:  # listing the ports is skipped when the device didn't move
+                port, connection = self._probe_first([p for p in self.candidates() if p != last_port])
+
+            if connection is not None:
+                elapsed = time.monotonic() - start
+                self.connect_time.record(elapsed)
+                self.port = port
+                self._remember(port)
+                self.log.info('Connected on {} in {:.3f} s'.format(port, elapsed))
+                return connection
+
+            waited = time.monotonic() - start
+
+            if timeout is not None and waited >= timeout:
+                self.log.error('Timed out connecting to device')
+                return None
+
+            if stop is not None and stop():
+                return None
+
+            time.sleep(backoff if timeout is None else min(backoff, timeout - waited))
+            backoff = min(backoff * 2, self.max_backoff)
+
+
+class ReconnectingConnection(object):
+    """Serial connection that reopens the device after it drops
+
+    Reads and writes that fail because the device went away block while the ConnectionManager finds it again, then
+    carry on on the new connection. The read returns no bytes and a write is retried once. Settings like timeout
+    are kept across reconnects. A device that isn't there when the connection is created is waited for the same way,
+    by the first read or write.
+    """
+    def __init__(self, manager, stop=None, open_timeout=None):
+        """
+        :param ConnectionManager manager: opens the device
+        :param callable stop: returns True to stop reconnecting. Reads and writes do nothing once it does
+        :param float open_timeout: most seconds to wait for the device here. None to wait until it opens
+        """
+        self.log = getLogger(self.__class__.__name__)
+
+        self.manager = manager
+        self._stop = stop if stop is not None else (lambda: False)
+        self._lock = Lock()
+        self._connection = manager.open(open_timeout, self._stop)
+        self._settings = dict()
+        self._closed = False
+
+        self.reconnects = 0
+        self.reconnect_time = Histogram(minimum=1e-3, maximum=3600.0, buckets_per_decade=10)
+
+    @property
+    def connected(self):
+        return self._connection is not None
+
+    def _set(self, name, value):
+        """Set a connection setting that is kept across reconnects"""
+        self._settings[name] = value
+
+        if self._connection is not None:
+            setattr(self._connection, name, value)
+
+    @property
+    def timeout(self):
+        return self._settings.get('timeout', self.manager.settings.get('timeout'))
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self._set('timeout', timeout)
+
+    @property
+    def write_timeout(self):
+        return self._settings.get('write_timeout', self.manager.settings.get('write_timeout'))
+
+    @write_timeout.setter
+    def write_timeout(self, write_timeout):
+        self._set('write_timeout', write_timeout)
+
+    @property
+    def baudrate(self):
+        return self.manager.settings.get('baudrate')
+
+    def _reconnect(self, failed):
+        """Replace a connection that failed. Returns the connection to use, None once stopped"""
+        with self._lock:
+            if self._connection is not failed or self._closed:  # another thread already reconnected, or closed it
+                return self._connection
+
+            if failed is None:
+                self.log.warning('Waiting for the device ...')
+            else:
+                self.log.critical('Device disconnected. Reconnecting ...')
+            start = time.monotonic()
+
+            if failed is not None:
+                try:
+                    failed.close()
+                except Exception:
+                    pass
+
+            connection = self.manager.open(stop=self._stop)
+
+            if connection is None:
+                self._connection = None
+                return None
+
+            for name, value in self._settings.items():
+                setattr(connection, name, value)
+
+            elapsed = time.monotonic() - start
+            self.reconnects += 1
+            self.reconnect_time.record(elapsed)
+            self.log.warning('Reconnected on {} after {:.3f} s'.format(self.manager.port, elapsed))
+
+            self._connection = connection
+            return connection
+
+    def _current(self):
+        """Connection to use, waiting for the device if it was never opened. None once stopped or closed"""
+        connection = self._connection
+
+        if connection is None and not self._closed and not self._stop():
+            connection = self._reconnect(None)
+
+        return connection
+
+    @property
+    def in_waiting(self):
+        connection = self._current()
+
+        if connection is None:
+            return 0
+
+        try:
+            return connection.in_waiting
+        except (OSError, TypeError):  # TypeError: pyserial's ioctl on a port closed by another thread
+            self._reconnect(connection)
+            return 0
+
+    def read(self, size=1):
+        connection = self._current()
+
+        if connection is None:
+            return b''
+
+        try:
+            return connection.read(size)
+        except (OSError, TypeError):
+            self._reconnect(connection)
+            return b''
+
+    def write(self, data):
+        for _ in range(2):
+            connection = self._current()
+
+            if connection is None:
+                return 0
+
+            try:
+                return connection.write(data)
+            except serial.SerialTimeoutException:
+                raise
+            except (OSError, TypeError):
+                self._reconnect(connection)
+
+        return 0
+
+    def fileno(self):
+        return self._connection.fileno()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self):
+        return {
+            'port': self.manager.port,
+            'reconnects': self.reconnects,
+            'reconnect_time': self.reconnect_time.snapshot(),
+        }
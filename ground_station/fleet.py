@@ -0,0 +1,180 @@
+"""Several vehicles on one ground station, one receive process per link
+
+Fleet file:
+    links:
+      - vehicle: quad1              # vehicle ID logs are tagged with
+        port: /dev/ttyACM0
+        baudrate: 38400             # optional
+        input: true                 # optional. The link the joystick commands and the only one with an uplink
+        uplink_frequency: 10        # optional, input link only. Hz
+        keepalive_frequency: 2      # optional, input link only. Hz. See --keepalive-frequency
+        capture: captures/quad1.cap # optional. See --capture
+        publish: quad1              # optional. See --publish
+        cpu: 2                      # optional. Core the link's receiver is pinned to
+
+Every link's port is opened once, by the fleet process, and shared by the link's receiver and commanding processes
+across restarts, like a single link is. A vehicle that isn't plugged in doesn't hold up the others: its processes
+start anyway and open the port when it shows up.
+"""
+from logging import getLogger
+import os
+
+import yaml
+
+from connection import ConnectionManager, ReconnectingConnection, SERIAL_SETTINGS
+from receiver import Receiver
+from supervisor import Supervisor
+from transmit import Transmitter
+from utils import set_vehicle
+
+from mission.shared_ring import RingWriter
+
+log = getLogger(__name__)
+
+LINK_DEFAULTS = {
+    'baudrate': SERIAL_SETTINGS['baudrate'],
+    'uplink_frequency': 10,
+    'keepalive_frequency': None,
+    'input': False,
+    'capture': None,
+    'publish': None,
+    'cpu': None,
+}
+
+UPLINK_SETTINGS = {'uplink_frequency', 'keepalive_frequency'}
+
+
+class Link(object):
+    """One vehicle's serial link"""
+    def __init__(self, vehicle, port, baudrate=LINK_DEFAULTS['baudrate'], uplink_frequency=10,
+                 keepalive_frequency=None, input=False, capture=None, publish=None, cpu=None):
+        self.vehicle = str(vehicle)
+        self.port = port
+        self.baudrate = baudrate
+        self.uplink_frequency = uplink_frequency
+        self.keepalive_frequency = keepalive_frequency
+        self.input = input
+        self.capture = capture
+        self.publish = publish
+        self.cpu = cpu
+
+    def connect(self, stop, open_timeout=None):
+        """Open the link's port, and only that port, reconnecting whenever it drops
+
+        :param float open_timeout: most seconds to wait for the port here. Later reads and writes wait for it after
+        """
+        settings = dict(SERIAL_SETTINGS, baudrate=self.baudrate)
+        manager = ConnectionManager([self.port], last_port_file=None, settings=settings, discover=False)
+
+        return ReconnectingConnection(manager, stop, open_timeout)
+
+    def __repr__(self):
+        return 'Link({}, {})'.format(self.vehicle, self.port)
+
+
+def load_fleet(path):
+    """Read the links of a fleet file
+
+    :raises ValueError: if the file doesn't describe a valid fleet
+    """
+    with open(path) as f:
+        config = yaml.safe_load(f) or dict()
+
+    links = []
+
+    for number, entry in enumerate(config.get('links') or [], 1):
+        if not isinstance(entry, dict) or 'vehicle' not in entry or 'port' not in entry:
+            raise ValueError('{}: link {} needs a vehicle and a port'.format(path, number))
+
+        unknown = set(entry) - set(LINK_DEFAULTS) - {'vehicle', 'port'}
+
+        if unknown:
+            raise ValueError('{}: link {} has unknown settings {}'.format(path, number, ', '.join(sorted(unknown))))
+
+        uplink = set(entry) & UPLINK_SETTINGS
+
+        if uplink and not entry.get('input'):
+            raise ValueError('{}: link {} sets {} but only the input link has an uplink'
+                             .format(path, number, ', '.join(sorted(uplink))))
+
+        links.append(Link(**entry))
+
+    if not links:
+        raise ValueError('{}: no links'.format(path))
+
+    for key in ('vehicle', 'port'):
+        values = [getattr(link, key) for link in links]
+
+        if len(set(values)) != len(values):
+            raise ValueError('{}: every link needs its own {}'.format(path, key))
+
+    if sum(1 for link in links if link.input) > 1:
+        raise ValueError('{}: only one link can take user input'.format(path))
+
+    return links
+
+
+def _pin(cpu):
+    """Pin this process to the cpu'th of the cores it is allowed to run on"""
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        allowed = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {allowed[cpu % len(allowed)]})
+
+
+def receive(link, connection, stop, publisher):
+    """Receiver process of a link"""
+    set_vehicle(link.vehicle)
+    _pin(link.cpu)
+
+    Receiver(connection, stop.is_set, capture=link.capture, publisher=publisher).run()
+
+
+def command(link, connection):
+    """Commanding process of the link that takes user input"""
+    from mission.commands import Commanding  # needs map_input and a joystick, only the input link imports it
+
+    set_vehicle(link.vehicle)
+
+    Commanding(Transmitter(connection).send, link.uplink_frequency, link.keepalive_frequency)
+
+
+def run_fleet(links, stop_flag):
+    """Supervise a receiver process per link, spread across cores, and commanding for the input link"""
+    supervisor = Supervisor(stop_flag)
+    connections = []
+    publishers = []
+
+    try:
+        for number, link in enumerate(links):
+            if link.cpu is None:
+                link.cpu = number
+
+            # opened and created before the link's processes are forked, so restarting them doesn't reopen the
+            # port, which resets boards that reset on DTR, or find the ring of the receiver that died. a port that
+            # isn't there is tried once and left to the link's processes, which wait for it
+            connection = link.connect(stop_flag.is_set, open_timeout=0)
+            connection.timeout = 0.1
+
+            if not connection.connected:
+                log.warning('{} is not connected. Its processes will wait for it'.format(link))
+            connections.append(connection)
+
+            publisher = RingWriter(link.publish, attach=True) if link.publish else None
+
+            if publisher is not None:
+                publishers.append(publisher)
+
+            supervisor.add('Receiver-{}'.format(link.vehicle), receive, (link, connection, stop_flag, publisher))
+
+            if link.input:
+                supervisor.add('Commanding-{}'.format(link.vehicle), command, (link, connection), interrupt=True)
+
+        log.info('Running fleet of {}'.format(', '.join(repr(link) for link in links)))
+        supervisor.run()
+    finally:
+        for connection in connections:
+            connection.close()
+
+        for publisher in publishers:
+            publisher.close()
+            publisher.unlink()
@@ -1,14 +1,23 @@
 from argparse import ArgumentParser
-from multiprocessing import Event, Process
+import asyncio
+from multiprocessing import Event, Queue
 import signal
 import sys
 
+from async_transport import AsyncTransport
+from connection import ConnectionManager, ReconnectingConnection
+from fleet import load_fleet, run_fleet
 from receiver import Receiver
+from replay import ReplayConnection
+from supervisor import Supervisor
 from transmit import Transmitter
 from utils import config_logs, connect
 
 from mission.commands import Commanding
 from mission.logs import get_logs
+from mission.packet_handlers import register_handler
+from mission.reliable import ack_handler
+from mission.shared_ring import RingWriter
 
 __author__ = 'Jesse Kleve'
 # __license__ = ''
@@ -38,50 +47,99 @@ def program_description():
 #     return MockConnection()
 
 
-def main(args):
+def run_event_loop(args, connection, log_listener, publisher, acks):
+    """Receive, dispatch and uplink on one asyncio event loop in this process"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
 
-    config_logs(get_logs(args.milliseconds))
+    transport = AsyncTransport(connection, loop, rx_buffer_size=args.rx_buffer_size, capture=args.capture,
+                               publisher=publisher)
+    commanding = Commanding(transport.send, args.uplink_frequency, args.keepalive_frequency, loop=loop,
+                            deadband=args.deadband, quantum=args.quantum, profiles=args.profiles, acks=acks,
+                            max_in_flight=args.max_in_flight)
+
+    loop.add_signal_handler(signal.SIGINT, loop.stop)
+    transport.start()
+
+    try:
+        loop.run_forever()
+    finally:
+        commanding.shutdown()
+        transport.stop()
+        loop.run_until_complete(asyncio.sleep(0))  # let the cancelled service tasks finish
+        loop.close()
+
+        if publisher is not None:
+            publisher.close()
+            publisher.unlink()
+
+        if log_listener is not None:
+            log_listener.stop()
 
-    connection = connect()
-    connection.timeout = 0.1
+
+def main(args):
+
+    log_listener = config_logs(get_logs(args.milliseconds), queued=args.queued_logs,
+                               flush_interval=args.log_flush_interval, vehicles=args.fleet is not None)
 
     # stop event to stop receiver
     stop_flag = Event()
 
-    # receiver
-    receive = Receiver(connection, stop_flag.is_set)
-    receiver = Process(target=receive.run)
+    if args.fleet is not None:
+        try:
+            run_fleet(args.fleet, stop_flag)
+        finally:
+            if log_listener is not None:
+                log_listener.stop()
 
-    # transmitter
-    transmitter = Transmitter(connection)
+        return 0
 
-    # user input & commanding
-    commanding = Process(target=Commanding, args=(transmitter.send, args.uplink_frequency))
+    if args.replay:
+        connection = ReplayConnection(args.replay, args.replay_speed or None)
+    elif args.asyncio:
+        connection = connect()  # the event loop watches the port's file descriptor, which a reconnect would change
+    else:
+        connection = ReconnectingConnection(ConnectionManager(), stop_flag.is_set)
 
-    # signal_handler to gracefully exit
-    def signal_handler(sig_num, frame):
-        stop_flag.set()
+    # created before the receiver is forked so it inherits the mapping
+    publisher = RingWriter(args.publish) if args.publish else None
 
-        try:
-            commanding.terminate()  # commanding process should receive sigint too
-            receiver.terminate()
-            commanding.join(10)
-            receiver.join(10)
-        except AttributeError:
-            pass  # ignore this. commanding exited on its own
+    # acks of sequenced commands, from the receiver to commanding. registered before the receiver is forked
+    acks = None
+
+    if args.reliable_commands:
+        acks = Queue()
+        register_handler(ack_handler(acks), 'ack')
+
+    if args.asyncio:
+        return run_event_loop(args, connection, log_listener, publisher, acks)
+
+    connection.timeout = 0.1
+
+    # receiver
+    receive = Receiver(connection, stop_flag.is_set, capture=args.capture, publisher=publisher)
+
+    # transmitter
+    transmitter = Transmitter(connection, rx_buffer_size=args.rx_buffer_size, byte_delay=args.byte_delay)
 
-        sys.exit(0)
+    # receiver stops on stop_flag. commanding stops on SIGINT
+    supervisor = Supervisor(stop_flag)
+    supervisor.add('Receiver', receive.run)
+    supervisor.add('Commanding', Commanding, (transmitter.send, args.uplink_frequency, args.keepalive_frequency, None,
+                                              args.deadband, args.quantum, args.profiles, acks, args.max_in_flight),
+                   interrupt=True)
 
-    # register SIGINT
-    signal.signal(signal.SIGINT, signal_handler)
+    try:
+        supervisor.run()
+    finally:
+        if publisher is not None:
+            publisher.close()
+            publisher.unlink()
 
-    # start receiver
-    receiver.start()
-    # start user input & command handling
-    commanding.start()
+        if log_listener is not None:
+            log_listener.stop()
 
-    while True:
-        pass
+    return 0
 
 
 def cli():
@@ -92,9 +150,50 @@ def cli():
     parser.add_argument('-ms', '--milliseconds', action='store_true', help="Print time with milli-seconds")
     parser.add_argument('-u', '--uplink-frequency', type=int, default=10,
                         help="Uplink frequency in Hz (Default = 10 Hz)")
+    parser.add_argument('-k', '--keepalive-frequency', type=float, default=None,
+                        help="Uplink controls as soon as they change, and otherwise only at this frequency in Hz")
+    parser.add_argument('--deadband', type=float, default=1,
+                        help="Smallest joystick axis change, in flight units, that is uplinked (Default = 1)")
+    parser.add_argument('--quantum', type=int, default=1,
+                        help="Round joystick axis values to multiples of this many flight units (Default = 1)")
+    parser.add_argument('--profiles', default=None,
+                        help="Input mapping profiles file, reloaded when edited (Default = mission/profiles.yaml)")
+    parser.add_argument('--reliable-commands', action='store_true',
+                        help="Send commands with sequence numbers and retransmit them until the vehicle acks them")
+    parser.add_argument('--max-in-flight', type=int, default=4,
+                        help="Most unacknowledged commands with --reliable-commands (Default = 4)")
+    parser.add_argument('--rx-buffer-size', type=int, default=64,
+                        help="Bytes the vehicle can buffer. Uplink is paced to keep it from overflowing (Default = 64)")
+    parser.add_argument('--byte-delay', type=float, default=None,
+                        help="Uplink one byte at a time with this many seconds between bytes")
+    parser.add_argument('--capture', default=None,
+                        help="Append every received frame to this binary capture file")
+    parser.add_argument('--replay', default=None,
+                        help="Receive from this capture file instead of the device")
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help="Capture playback speed. 0 for as fast as possible (Default = 1.0, real time)")
+    parser.add_argument('--publish', default=None, metavar='NAME',
+                        help="Publish every received frame to a shared memory ring other processes can read by name")
+    parser.add_argument('--fleet', default=None,
+                        help="Run every link in this fleet file, a receiver process per vehicle. See fleet.py")
+    parser.add_argument('--asyncio', action='store_true',
+                        help="Receive, dispatch and uplink on one asyncio event loop instead of separate processes")
+    parser.add_argument('--queued-logs', action='store_true',
+                        help="Log through a queue so only one listener thread writes files and streams")
+    parser.add_argument('--log-flush-interval', type=float, default=1.0,
+                        help="Seconds between log flushes with --queued-logs (Default = 1.0)")
 
     args = parser.parse_args()
 
+    if args.asyncio and (args.replay or args.byte_delay is not None):
+        parser.error('--asyncio needs a serial port and doesn\'t support --replay or --byte-delay')
+
+    if args.fleet is not None:
+        try:
+            args.fleet = load_fleet(args.fleet)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+
     # configure_logging(args.verbose)
 
     return main(args)
@@ -1,4 +1,7 @@
+from .framing import FrameDecoder
 from .packet import handle_packet, packet, PACKET_HEADER, MAX_PACKET_DATA_SIZE
+from .packet_handlers import dispatch_packet, handles, register_handler, unregister_handler
 
 
-__all__ = ['PACKET_HEADER', 'packet', 'handle_packet', 'MAX_PACKET_DATA_SIZE']
+__all__ = ['PACKET_HEADER', 'packet', 'handle_packet', 'dispatch_packet', 'MAX_PACKET_DATA_SIZE', 'FrameDecoder',
+           'handles', 'register_handler', 'unregister_handler']
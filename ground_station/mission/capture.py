@@ -0,0 +1,257 @@
+"""Binary flight recorder
+
+A capture is an append-only file of raw frames and a sidecar index.
+
+Capture file:
+[MAGIC] [RECORD] ...
+RECORD: [TIMESTAMP f64] [LENGTH u16] [FLAGS u8] [RAW FRAME] ...
+
+Index file, capture path + '.idx':
+[INDEX MAGIC] [TIMESTAMP f64] [OP-CODE u8] [OFFSET u64] ...
+
+Timestamps are time.monotonic() seconds. Every index entry points at the offset of its record in the capture file.
+"""
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from .checksum import validate_frames
+MAGIC = b'GSCAP\x00\x01\x00'
+INDEX_MAGIC = b'GSIDX\x00\x01\x00'
+INDEX_SUFFIX = '.idx'
+
+RECORD = struct.Struct('<dHB')
+INDEX = struct.Struct('<dBQ')
+INDEX_DTYPE = np.dtype([('t', '<f8'), ('op_code', 'u1'), ('offset', '<u8')])
+
+FLAG_VALID = 0x01  # frame's checksum was valid
+
+NO_OP_CODE = 0xff  # index op-code of frames too short to have one
+
+
+def index_path(path):
+    return str(path) + INDEX_SUFFIX
+
+
+class CaptureWriter(object):
+    """Appends raw frames to a capture with buffered writes
+
+    Buffered frames are flushed by write() once flush_interval has passed. When frames stop arriving, the owner has
+    to call poll() while it waits for more to keep that promise.
+    """
+    def __init__(self, path, buffer_size=64 * 1024, flush_interval=1.0):
+        """
+        :param path: capture file. Appended to if it exists
+        :param int buffer_size: bytes buffered before a write to disk
+        :param float flush_interval: maximum seconds a frame stays buffered
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.frames = 0
+
+        # appending to a capture that lost its index would start an index of the new frames only
+        if os.path.exists(path) and not os.path.exists(index_path(path)):
+            build_index(path)
+
+        self._file = self._open(path, MAGIC, buffer_size)
+        self._index = self._open(index_path(path), INDEX_MAGIC, buffer_size)
+        self._offset = self._file.tell()
+        self._last_flush = time.monotonic()
+        self._buffered = False
+
+    @staticmethod
+    def _open(path, magic, buffer_size):
+        f = open(path, 'ab', buffering=buffer_size)
+
+        if f.tell() == 0:
+            f.write(magic)
+
+        return f
+
+    def write(self, raw, valid=True, t=None):
+        """Append a frame
+
+        :param raw: frame bytes, header through checksum
+        :param bool valid: frame's checksum was valid
+        :param float t: time the frame was received. Defaults to now
+        """
+        now = time.monotonic()
+        t = now if t is None else t
+
+        self._file.write(RECORD.pack(t, len(raw), FLAG_VALID if valid else 0))
+        self._file.write(raw)
+        self._index.write(INDEX.pack(t, raw[2] if len(raw) > 2 else NO_OP_CODE, self._offset))
+
+        self._offset += RECORD.size + len(raw)
+        self.frames += 1
+        self._buffered = True
+
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def poll(self):
+        """Flush frames that have been buffered for flush_interval. Call while no frames arrive"""
+        if self._buffered and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._index.flush()
+        self._last_flush = time.monotonic()
+        self._buffered = False
+
+    def close(self):
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def build_index(path):
+    """Rebuild the index of a capture by scanning it through a memory map"""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a capture file'.format(path))
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data, open(index_path(path), 'wb') as index:
+            index.write(INDEX_MAGIC)
+            offset = len(MAGIC)
+
+            # whole records only. a capture that was still being written can end mid record
+            while offset + RECORD.size <= len(data):
+                t, length, _ = RECORD.unpack_from(data, offset)
+                start = offset + RECORD.size
+
+                if start + length > len(data):
+                    break
+
+                index.write(INDEX.pack(t, data[start + 2] if length > 2 else NO_OP_CODE, offset))
+                offset = start + length
+
+
+class CaptureReader(object):
+    """Memory-mapped reader for captures
+
+    Neither file is read into memory. Seeking to a time is a binary search of the memory-mapped index.
+    """
+    def __init__(self, path):
+        self.path = path
+
+        if not os.path.exists(index_path(path)):
+            build_index(path)
+
+        self._file, self._map = self._mmap(path, MAGIC)
+        self._index_file, self._index_map = self._mmap(index_path(path), INDEX_MAGIC)
+
+        # whole entries only, pointing at whole records. a capture that was still being written can end mid record
+        entries = (len(self._index_map) - len(INDEX_MAGIC)) // INDEX_DTYPE.itemsize
+        index = np.frombuffer(self._index_map, dtype=INDEX_DTYPE, count=entries, offset=len(INDEX_MAGIC))
+        index = index[:np.searchsorted(index['offset'], len(self._map) - RECORD.size, side='right')]
+        offsets = index['offset'].astype(np.intp)
+
+        # records are back to back, so their ends are in order like their offsets
+        self.index = index[:np.searchsorted(offsets + RECORD.size + self._lengths(offsets), len(self._map),
+                                            side='right')]
+
+        self._view = memoryview(self._map)
+
+    @staticmethod
+    def _mmap(path, magic):
+        f = open(path, 'rb')
+
+        if f.read(len(magic)) != magic:
+            f.close()
+            raise ValueError('{} is not a capture file'.format(path))
+
+        return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def start_time(self):
+        return float(self.index['t'][0]) if len(self.index) else None
+
+    @property
+    def end_time(self):
+        return float(self.index['t'][-1]) if len(self.index) else None
+
+    def record(self, i):
+        """Record i as (timestamp, raw frame memoryview, valid)"""
+        offset = int(self.index['offset'][i])
+        t, length, flags = RECORD.unpack_from(self._map, offset)
+        start = offset + RECORD.size
+
+        return t, self._view[start:start + length], bool(flags & FLAG_VALID)
+
+    def recorded_valid(self):
+        """Boolean array, True for each record whose frame had a valid checksum when it was recorded"""
+        data = np.frombuffer(self._map, dtype=np.uint8)
+        return (data[self.index['offset'].astype(np.intp) + RECORD.size - 1] & FLAG_VALID).astype(bool)
+
+    def _lengths(self, offsets):
+        """Raw frame length of the records at offsets"""
+        data = np.frombuffer(self._map, dtype=np.uint8)
+
+        return data[offsets + 8].astype(np.intp) | data[offsets + 9].astype(np.intp) << 8  # RECORD's u16 length
+
+    def verify(self):
+        """Boolean array, True for each record whose frame has a valid checksum, checked in one pass over the map"""
+        offsets = self.index['offset'].astype(np.intp)
+        lengths = self._lengths(offsets)
+        starts = offsets + RECORD.size
+        framed = lengths >= 4  # header, size, op-code & checksum
+
+        valid = np.zeros(len(offsets), dtype=bool)
+        valid[framed] = validate_frames(self._map, starts[framed], starts[framed] + lengths[framed])
+
+        return valid
+
+    def find(self, t):
+        """Number of the first record at or after time t"""
+        return int(np.searchsorted(self.index['t'], t))
+
+    def seek(self, seconds):
+        """Number of the first record at least seconds after the start of the capture"""
+        return self.find(self.start_time + seconds) if len(self.index) else 0
+
+    def records(self, start=0, stop=None, op_codes=None):
+        """Iterate over records as (timestamp, raw frame memoryview, valid)
+
+        :param int start: number of the first record
+        :param int stop: number one past the last record
+        :param op_codes: only records with these op-codes
+        """
+        numbers = np.arange(start, len(self.index) if stop is None else stop)
+
+        if op_codes is not None:
+            numbers = numbers[np.isin(self.index['op_code'][numbers], list(op_codes))]
+
+        for i in numbers:
+            yield self.record(i)
+
+    def close(self):
+        self._view = None
+        self.index = None
+
+        for m in (self._map, self._index_map):
+            try:
+                m.close()
+            except BufferError:
+                pass  # records handed out are still referenced. the map is closed once they're released
+
+        self._file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
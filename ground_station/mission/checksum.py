@@ -1,12 +1,43 @@
+import numpy as np
+
+
 def get_checksum(data):
-    checksum = 0
+    """Checksum of data
+
+    :param data: bytes, bytearray, memoryview or any iterable of ints
+    :return: the inverse of the sum of data as an unsigned byte
+    """
+    return 0xff - (sum(data) & 0xff)
+
+
+def get_checksums(buf, starts, stops):
+    """Checksums of many frames in one buffer
+
+    :param buf: bytes type object holding the frames, like a memory-mapped capture
+    :param starts: index of each frame's header byte
+    :param stops: index one past each frame's checksum byte. Frames are at least 2 bytes long
+    :return: numpy array of the computed checksum of each frame, excluding its checksum byte
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    starts = np.asarray(starts, dtype=np.intp)
+
+    if not len(starts):
+        return np.zeros(0, dtype=np.uint8)
+
+    # one reduceat sums every frame, and the gaps between them, in uint8 so the sums wrap like the checksum does and
+    # buf is never copied to a wider type
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2] = starts
+    bounds[1::2] = np.asarray(stops, dtype=np.intp) - 1
 
-    for d in data:
-        checksum += d
+    return 0xff - np.add.reduceat(data, bounds, dtype=np.uint8)[0::2]
 
-    checksum = checksum % 0x100
 
-    # Get inverse and convert to unsigned
-    return ~checksum + 2**8
+def validate_frames(buf, starts, stops):
+    """Check the checksum byte of many frames in one buffer
 
+    :return: boolean mask, True for each frame with a valid checksum
+    """
+    checksums = get_checksums(buf, starts, stops)
 
+    return np.frombuffer(buf, dtype=np.uint8)[np.asarray(stops, dtype=np.intp) - 1] == checksums
@@ -0,0 +1,160 @@
+from collections import namedtuple
+import struct
+
+from .opcodes import opcode_to_hex
+
+# Field types and their struct format characters. Multi-byte fields are little endian like the flight code
+FIELD_TYPES = {
+    'u8': 'B',
+    'i8': 'b',
+    'u16le': 'H',
+    'i16': 'h',
+    'i16le': 'h',
+    'u32le': 'I',
+    'i32': 'i',
+    'i32le': 'i',
+    'f32': 'f',
+}
+
+# Payload schemas keyed by op-code name. Op-codes that carry free form text (strings, logs, ...) or a variable
+# number of bytes don't have one
+SCHEMAS = {
+    # telemetry
+    'twi_msg': [('status', 'u8')],
+    'register': [('register', 'u16le'), ('value', 'u16le')],
+    'yawpitchroll': [('yaw', 'f32'), ('pitch', 'f32'), ('roll', 'f32')],
+    'byte': [('byte', 'u8')],
+    'word': [('word', 'u16le')],
+    'size32': [('size32', 'u32le')],
+    'motor_values': [('motor_1', 'u16le'), ('motor_2', 'u16le'), ('motor_3', 'u16le'), ('motor_4', 'u16le')],
+    'pid_outputs': [('yaw', 'f32'), ('pitch', 'f32'), ('roll', 'f32')],
+    'user_input': [('yaw', 'u8'), ('pitch', 'u8'), ('roll', 'u8'), ('throttle', 'u8')],
+    'ack': [('sequence', 'u8'), ('op_code', 'u8')],
+
+    # commands
+    'controls': [('yaw', 'u8'), ('pitch', 'u8'), ('roll', 'u8'), ('throttle', 'u8')],
+    'downlink_yawpitchroll': [],
+    'flight_mode': [],
+    'non_flight_mode': [],
+    'terminate': [],
+    'level_quad': [],
+    'done': [],
+    'sequenced': [('sequence', 'u8'), ('op_code', 'u8')],
+}
+
+# Op-codes the flight code still sends as comma separated text. Their payloads are decoded from text when they
+# look like text and from the schema otherwise
+TEXT_PAYLOADS = {'yawpitchroll', 'user_input'}
+
+_TEXT_CHARACTERS = b'0123456789+-.eE, \x00'
+
+
+class PayloadCodec(object):
+    """Decodes and encodes one op-code's payload
+
+    The schema is compiled once to a struct.Struct and decoded payloads are returned as namedtuple records.
+    """
+    def __init__(self, name, fields, text=False):
+        """
+        :param str name: name of the record type, usually the op-code's name
+        :param list fields: (field name, field type) pairs in payload order. See FIELD_TYPES
+        :param bool text: also accept the fields as comma separated text
+        """
+        self.name = name
+        self.fields = fields
+        self.record = namedtuple(name, [field for field, _ in fields])
+
+        self._struct = struct.Struct('<' + ''.join(FIELD_TYPES[field_type] for _, field_type in fields))
+        self._text_types = [float if field_type == 'f32' else int for _, field_type in fields] if text else None
+
+    @property
+    def size(self):
+        return self._struct.size
+
+    @property
+    def struct(self):
+        """The compiled struct.Struct, for encoders that pack straight into their own buffers"""
+        return self._struct
+
+    def decode(self, data):
+        """Decode a payload into a record
+
+        :param data: payload bytes
+        :raises ValueError: if data doesn't hold the payload
+        """
+        if self._text_types is not None and _is_text(data):
+            return self.decode_text(data)
+
+        try:
+            return self.record._make(self._struct.unpack_from(data))
+        except struct.error as e:
+            raise ValueError('Invalid {} payload {}: {}'.format(self.name, bytes(data), e))
+
+    def decode_text(self, data):
+        """Decode a comma separated text payload
+
+        :raises ValueError: if data doesn't hold the fields, or a value doesn't fit its field's type
+        """
+        values = bytes(data).decode('ascii').split(',')
+
+        if len(values) != len(self._text_types):
+            raise ValueError('Invalid {} text payload {}'.format(self.name, bytes(data)))
+
+        values = [to_type(value.strip(' \x00')) for to_type, value in zip(self._text_types, values)]
+
+        # the values have to fit the fields, like the binary payload's do, to be stored as telemetry
+        try:
+            self._struct.pack(*values)
+        except (struct.error, OverflowError) as e:
+            raise ValueError('Invalid {} text payload {}: {}'.format(self.name, bytes(data), e))
+
+        return self.record._make(values)
+
+    def encode(self, *values):
+        """Encode field values, in schema order, to payload bytes"""
+        return self._struct.pack(*values)
+
+
+def _is_text(data):
+    data = bytes(data)
+    return b',' in data and not data.translate(None, _TEXT_CHARACTERS)
+
+
+# One entry per possible op-code byte, None for op-codes without a schema
+_codecs = [None] * 256
+
+
+def register_codec(op_code, codec):
+    """Decode op_code's payloads with codec
+
+    :param op_code: op-code as a number or a name from opcodes.opcode_to_str
+    :param PayloadCodec codec: codec, or None to remove op_code's codec
+    """
+    if isinstance(op_code, str):
+        op_code = opcode_to_hex[op_code]
+
+    _codecs[op_code] = codec
+
+
+def get_codec(op_code):
+    if isinstance(op_code, str):
+        op_code = opcode_to_hex[op_code]
+
+    return _codecs[op_code]
+
+
+def decode(packet):
+    """Decode a packet's payload into its op-code's record
+
+    :raises ValueError: if the op-code has no schema or the payload doesn't match it
+    """
+    codec = _codecs[packet.op_code]
+
+    if codec is None:
+        raise ValueError('No payload schema for op-code {}'.format(hex(packet.op_code)))
+
+    return codec.decode(packet.data)
+
+
+for _name, _fields in SCHEMAS.items():
+    register_codec(_name, PayloadCodec(_name, _fields, text=_name in TEXT_PAYLOADS))
@@ -2,17 +2,35 @@ from logging import getLogger
 from queue import Queue
 import signal
 import sys
+from threading import Thread
 
 from mission.controls import Controls
+from mission.encoder import command
 from mission.events import CommandEvent, EVENT_TYPE
-from mission.opcodes import opcode_to_hex
-from mission.packet import generate_packet
+from mission.profiles import DEFAULT_PROFILES
+from mission.reliable import ReliableCommands
 from mission.user_input import UserInput
-from service import Service, ServiceManager
+from service import AsyncServiceManager, OnChange, Service, ServiceManager
 
 
 class Commanding(object):
-    def __init__(self, send_handler, frequency):
+    def __init__(self, send_handler, frequency, keepalive_frequency=None, loop=None, deadband=1, quantum=1,
+                 profiles=None, acks=None, max_in_flight=4):
+        """
+        :param callable send_handler: uplinks a packet
+        :param float frequency: uplink frequency
+        :param float keepalive_frequency: uplink controls as soon as they change and otherwise only at this
+            frequency. None to uplink controls every period
+        :param loop: asyncio event loop to run the uplink services on as coroutines. User input then runs on its own
+            thread and Commanding returns once started, leaving SIGINT and shutdown() to the loop's owner. None to
+            run the services on a scheduler thread and block on user input
+        :param deadband: smallest joystick axis change, in flight units, that is uplinked
+        :param quantum: joystick axis values are rounded to multiples of this, in flight units
+        :param profiles: input mapping profiles file. Edits to it take effect while running. None for the default
+        :param acks: queue the receiver puts command acks on, see reliable.ack_handler. Commands are then sent as
+            sequenced frames and retransmitted until acknowledged. None to send commands once
+        :param int max_in_flight: most sequenced commands waiting for an ack at once
+        """
         self.log = getLogger(self.__class__.__name__)
         self.send = send_handler
         # Controls shared object
@@ -20,42 +38,75 @@ class Commanding(object):
         # Commands uplink queue
         self.commands = Queue()
 
+        # Sequenced command frames waiting to be sent or acknowledged
+        self.reliable = ReliableCommands(acks, max_in_flight) if acks is not None else None
+
+        controls_policy = OnChange(keepalive_frequency) if keepalive_frequency else None
+
         # Uplink services uplink generated packets at certain frequency
-        self.uplink_services = ServiceManager([
-            Service('Controls', self.send, self.controls, frequency, 1),
+        services = [
+            Service('Controls', self.send, self.controls, frequency, 1, controls_policy),
             Service('Commands', self.command_handler, self.commands, frequency, 2),
-        ])
+        ]
+
+        if self.reliable is not None:
+            services.append(Service('Reliable', self.send, self.reliable, frequency, 2))
+        self.uplink_services = ServiceManager(services) if loop is None else AsyncServiceManager(services, loop)
+
+        if controls_policy is not None:
+            self.controls.on_change = lambda: self.uplink_services.trigger('Controls')
 
-        self.user_input = UserInput(self.controls, self.commands)
+        self.user_input = UserInput(self.controls, self.commands, deadband, quantum, profiles or DEFAULT_PROFILES)
         self.user_input.non_flight()
 
+        self.uplink_services.start('Commands')
+        self.uplink_services.start('Controls')
+
+        if self.reliable is not None:
+            self.uplink_services.start('Reliable')
+
+        if loop is not None:
+            Thread(name='User Events', target=self.user_input.run, daemon=True).start()
+            return
+
         def signal_handler(sig_num, frame):
-            self.log.info('Shutting down')
-            self.uplink_services.stop('Controls')
-            self.uplink_services.stop('Commands')
-            self.user_input.stop(True)
+            self.shutdown()
             sys.exit(0)
 
         signal.signal(signal.SIGINT, signal_handler)
 
-        self.uplink_services.start('Commands')
-        self.uplink_services.start('Controls')
-
         self.user_input.run()
 
+    def shutdown(self):
+        self.log.info('Shutting down')
+        self.log.info('User input: {}'.format(self.user_input.stats()))
+
+        if self.reliable is not None:
+            self.log.info('Reliable commands: {}'.format(self.reliable.stats()))
+
+        self.uplink_services.shutdown(1)
+        self.user_input.stop(True)
+
     def command_handler(self, event):
         if event[EVENT_TYPE] == CommandEvent.ENTER_FLIGHT_MODE:
             self.enter_flight_mode()
-            self.send(generate_packet(opcode_to_hex['flight_mode']))
+            self.send_command('flight_mode')
         elif event[EVENT_TYPE] == CommandEvent.EXIT_FLIGHT_MODE:
             self.exit_flight_mode()
-            self.send(generate_packet(opcode_to_hex['non_flight_mode']))
+            self.send_command('non_flight_mode')
         elif event[EVENT_TYPE] == CommandEvent.TOGGLE_YAWPITCHROLL:
-            self.send(generate_packet(opcode_to_hex['downlink_yawpitchroll']))
+            self.send_command('downlink_yawpitchroll')
         elif event[EVENT_TYPE] == CommandEvent.LEVEL_QUAD:
-            self.send(generate_packet(opcode_to_hex['level_quad']))
+            self.send_command('level_quad')
         elif event[EVENT_TYPE] == CommandEvent.DONE:
-            self.send(generate_packet(opcode_to_hex['done']))
+            self.send_command('done')
+
+    def send_command(self, name):
+        """Send a command without a payload, through the reliable channel if there is one"""
+        if self.reliable is not None:
+            self.reliable.put(name)
+        else:
+            self.send(command(name))
 
     def enter_flight_mode(self):
         self.log.info('Entering flight mode')
@@ -1,52 +1,114 @@
-from ctypes import c_uint8
-from multiprocessing import Array
+from ctypes import c_uint64
+from multiprocessing import Lock, RawArray
 
-from .opcodes import opcode_to_hex
-from .packet import generate_packet
+from .encoder import FrameTemplate
+
+AXES = ('yaw', 'pitch', 'roll', 'throttle')
+DEFAULTS = (50, 50, 50, 0)
+
+_SEQUENCE = 0  # index of the sequence word
+_VALUES = 8  # byte offset of the axis values
 
 
 class Controls(object):
-    def __init__(self):
-        self.values = Array(c_uint8, (50, 50, 50, 0))
+    """Yaw, pitch, roll & throttle shared between processes
+
+    The axes live in shared memory behind a sequence lock. Writers take a lock between themselves, make the sequence
+    odd, write the axes and make it even again. Readers never lock: they copy all four axes at once and retry if the
+    sequence was odd or changed while they copied, so every snapshot holds the axes of one update.
+    """
+    def __init__(self, on_change=None):
+        """
+        :param callable on_change: called with no arguments after any axis changes value
+        """
+        self._shared = RawArray(c_uint64, 2)  # sequence word, then the axes in the low bytes of the next one
+        self._sequence = memoryview(self._shared).cast('B').cast('Q')
+        self._bytes = memoryview(self._shared).cast('B')
+        self._write_lock = Lock()
+
+        self.on_change = on_change
+
+        self._template = FrameTemplate('controls')
+
+        self._bytes[_VALUES:_VALUES + len(AXES)] = bytes(DEFAULTS)
+
+    def snapshot(self):
+        """All axes from one update, as (yaw, pitch, roll, throttle)"""
+        sequence = self._sequence
+        values = self._bytes[_VALUES:_VALUES + len(AXES)]
+
+        while True:
+            before = sequence[_SEQUENCE]
+            snapshot = tuple(values.tobytes())
+
+            if not before & 1 and sequence[_SEQUENCE] == before:
+                return snapshot
+
+    def update(self, yaw=None, pitch=None, roll=None, throttle=None):
+        """Set any of the axes in one update. Readers see all of them change or none
+
+        :return: True if any axis changed value
+        """
+        new = (yaw, pitch, roll, throttle)
+
+        with self._write_lock:
+            old = tuple(self._bytes[_VALUES:_VALUES + len(AXES)])
+            values = bytes(o if n is None else n for o, n in zip(old, new))
+
+            if values == bytes(old):
+                return False
+
+            self._sequence[_SEQUENCE] += 1  # odd: being written
+            self._bytes[_VALUES:_VALUES + len(AXES)] = values
+            self._sequence[_SEQUENCE] += 1  # even: consistent
+
+        if self.on_change is not None:
+            self.on_change()
+
+        return True
+
+    @property
+    def values(self):
+        return self.snapshot()
 
     @property
     def yaw(self):
-        return self.values[0]
+        return self._bytes[_VALUES]
 
     @yaw.setter
     def yaw(self, yaw):
-        self.values[0] = yaw
+        self.update(yaw=yaw)
 
     @property
     def pitch(self):
-        return self.values[1]
+        return self._bytes[_VALUES + 1]
 
     @pitch.setter
     def pitch(self, pitch):
-        self.values[1] = pitch
+        self.update(pitch=pitch)
 
     @property
     def roll(self):
-        return self.values[2]
+        return self._bytes[_VALUES + 2]
 
     @roll.setter
     def roll(self, roll):
-        self.values[2] = roll
+        self.update(roll=roll)
 
     @property
     def throttle(self):
-        return self.values[3]
+        return self._bytes[_VALUES + 3]
 
     @throttle.setter
     def throttle(self, throttle):
-        self.values[3] = throttle
+        self.update(throttle=throttle)
 
     def get_state(self):
-        return self.yaw, self.pitch, self.roll, self.throttle
+        return self.snapshot()
 
     def get(self, block=False):
         """Implement get to be like a FIFO queue which is what UplinkService requires.
-        It does not need to throw a queue.Empty exception as long as it always returns something"""
-        op_code = opcode_to_hex['controls']
-        controls = [self.yaw, self.pitch, self.roll, self.throttle]
-        return generate_packet(op_code, controls)
+        It does not need to throw a queue.Empty exception as long as it always returns something
+
+        Returns the same bytearray every call, only valid until the next one"""
+        return self._template.encode(*self.snapshot())
@@ -0,0 +1,66 @@
+"""Uplink frame encoding without per-call allocation
+
+Frames of op-codes without a payload never change, so each is built once and kept as bytes. Op-codes with a fixed
+size payload get a FrameTemplate: a preallocated frame with the header, size and op-code already in place, where
+encoding only writes the payload and checksum.
+"""
+from .codecs import get_codec
+from .opcodes import opcode_to_hex
+from .packet import generate_packet, PACKET_HEADER
+
+_commands = dict()
+
+
+def command(op_code):
+    """Wire-ready frame of an op-code without a payload, built once
+
+    :param op_code: op-code as a number or a name from opcodes.opcode_to_str
+    :return: bytes
+    """
+    try:
+        return _commands[op_code]
+    except KeyError:
+        frame = _commands.get(_to_op_code(op_code))
+
+        if frame is None:
+            frame = bytes(generate_packet(_to_op_code(op_code)))
+
+        _commands[op_code] = _commands[_to_op_code(op_code)] = frame
+        return frame
+
+
+def _to_op_code(op_code):
+    return opcode_to_hex[op_code] if isinstance(op_code, str) else op_code
+
+
+class FrameTemplate(object):
+    """Preallocated frame of one op-code with a fixed size payload
+
+    encode() patches the payload and checksum in place and returns the same bytearray every call. It is only valid
+    until the next call, so whatever keeps it longer has to copy it.
+    """
+    def __init__(self, op_code):
+        """
+        :param op_code: op-code with a payload schema, as a number or a name from opcodes.opcode_to_str
+        """
+        op_code = _to_op_code(op_code)
+        self.codec = get_codec(op_code)
+
+        if self.codec is None:
+            raise ValueError('No payload schema for op-code {}'.format(hex(op_code)))
+
+        size = self.codec.size
+        self.frame = bytearray(generate_packet(op_code, [0] * size))
+        self._payload = memoryview(self.frame)[3:-1]
+        self._header_sum = PACKET_HEADER + size + 1 + op_code
+        self._pack_into = self.codec.struct.pack_into  # bound once. a forwarding call costs as much as the packing
+
+    def encode(self, *values):
+        """Encode field values, in schema order, into the frame
+
+        :return: the frame's bytearray
+        """
+        self._pack_into(self.frame, 3, *values)
+        self.frame[-1] = 0xff - ((self._header_sum + sum(self._payload)) & 0xff)
+
+        return self.frame
@@ -0,0 +1,144 @@
+from .checksum import get_checksum
+from .packet import Packet, PACKET_HEADER, MAX_PACKET_DATA_SIZE
+
+FRAME_OVERHEAD = 3  # header, size & checksum bytes around the op-code and data
+
+
+class FrameDecoder(object):
+    """Incremental frame decoder
+
+    Bytes are fed in whatever chunks the connection hands back and complete frames are parsed out of them. Frames
+    are returned as Packets that point into the chunk, so nothing is copied per frame. Only the tail of a frame that is
+    split across reads is kept, and joined to the next chunk, so the decoder can be fed one byte or one kilobyte at
+    a time and produce the same frames.
+
+    Only frames with a valid checksum are returned. When a candidate frame has a bad size or checksum only its
+    header byte is dropped and the buffer is rescanned from the byte after it, so a real frame that starts inside
+    a corrupt one is still found.
+
+    Packet layout:
+    [HEADER] [SIZE] [OP-CODE] [DATA] ... [CHECKSUM]
+    """
+    def __init__(self, on_invalid=None):
+        """
+        :param callable on_invalid: called with (buffer, start, stop) for every complete frame with a bad checksum
+        """
+        self.on_invalid = on_invalid
+
+        self._pending = b''  # start of a frame waiting for the rest of its bytes
+        self._offset = 0  # stream offset of the first buffered byte
+        self._blind_until = 0  # stream offset a blind size + 1 byte read would have consumed up to
+
+        self.frames = 0
+        self.frames_recovered = 0
+        self.checksum_errors = 0
+        self.size_errors = 0
+        self.bytes_received = 0
+        self.bytes_framed = 0
+        self.bytes_discarded = 0
+
+    @property
+    def buffered(self):
+        """Number of bytes waiting for the rest of their frame"""
+        return len(self._pending)
+
+    @property
+    def goodput(self):
+        """Fraction of received bytes that ended up in a valid frame"""
+        return self.bytes_framed / self.bytes_received if self.bytes_received else 0.0
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'frames_recovered': self.frames_recovered,
+            'checksum_errors': self.checksum_errors,
+            'size_errors': self.size_errors,
+            'bytes_received': self.bytes_received,
+            'bytes_discarded': self.bytes_discarded,
+            'goodput': self.goodput,
+        }
+
+    def feed(self, data):
+        """Add received bytes to the buffer and parse out every complete, valid frame
+
+        :param bytes data: bytes read from the connection
+        :return: list of Packets for the complete frames
+        """
+        self.bytes_received += len(data)
+
+        buf = self._pending + data if self._pending else bytes(data)
+        view = memoryview(buf)
+
+        frames = []
+        end = len(buf)
+        pos = 0
+
+        while pos < end:
+            start = buf.find(PACKET_HEADER, pos)
+
+            # no header in what's left, none of it can be part of a frame
+            if start < 0:
+                self.bytes_discarded += end - pos
+                pos = end
+                break
+
+            self.bytes_discarded += start - pos
+
+            # wait for the size byte
+            if start + 1 >= end:
+                pos = start
+                break
+
+            size = buf[start + 1]
+
+            # a size that can't be right means this header byte was data. rescan from the byte after it
+            if not 0 < size <= MAX_PACKET_DATA_SIZE:
+                self.size_errors += 1
+                self._reject(start, start + 2)
+                pos = start + 1
+                continue
+
+            stop = start + size + FRAME_OVERHEAD
+
+            # wait for the rest of the frame
+            if stop > end:
+                pos = start
+                break
+
+            if buf[stop - 1] != get_checksum(view[start:stop - 1]):
+                self.checksum_errors += 1
+                self._reject(start, stop)
+
+                if self.on_invalid is not None:
+                    self.on_invalid(buf, start, stop)
+
+                pos = start + 1
+                continue
+
+            if self._offset + start < self._blind_until:
+                self.frames_recovered += 1
+
+            frames.append(Packet(buf, start, stop))
+            self.bytes_framed += stop - start
+            pos = stop
+
+        self._pending = buf[pos:]
+        self._offset += pos
+        self.frames += len(frames)
+
+        return frames
+
+    def _reject(self, start, claimed_stop):
+        """Drop a candidate header
+
+        :param int start: buffer index of the rejected header
+        :param int claimed_stop: buffer index a blind read of the candidate would have consumed up to
+        """
+        self.bytes_discarded += 1
+        self._blind_until = max(self._blind_until, self._offset + claimed_stop)
+
+    def reset(self):
+        """Drop any partially received frame"""
+        self.bytes_discarded += len(self._pending)
+        self._offset += len(self._pending)
+        self._pending = b''
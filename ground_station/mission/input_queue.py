@@ -0,0 +1,125 @@
+from collections import deque
+from queue import Empty, Full
+from threading import Condition
+
+from .events import ControlEvent, EVENT_TYPE, EVENT_VALUE
+
+
+class InputQueue(object):
+    """Queue between map_input and UserInput that keeps only the latest value of each axis
+
+    Axis events are quantized to multiples of quantum and dropped when within deadband of the axis' last value, so
+    joystick jitter never reaches the controls. The ones left are merged into one pending batch per axis, in place,
+    until a command event arrives. Commands are queued in order behind that batch and close it, so a command is
+    always consumed after the axis values that came before it and before the ones that came after it.
+
+    Axis events never block. Only command events count towards maxsize, and put blocks when it is reached.
+    """
+    def __init__(self, deadband=1, quantum=1, maxsize=64):
+        """
+        :param deadband: smallest change of an axis, in flight units, that is forwarded
+        :param quantum: axis values are rounded to multiples of this, in flight units
+        :param int maxsize: most command events queued at once
+        """
+        self.deadband = deadband
+        self.quantum = quantum
+        self.maxsize = maxsize
+
+        self._items = deque()  # command events and {ControlEvent: value} batches, in arrival order
+        self._batch = None  # batch at the tail that axis events are still merged into
+        self._last = dict()  # last value queued per axis
+        self._commands = 0
+        self._condition = Condition()
+
+        self.events = 0
+        self.coalesced = 0  # axis events merged into a pending batch
+        self.filtered = 0  # axis events within the deadband
+        self.max_depth = 0
+
+    def _quantize(self, value):
+        if not self.quantum:
+            return value
+
+        return int(round(value / self.quantum) * self.quantum)
+
+    def put(self, event, block=True, timeout=None):
+        """Queue an event from map_input
+
+        :raises queue.Full: only if a command event can't be queued within timeout
+        """
+        with self._condition:
+            self.events += 1
+
+            if isinstance(event[EVENT_TYPE], ControlEvent):
+                self._put_axis(event[EVENT_TYPE], self._quantize(event[EVENT_VALUE]))
+            else:
+                self._put_command(event, block, timeout)
+
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._condition.notify_all()
+
+    def put_nowait(self, event):
+        return self.put(event, block=False)
+
+    def _put_axis(self, axis, value):
+        last = self._last.get(axis)
+
+        if last is not None and abs(value - last) < self.deadband:
+            self.filtered += 1
+            return
+
+        self._last[axis] = value
+
+        if self._batch is None:
+            self._batch = dict()
+            self._items.append(self._batch)
+        elif axis in self._batch:
+            self.coalesced += 1
+
+        self._batch[axis] = value
+
+    def _put_command(self, event, block, timeout):
+        if not self._condition.wait_for(lambda: self._commands < self.maxsize, timeout if block else 0):
+            raise Full
+
+        self._items.append(event)
+        self._batch = None
+        self._commands += 1
+
+    def get(self, block=True, timeout=None):
+        """Next command event, or dict of the latest value of every axis that changed since the last item
+
+        :raises queue.Empty: if nothing is queued within timeout
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._items, timeout if block else 0):
+                raise Empty
+
+            item = self._items.popleft()
+
+            if item is self._batch:
+                self._batch = None
+            elif not isinstance(item, dict):
+                self._commands -= 1
+                self._condition.notify_all()
+
+            return item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def qsize(self):
+        return len(self._items)
+
+    def empty(self):
+        return not self._items
+
+    def stats(self):
+        with self._condition:
+            return {
+                'depth': len(self._items),
+                'max_depth': self.max_depth,
+                'events': self.events,
+                'coalesced': self.coalesced,
+                'filtered': self.filtered,
+            }
@@ -0,0 +1,78 @@
+from math import ceil, log10
+
+
+class Histogram(object):
+    """Fixed memory histogram with log spaced buckets
+
+    Values are counted in buckets_per_decade buckets per power of ten between minimum and maximum, plus one bucket
+    for anything below and one for anything above. Percentiles are reported as the middle of their bucket, within
+    3% with the default 40 buckets per decade. Count, mean and max are exact.
+    """
+    def __init__(self, minimum=1e-6, maximum=10.0, buckets_per_decade=40):
+        """
+        :param float minimum: smallest value with its own bucket
+        :param float maximum: largest value with its own bucket
+        :param int buckets_per_decade: buckets per power of ten
+        """
+        self._log_minimum = log10(minimum)
+        self._scale = buckets_per_decade
+        self._minimum = minimum
+        self._counts = [0] * (int(ceil((log10(maximum) - self._log_minimum) * buckets_per_decade)) + 2)
+
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        if value < self._minimum:
+            bucket = 0
+        else:
+            bucket = min(int((log10(value) - self._log_minimum) * self._scale) + 1, len(self._counts) - 1)
+
+        self._counts[bucket] += 1
+        self.count += 1
+        self.total += value
+
+        if value > self.max:
+            self.max = value
+
+    def _middle(self, bucket):
+        if bucket == 0:  # below minimum
+            return 0.0
+
+        return 10 ** (self._log_minimum + (bucket - 0.5) / self._scale)
+
+    def percentile(self, percent):
+        """Middle of the bucket holding the percent'th percentile, never more than the max"""
+        if self.count == 0:
+            return 0.0
+
+        rank = percent / 100 * self.count
+        seen = 0
+
+        for bucket, count in enumerate(self._counts):
+            seen += count
+
+            if seen >= rank and count:
+                return min(self._middle(bucket), self.max)
+
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+    def reset(self):
+        self._counts = [0] * len(self._counts)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
@@ -15,7 +15,7 @@ opcode_to_str = {
     0x0a: 'motor_values',
     0x0b: 'pid_outputs',
     0x0c: 'user_input',  # TODO remove things like this. move towards logging functions
-    0x0d: UNUSED,
+    0x0d: 'ack',  # of a sequenced command
     0x0e: UNUSED,
     0x0f: UNUSED,
 
@@ -29,6 +29,7 @@ opcode_to_str = {
     0x26: 'level_quad',
     0x29: 'run_test',
     0x30: 'done',
+    0x31: 'sequenced',  # a command with a sequence number the vehicle acks
 
 
     # errors
@@ -1,4 +1,3 @@
-from collections import namedtuple
 import logging
 
 from .checksum import get_checksum
@@ -12,26 +11,64 @@ MAX_PACKET_DATA_SIZE = MAX_PACKET_SIZE - 1 - 1 - 1  # minus 1 for header, op_cod
 
 
 class Packet(object):
-    def __init__(self, header, op_code, data_size, data, checksum, raw):
-        self.header = header
-        self.op_code = op_code
-        self.data_size = data_size
-        self.data = data
-        self.checksum = checksum
-        self.raw = raw
+    """Received packet
+
+    Holds the receive buffer and the offsets of one frame in it instead of copies of its fields. Every field is read
+    from the buffer on access.
+    """
+    __slots__ = ('_buf', '_start', '_stop', '_data')
+
+    def __init__(self, buf, start=0, stop=None):
+        """
+        :param buf: bytes type object holding the frame
+        :param int start: index of the frame's header byte in buf
+        :param int stop: index one past the frame's checksum byte in buf. Defaults to the end of buf
+        """
+        self._buf = buf
+        self._start = start
+        self._stop = len(buf) if stop is None else stop
+        self._data = None
+
+    @property
+    def raw(self):
+        return self._buf[self._start:self._stop]
+
+    @property
+    def header(self):
+        return self._buf[self._start]
+
+    @property
+    def op_code(self):
+        return self._buf[self._start + 2]
+
+    @property
+    def data_size(self):
+        return self._buf[self._start + 1] - 1  # the size byte counts the op-code
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._buf[self._start + 3:self._stop - 1]
+
+        return self._data
+
+    @property
+    def checksum(self):
+        return self._buf[self._stop - 1]
+
+    def __len__(self):
+        return self._stop - self._start - 4  # header, size, op-code & checksum
 
     def __iter__(self):
-        for d in self.data:
-            yield d
+        return iter(self.data)
 
     def __repr__(self):
-        return 'Packet({self.header}, {self.op_code}, {self.data_size}, {self.data}, {self.checksum}, {self.raw})'\
-            .format(**locals())
+        return 'Packet({})'.format(bytes(self.raw))
 
     def __str__(self):
         opcode = hex(self.op_code)
-        return 'Packet(opcode={opcode}, num_data={self.data_size}, data={self.data}, checksum={self.checksum}, ' \
-               'raw={self.raw}'.format(**locals())
+        return 'Packet(opcode={opcode}, num_data={self.data_size}, data={data}, checksum={self.checksum}, ' \
+               'raw={raw}'.format(data=list(self.data), raw=list(self.raw), **locals())
 
 
 def generate_packet(op_code, data=None):
@@ -55,26 +92,31 @@ def generate_packet(op_code, data=None):
 
 
 def packet(data):
-    """Take raw data and return a Packet object"""
-    header = data[0]
-    packet_size = data[1]
-    op_code = data[2]
-    data_bytes = data[3:-1]
-    checksum = data[-1]
+    """Take raw data and return a Packet object
 
-    return Packet(header, op_code, packet_size - 1, data_bytes, checksum, data)
+    :param data: one frame as a bytes type object, or a list of ints
+    """
+    if isinstance(data, list):
+        data = bytes(data)
+
+    return Packet(data)
 
 
 def handle_packet(packet):
     """Dispatch packet to the packet handler
     The dispatch destination is determined via the packet's op-code
+
+    Packets with a bad checksum are logged and dropped
+
+    :return: True if the packet was dispatched
     """
     computed_checksum = get_checksum(packet.raw[:-1])  # checksum all data but the checksum byte
 
-    # if the checksum is bad lets log and let the packet handler still try to parse it
     if packet.checksum != computed_checksum:
         log.warning('Bad checksum {} {}'.format(computed_checksum, packet))
+        return False
 
     log.debug('Dispatching packet {}'.format(packet))
     dispatch_packet(packet)
 
+    return True
@@ -1,7 +1,8 @@
 from logging import getLogger, INFO, DEBUG, WARNING, ERROR
-import sys
 
-from .opcodes import opcode_to_str
+from .codecs import decode
+from .opcodes import opcode_to_hex, opcode_to_str
+from .telemetry import telemetry
 
 log = getLogger(__name__)
 
@@ -35,18 +36,99 @@ TWI_MESSAGES = dict([
 ])
 
 
+def handle_unknown(packet):
+    """Shared fallback for op-codes without a registered handler"""
+    if packet.op_code not in opcode_to_str:
+        log.warning('Invalid op-code \'{}\''.format(packet.op_code))
+    else:
+        log.warning('No handler for handle_{}'.format(opcode_to_str[packet.op_code]))
+
+
+# One entry per possible op-code byte. Dispatching a packet is a single index into this table
+_fallback = handle_unknown
+_dispatch_table = [_fallback] * 256
+
+
+def _to_op_code(op_code):
+    """Accept an op-code as a number or as its name in opcodes.opcode_to_str"""
+    if isinstance(op_code, str):
+        return opcode_to_hex[op_code]
+
+    if not 0 <= op_code < len(_dispatch_table):
+        raise ValueError('Op-code {} does not fit in a byte'.format(op_code))
+
+    return op_code
+
+
+def register_handler(handler, *op_codes):
+    """Route packets with any of op_codes to handler
+
+    Replaces any handler already registered for those op-codes
+
+    :param callable handler: called with the Packet
+    :param op_codes: op-codes as numbers or names from opcodes.opcode_to_str
+    """
+    for op_code in op_codes:
+        _dispatch_table[_to_op_code(op_code)] = handler
+
+
+def unregister_handler(*op_codes):
+    """Route packets with op_codes back to the fallback handler"""
+    for op_code in op_codes:
+        _dispatch_table[_to_op_code(op_code)] = _fallback
+
+
+def handles(*op_codes):
+    """Decorator registering the decorated function as the handler for op_codes"""
+    def decorator(handler):
+        register_handler(handler, *op_codes)
+        return handler
+
+    return decorator
+
+
+def get_handler(op_code):
+    return _dispatch_table[_to_op_code(op_code)]
+
+
+def set_fallback(handler):
+    """Replace the handler used for op-codes nobody registered for"""
+    global _fallback
+
+    for op_code, registered in enumerate(_dispatch_table):
+        if registered is _fallback:
+            _dispatch_table[op_code] = handler
+
+    _fallback = handler
+
+
+def decode_telemetry(packet):
+    """Decode a packet's payload and append it to the op-code's telemetry ring buffer
+
+    :raises ValueError: if the payload doesn't match the op-code's schema
+    """
+    values = decode(packet)
+    telemetry.append(packet.op_code, values)
+    return values
+
+
 def log_packet(packet, message, level=INFO):
     log.log(level, '({:16}): {}'.format(opcode_to_str[packet.op_code], message))
 
 
+@handles('string')
 def handle_string(packet, level=INFO):
     s = ''.join([chr(b) for b in packet.data])
     log_packet(packet, s, level)
 
 
+@handles('register')
 def handle_register(packet):
-    value = (packet.data[3] << 8) + packet.data[2]
-    register = (packet.data[1] << 8) + packet.data[0]
+    try:
+        register, value = decode_telemetry(packet)
+    except ValueError as e:
+        log.warning(e)
+        return
 
     try:
         register_name = REGISTERS[register]
@@ -56,6 +138,7 @@ def handle_register(packet):
     log_packet(packet, 'reg:{} value:{} hex:{}'.format(register_name, value, hex(value)))
 
 
+@handles('twi_msg')
 def handle_twi_msg(packet):
     try:
         twi_msg = TWI_MESSAGES[packet.data[0]]
@@ -65,99 +148,129 @@ def handle_twi_msg(packet):
     log_packet(packet, twi_msg)
 
 
+@handles('unsigned_data')
 def handle_unsigned_data(packet):
     data = [hex(d) for d in packet.data]  # Get the data, excluding the num_bytes
     log_packet(packet, 'unsigned_data: {}'.format(data))
 
 
+@handles('signed_data')
 def handle_signed_data(packet):
     # TODO test unsigned, then do this
     data = [hex(d) for d in packet.data]  # Get the data, excluding the num_bytes
     log_packet(packet, 'signed_data: {}'.format(data))
 
 
+@handles('word')
 def handle_word(packet):
-    word = (packet.data[1] << 8) + packet.data[0]
-    log_packet(packet, 'word:{} hex:{}'.format(word, hex(word)))
+    try:
+        word, = decode_telemetry(packet)
+    except ValueError as e:
+        log.warning(e)
+    else:
+        log_packet(packet, 'word:{} hex:{}'.format(word, hex(word)))
 
 
+@handles('byte')
 def handle_byte(packet):
-    data = packet.data
-    log_packet(packet, 'byte:{} hex:{}'.format(data[0], hex(data[0])))
+    try:
+        byte, = decode_telemetry(packet)
+    except ValueError as e:
+        log.warning(e)
+    else:
+        log_packet(packet, 'byte:{} hex:{}'.format(byte, hex(byte)))
 
 
+@handles('size32')
 def handle_size32(packet):
-    data = packet.data
-    size_32 = (data[3] << 24) + (data[2] << 16) + (data[1] << 8) + data[0]
-    log_packet(packet, 'size32:{} hex:{}'.format(size_32, hex(size_32)))
+    try:
+        size_32, = decode_telemetry(packet)
+    except ValueError as e:
+        log.warning(e)
+    else:
+        log_packet(packet, 'size32:{} hex:{}'.format(size_32, hex(size_32)))
 
 
+@handles('quaternion')
 def handle_quaternion(packet):
     handle_string(packet)
 
 
+@handles('yawpitchroll')
 def handle_yawpitchroll(packet):
-    s = ''.join([chr(b) for b in packet.data])
-
-    # Split into yaw, pitch, & roll
     try:
-        yaw, pitch, roll = [float(angle.strip()) for angle in s.split(',')]
+        yaw, pitch, roll = decode_telemetry(packet)
     except ValueError:
-        log.warning('Invalid yaw, pitch, roll: {}'.format(s))
+        log.warning('Invalid yaw, pitch, roll: {}'.format(bytes(packet.data)))
     else:
         log_packet(packet, 'yaw:{:>7.1f} pitch:{:>7.1f} roll:{:>7.1f}'.format(yaw, pitch, roll))
 
 
-def handle_user_input(packet):
-    s = ''.join([chr(b) for b in packet.data])
+@handles('motor_values')
+def handle_motor_values(packet):
+    try:
+        motors = decode_telemetry(packet)
+    except ValueError as e:
+        log.warning(e)
+    else:
+        log_packet(packet, 'm1:{:>5d} m2:{:>5d} m3:{:>5d} m4:{:>5d}'.format(*motors))
+
 
-    # Split into yaw, pitch, & roll
-    yaw, pitch, roll, throttle = [int(value) for value in s.split(',')]
-    log_packet(packet, 'yaw:{:>3d} pitch:{:>3d} roll:{:>3d} throttle:{:>3d}'
-                    .format(yaw, pitch, roll, throttle))
+@handles('pid_outputs')
+def handle_pid_outputs(packet):
+    try:
+        yaw, pitch, roll = decode_telemetry(packet)
+    except ValueError as e:
+        log.warning(e)
+    else:
+        log_packet(packet, 'yaw:{:>7.1f} pitch:{:>7.1f} roll:{:>7.1f}'.format(yaw, pitch, roll))
+
+
+@handles('user_input')
+def handle_user_input(packet):
+    try:
+        yaw, pitch, roll, throttle = decode_telemetry(packet)
+    except ValueError as e:
+        log.warning(e)
+    else:
+        log_packet(packet, 'yaw:{:>3d} pitch:{:>3d} roll:{:>3d} throttle:{:>3d}'
+                        .format(yaw, pitch, roll, throttle))
 
 
+@handles('downlink_yawpitchroll')
 def handle_downlink_yawpitchroll(packet):
     handle_string(packet, level=INFO)
 
 
+@handles('change_pid_gain')
 def handle_change_pid_gain(packet):
     handle_string(packet, level=INFO)
 
 
+@handles('debug')
 def handle_debug(packet):
     handle_string(packet, level=DEBUG)
 
 
+@handles('info')
 def handle_info(packet):
     handle_string(packet, level=INFO)
 
 
+@handles('warning')
 def handle_warning(packet):
     handle_string(packet, level=WARNING)
 
 
+@handles('error')
 def handle_error(packet):
     handle_string(packet, level=ERROR)
 
 
+@handles('invalid_checksum')
 def handle_invalid_checksum(packet):
     handle_string(packet, level=WARNING)
 
 
 def dispatch_packet(packet):
-    # if op-code doesn't exists, log a warning
-    if packet.op_code not in opcode_to_str:
-        log.warning('Invalid op-code \'{}\''.format(packet.op_code))
-
-    else:  # otherwise check if this module has a handler
-        handler = 'handle_' + opcode_to_str[packet.op_code]
-
-        log.debug('Dispatching packet to {}'.format(handler))
-
-        # log if this module doesn't have a handler
-        if not hasattr(sys.modules[__name__], handler):
-            log.warning('No handler for {}'.format(handler))
-
-        else:  # otherwise, dispatch the packet to the handler
-            getattr(sys.modules[__name__], handler)(packet)
+    _dispatch_table[packet.op_code](packet)
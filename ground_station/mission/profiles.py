@@ -0,0 +1,240 @@
+"""Input mapping profiles loaded from YAML
+
+Each profile is compiled once into a flat table keyed by (device, input id, action), where joystick axes carry a
+lookup table from axis position to flight units instead of a conversion callback. The nested mapping map_input walks
+is built from the same compiled events, so both views agree.
+
+The profiles file is watched by polling its modification time. An edit is compiled off the input thread and swapped
+in by replacing one reference, and a file that doesn't compile leaves the loaded profiles as they were.
+"""
+from logging import getLogger
+import os
+from pathlib import Path
+from threading import Event, Thread
+
+import yaml
+
+from .events import CommandEvent, ControlEvent
+from .user_mappings import convert_to_flight_units, FULL_NEGATIVE, FULL_POSITIVE
+
+DEFAULT_PROFILES = Path(__file__).with_name('profiles.yaml')
+
+AXIS_STEPS = 200  # axis lookup table steps across -1.0 <= x <= 1.0, one per half flight unit
+
+log = getLogger(__name__)
+
+
+def axis_table(invert=False):
+    """Flight units of every axis position, indexed by int((x + 1) * AXIS_STEPS / 2)"""
+    # each entry is converted at the middle of its step, away from the float error at the step's edges
+    table = [convert_to_flight_units((2 * i + 1) / AXIS_STEPS - 1) for i in range(AXIS_STEPS + 1)]
+
+    return table[::-1] if invert else table
+
+
+def axis_callback(table):
+    """map_input axis callback that looks positions up in table"""
+    half = AXIS_STEPS / 2
+
+    def to_flight_units(x):
+        return table[int((x + 1) * half)]
+
+    return to_flight_units
+
+
+def _axis(name, where):
+    try:
+        return ControlEvent[str(name).upper()]
+    except KeyError:
+        raise ValueError('{}: unknown axis {}'.format(where, name))
+
+
+def _flight_units(value, where):
+    """Compile an axis' flight units, which Controls sends as one byte"""
+    try:
+        units = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('{}: expected flight units, got {}'.format(where, value))
+
+    if not FULL_NEGATIVE <= units <= FULL_POSITIVE:
+        raise ValueError('{}: {} flight units is outside {}..{}'.format(where, units, FULL_NEGATIVE, FULL_POSITIVE))
+
+    return units
+
+
+def _event(value, where):
+    """Compile an action's [axis, flight units] or command name"""
+    if isinstance(value, list) and len(value) == 2:
+        return _axis(value[0], where), _flight_units(value[1], where)
+
+    try:
+        return (CommandEvent[str(value).upper()],)
+    except KeyError:
+        raise ValueError('{}: expected [axis, flight units] or a command, got {}'.format(where, value))
+
+
+class Profile(object):
+    """One compiled mapping profile"""
+    def __init__(self, name, config):
+        """
+        :param str name: name of the profile
+        :param dict config: the profile's entry in the profiles file
+        :raises ValueError: if the profile isn't valid
+        """
+        self.name = name
+        self.table = dict()  # (device, input id, action): event. axes map to (ControlEvent, lookup table)
+
+        config = config or dict()
+        keyboard = dict()
+        joystick = config.get('joystick') or dict()
+        axes = dict()
+        buttons = dict()
+
+        for key, actions in (config.get('keyboard') or dict()).items():
+            keyboard[str(key)] = self._inputs('keyboard', str(key), actions)
+
+        for button, actions in (joystick.get('buttons') or dict()).items():
+            buttons[int(button)] = self._inputs('button', int(button), actions)
+
+        for number, entry in (joystick.get('axis') or dict()).items():
+            where = '{} axis {}'.format(name, number)
+            entry = entry if isinstance(entry, dict) else {'axis': entry}
+            table = axis_table(entry.get('invert', False))
+            axis = _axis(entry.get('axis'), where)
+
+            self.table['joystick', int(number), 'axis'] = axis, table
+            axes[int(number)] = axis, axis_callback(table)
+
+        # the nested view map_input walks
+        self.mapping = {
+            'keyboard': keyboard,
+            'joystick': {
+                'axis': axes,
+                'buttons': buttons,
+            },
+        }
+
+    def _inputs(self, device, input_id, actions):
+        where = '{} {} {}'.format(self.name, device, input_id)
+
+        if not isinstance(actions, dict):
+            raise ValueError('{}: expected actions, got {}'.format(where, actions))
+
+        compiled = {action: _event(value, where) for action, value in actions.items()}
+
+        for action, event in compiled.items():
+            self.table[device, input_id, action] = event
+
+        return compiled
+
+    def event(self, device, input_id, action, value=None):
+        """Event an input maps to, or None
+
+        :param value: axis position, -1.0 <= value <= 1.0, for joystick axes
+        """
+        event = self.table.get((device, input_id, action))
+
+        if event is None or action != 'axis':
+            return event
+
+        axis, table = event
+        return axis, table[int((value + 1) * AXIS_STEPS / 2)]
+
+    def __repr__(self):
+        return 'Profile({})'.format(self.name)
+
+
+def load_profiles(path=DEFAULT_PROFILES):
+    """Compile every profile in a profiles file
+
+    :return: {name: Profile}
+    :raises ValueError: if the file doesn't describe valid profiles
+    """
+    with open(path) as f:
+        config = yaml.safe_load(f) or dict()
+
+    if not isinstance(config, dict) or not config:
+        raise ValueError('{}: no profiles'.format(path))
+
+    return {str(name): Profile(str(name), profile) for name, profile in config.items()}
+
+
+class Profiles(object):
+    """Compiled profiles of a profiles file, reloaded when the file changes
+
+    Profiles are looked up by name in a dict that a reload replaces as a whole, so lookups never lock and never see
+    a half loaded file.
+    """
+    def __init__(self, path=DEFAULT_PROFILES, poll_interval=1.0, on_reload=None):
+        """
+        :param path: profiles file
+        :param float poll_interval: seconds between checks of the file's modification time. None to not watch it
+        :param callable on_reload: called with no arguments after changed profiles are swapped in
+        """
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.on_reload = on_reload
+
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self._profiles = load_profiles(self.path)
+        self._stop = Event()
+        self._thread = None
+
+        self.reloads = 0
+
+    def __getitem__(self, name):
+        return self._profiles[name]
+
+    def __contains__(self, name):
+        return name in self._profiles
+
+    def reload(self):
+        """Recompile the profiles if the file changed since they were loaded
+
+        :return: True if new profiles were swapped in
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+
+            if mtime == self._mtime:
+                return False
+
+            self._mtime = mtime
+            profiles = load_profiles(self.path)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            log.error('Keeping the loaded input profiles. Could not load {}: {}'.format(self.path, e))
+            return False
+
+        missing = set(self._profiles) - set(profiles)
+
+        if missing:
+            log.error('Keeping the loaded input profiles. {} has no {}'.format(self.path, ', '.join(sorted(missing))))
+            return False
+
+        self._profiles = profiles
+        self.reloads += 1
+        log.info('Reloaded input profiles from {}'.format(self.path))
+
+        if self.on_reload is not None:
+            self.on_reload()
+
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload()
+
+    def start(self):
+        """Watch the file on a daemon thread"""
+        if self.poll_interval is None or self._thread is not None:
+            return
+
+        self._thread = Thread(name='Input Profiles', target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
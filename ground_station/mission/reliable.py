@@ -0,0 +1,238 @@
+"""Sequenced commands with acknowledgement and retransmit
+
+A reliable command goes up wrapped in a 'sequenced' frame holding a sequence number and the command's op-code. The
+vehicle runs the command and answers with an 'ack' frame holding the same two bytes. Commands that aren't
+acknowledged within the retransmission timeout are sent again, up to max_retries times.
+
+The timeout follows RFC 6298: a smoothed round-trip time and its variation are updated from every command
+acknowledged without being retransmitted, and the timeout doubles on every timeout until the next sample. Commands
+sent before the last doubling that time out together are one timeout, and double it once.
+"""
+from collections import deque
+from logging import getLogger
+from queue import Empty
+from threading import Lock
+import time
+
+from .codecs import get_codec
+from .encoder import FrameTemplate
+from .metrics import Histogram
+from .opcodes import opcode_to_hex, opcode_to_str
+
+# RFC 6298 constants
+ALPHA = 1/8
+BETA = 1/4
+K = 4
+
+SEQUENCE_SPACE = 256  # sequence numbers are one byte
+
+log = getLogger(__name__)
+
+
+def ack_handler(acks):
+    """Dispatch table handler that queues (sequence, op-code, monotonic time) of every ack frame
+
+    :param acks: queue type object, like a multiprocessing.Queue when acks are received in another process
+    """
+    codec = get_codec('ack')
+
+    def handle_ack(packet):
+        try:
+            sequence, op_code = codec.decode(packet.data)
+        except ValueError as e:
+            log.warning(e)
+            return
+
+        acks.put((sequence, op_code, time.monotonic()))
+
+    return handle_ack
+
+
+class Pending(object):
+    """A command sent and waiting for its ack"""
+    __slots__ = ('sequence', 'op_code', 'frame', 'first_sent', 'sent', 'deadline', 'retries')
+
+    def __init__(self, sequence, op_code, frame):
+        self.sequence = sequence
+        self.op_code = op_code
+        self.frame = frame
+        self.first_sent = None
+        self.sent = None
+        self.deadline = None
+        self.retries = 0
+
+
+class ReliableCommands(object):
+    """Queue of sequenced command frames for an uplink Service
+
+    get() hands the service one frame per step: the oldest retransmit that is due, otherwise the next new command as
+    long as fewer than max_in_flight commands wait for an ack. Acks are read from the acks queue at every step. Like
+    Controls, it stands in for the queue a Service reads events from.
+    """
+    def __init__(self, acks, max_in_flight=4, initial_rto=1.0, min_rto=0.2, max_rto=10.0, max_retries=5,
+                 clock=time.monotonic):
+        """
+        :param acks: queue of (sequence, op-code, monotonic time) filled by ack_handler
+        :param int max_in_flight: most commands waiting for an ack at once. The rest wait their turn, in order
+        :param float initial_rto: seconds before the first retransmit until a round-trip time is measured
+        :param float min_rto: least seconds before a retransmit
+        :param float max_rto: most seconds before a retransmit
+        :param int max_retries: retransmits of a command before it is given up on
+        :param callable clock: monotonic clock returning seconds, the same one the acks are timed with
+        """
+        if not 0 < max_in_flight < SEQUENCE_SPACE // 2:
+            raise ValueError('max_in_flight must be between 1 and {}'.format(SEQUENCE_SPACE // 2 - 1))
+
+        self.log = getLogger(self.__class__.__name__)
+
+        self.acks = acks
+        self.max_in_flight = max_in_flight
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.max_retries = max_retries
+        self._clock = clock
+
+        self._template = FrameTemplate('sequenced')
+        self._waiting = deque()  # commands not sent yet
+        self._in_flight = dict()  # sequence: Pending
+        self._sequence = 0
+        self._lock = Lock()
+
+        self.rto = initial_rto
+        self._backed_off = None  # when the timeout last doubled
+        self.srtt = None
+        self.rttvar = None
+
+        self.sent = 0
+        self.retransmits = 0
+        self.acknowledged = 0
+        self.failed = 0
+        self.unmatched_acks = 0
+        self.rtt = Histogram(minimum=1e-4, maximum=100.0, buckets_per_decade=20)
+        self.latency = dict()  # op-code name: Histogram of seconds from first send to ack
+
+    def put(self, op_code):
+        """Queue a command
+
+        :param op_code: op-code as a number or a name from opcodes.opcode_to_str
+        """
+        op_code = opcode_to_hex[op_code] if isinstance(op_code, str) else op_code
+
+        with self._lock:
+            sequence = self._sequence
+            self._sequence = (sequence + 1) % SEQUENCE_SPACE
+            self._waiting.append(Pending(sequence, op_code, bytes(self._template.encode(sequence, op_code))))
+
+    def get(self, block=False):
+        """Next frame to send
+
+        :raises queue.Empty: if nothing is due
+        """
+        with self._lock:
+            now = self._clock()
+            self._read_acks()
+
+            pending = self._due(now)
+
+            if pending is not None:
+                pending.retries += 1
+                self.retransmits += 1
+
+                # back off until a new sample, once per timeout. a command sent before the last back off timed out
+                # with the commands that caused it
+                if self._backed_off is None or pending.sent >= self._backed_off:
+                    self.rto = min(self.rto * 2, self.max_rto)
+                    self._backed_off = now
+
+                self.log.warning('Retransmitting {} (sequence {}), attempt {}'
+                                 .format(opcode_to_str.get(pending.op_code), pending.sequence, pending.retries + 1))
+            elif self._waiting and len(self._in_flight) < self.max_in_flight:
+                pending = self._waiting.popleft()
+                pending.first_sent = now
+                self._in_flight[pending.sequence] = pending
+                self.sent += 1
+            else:
+                raise Empty
+
+            pending.sent = now
+            pending.deadline = now + self.rto
+
+            return pending.frame
+
+    def _due(self, now):
+        """Oldest in-flight command whose timeout ran out, giving up on the ones out of retries"""
+        for pending in list(self._in_flight.values()):
+            if pending.deadline > now:
+                continue
+
+            if pending.retries < self.max_retries:
+                return pending
+
+            del self._in_flight[pending.sequence]
+            self.failed += 1
+            self.log.error('{} (sequence {}) was not acknowledged after {} retransmits. Giving up'
+                           .format(opcode_to_str.get(pending.op_code), pending.sequence, pending.retries))
+
+        return None
+
+    def _read_acks(self):
+        while True:
+            try:
+                sequence, op_code, t = self.acks.get_nowait()
+            except Empty:
+                return
+
+            self._acknowledge(sequence, op_code, t)
+
+    def _acknowledge(self, sequence, op_code, t):
+        """Match an ack to its in-flight command. Called with the lock held"""
+        pending = self._in_flight.get(sequence)
+
+        if pending is None or pending.op_code != op_code:
+            self.unmatched_acks += 1  # duplicate ack of a retransmitted command, or a stale one
+            return
+
+        del self._in_flight[sequence]
+        self.acknowledged += 1
+
+        name = opcode_to_str.get(op_code, hex(op_code))
+
+        if name not in self.latency:
+            self.latency[name] = Histogram(minimum=1e-4, maximum=100.0, buckets_per_decade=20)
+
+        self.latency[name].record(t - pending.first_sent)
+
+        if pending.retries == 0:  # Karn's algorithm: an ack of a retransmitted command can't be timed
+            self._sample(t - pending.sent)
+
+    def _sample(self, rtt):
+        """Update the smoothed round-trip time and the timeout, RFC 6298 section 2"""
+        self.rtt.record(rtt)
+
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+
+        self.rto = min(max(self.srtt + K * self.rttvar, self.min_rto), self.max_rto)
+
+    def qsize(self):
+        return len(self._waiting) + len(self._in_flight)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sent': self.sent,
+                'retransmits': self.retransmits,
+                'acknowledged': self.acknowledged,
+                'failed': self.failed,
+                'unmatched_acks': self.unmatched_acks,
+                'in_flight': len(self._in_flight),
+                'waiting': len(self._waiting),
+                'srtt': self.srtt,
+                'rto': self.rto,
+                'rtt': self.rtt.snapshot(),
+                'latency': {name: histogram.snapshot() for name, histogram in self.latency.items()},
+            }
@@ -0,0 +1,215 @@
+"""Shared memory ring buffer of received frames, one writer and any number of readers
+
+The receiver publishes the op-code, timestamp and payload of every valid frame. Readers in other processes attach by
+name and decode payloads with codecs, without pickling or pipes. Each reader has its own cursor and the writer never
+waits for readers: a reader that falls more than a ring's worth of frames behind loses the oldest ones and counts
+them as lost.
+
+Layout:
+[MAGIC] [SLOTS u32] [SLOT SIZE u32] [WRITTEN u64] [padding] [SLOT] ...
+SLOT: [SEQUENCE u64] [TIMESTAMP f64] [OP-CODE u8] [LENGTH u8] [PAYLOAD] ...
+
+WRITTEN is the number of frames ever published, kept only in the shared memory so a writer that is restarted, or
+attaches to the ring of one that died, carries on from it. Frame n goes in slot n % SLOTS. Its slot's SEQUENCE is 2n + 1 while
+the writer fills it and 2n + 2 once it's complete, so a reader can tell a complete slot of the frame it wants from
+one that is being written or was overwritten. Counters are aligned 8 byte words, read and written in one access,
+and x86 keeps the writer's stores in order.
+"""
+from multiprocessing import resource_tracker, shared_memory
+import struct
+import sys
+import time
+
+from .codecs import get_codec
+from .packet import MAX_PACKET_DATA_SIZE
+
+MAGIC = b'GSRING\x01\x00'
+
+HEADER = struct.Struct('<8sIIQ')
+HEADER_SIZE = 64
+WRITTEN_OFFSET = 16
+
+SEQUENCE = struct.Struct('<Q')
+WORD = struct.Struct('<Q')
+SLOT = struct.Struct('<dBB')  # timestamp, op-code & payload length after the sequence
+PAYLOAD_OFFSET = SEQUENCE.size + SLOT.size
+SLOT_SIZE = (PAYLOAD_OFFSET + MAX_PACKET_DATA_SIZE + 7) // 8 * 8
+
+DEFAULT_SLOTS = 4096
+
+# rings created by this process, or the process it was forked from
+_created = set()
+
+
+def _attach(name):
+    """Open shared memory some other process owns, without this process's resource tracker unlinking it at exit"""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+
+    memory = shared_memory.SharedMemory(name)
+
+    # before 3.13 attaching always registers the memory. the tracker keys it by the posix name, with the leading
+    # slash .name strips, and only the private _name holds that. tested on 3.11
+    resource_tracker.unregister(memory._name, 'shared_memory')
+
+    return memory
+
+
+class RingWriter(object):
+    """Creates the shared memory and publishes frames to it"""
+    def __init__(self, name=None, slots=DEFAULT_SLOTS, attach=False):
+        """
+        :param str name: shared memory name readers attach with. None for a generated one, see .name
+        :param int slots: frames the ring holds
+        :param bool attach: publish to the ring already named name if there is one, left behind by a writer that
+            died, instead of failing
+        :raises ValueError: if attaching to shared memory that isn't a frame ring of this many slots
+        """
+        self.slots = slots
+
+        try:
+            self._memory = shared_memory.SharedMemory(name, create=True, size=HEADER_SIZE + slots * SLOT_SIZE)
+        except FileExistsError:
+            if not attach:
+                raise
+
+            self._memory = shared_memory.SharedMemory(name)
+            self._buf = self._memory.buf
+            magic, ring_slots, slot_size, _ = HEADER.unpack_from(self._buf, 0)
+
+            if magic != MAGIC or ring_slots != slots or slot_size != SLOT_SIZE:
+                self.close()
+                raise ValueError('{} is not a frame ring of {} slots'.format(name, slots))
+        else:
+            self._buf = self._memory.buf
+            HEADER.pack_into(self._buf, 0, MAGIC, slots, SLOT_SIZE, 0)
+
+        _created.add(self._memory.name)
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    @property
+    def written(self):
+        return WORD.unpack_from(self._buf, WRITTEN_OFFSET)[0]
+
+    def publish(self, op_code, payload, t=None):
+        """Publish a frame, overwriting the oldest one once the ring is full
+
+        :param int op_code: frame's op-code
+        :param payload: frame's data, at most MAX_PACKET_DATA_SIZE bytes
+        :param float t: time the frame was received. Defaults to now
+        """
+        buf = self._buf
+        n = WORD.unpack_from(buf, WRITTEN_OFFSET)[0]
+        offset = HEADER_SIZE + n % self.slots * SLOT_SIZE
+
+        SEQUENCE.pack_into(buf, offset, 2 * n + 1)
+        SLOT.pack_into(buf, offset + SEQUENCE.size, time.monotonic() if t is None else t, op_code, len(payload))
+        buf[offset + PAYLOAD_OFFSET:offset + PAYLOAD_OFFSET + len(payload)] = payload
+        SEQUENCE.pack_into(buf, offset, 2 * n + 2)
+
+        WORD.pack_into(buf, WRITTEN_OFFSET, n + 1)
+
+    def close(self):
+        self._buf = None
+        self._memory.close()
+
+    def unlink(self):
+        """Remove the shared memory once every process has closed it"""
+        self._memory.unlink()
+        _created.discard(self._memory.name)
+
+
+class RingReader(object):
+    """Reads frames from a ring created by a RingWriter, from its own cursor"""
+    def __init__(self, name, from_start=False):
+        """
+        :param str name: shared memory name of the ring
+        :param bool from_start: start at the oldest frame still in the ring instead of the next one published
+        """
+        # the writer owns the memory. the writer's own process shares its registration
+        self._memory = shared_memory.SharedMemory(name) if name in _created else _attach(name)
+
+        self._buf = self._memory.buf
+        magic, self.slots, slot_size, written = HEADER.unpack_from(self._buf, 0)
+
+        if magic != MAGIC or slot_size != SLOT_SIZE:
+            self.close()
+            raise ValueError('{} is not a frame ring'.format(name))
+
+        self.cursor = max(0, written - self.slots) if from_start else written  # number of the next frame to read
+        self.lost = 0  # frames overwritten before this reader got to them
+
+    @property
+    def available(self):
+        """Number of frames published and not read yet, including any already lost"""
+        return WORD.unpack_from(self._buf, WRITTEN_OFFSET)[0] - self.cursor
+
+    def _skip(self, written):
+        """Move the cursor past frames the writer overwrote"""
+        oldest = max(written - self.slots + 1, self.cursor + 1)  # the oldest slot may be being written
+        self.lost += oldest - self.cursor
+        self.cursor = oldest
+
+    def read(self, count=None):
+        """Read frames, oldest first, never blocking
+
+        :param int count: most frames to read. None for every frame available
+        :return: list of (timestamp, op-code, payload bytes)
+        """
+        buf = self._buf
+        frames = []
+
+        while count is None or len(frames) < count:
+            written = WORD.unpack_from(buf, WRITTEN_OFFSET)[0]
+
+            if self.cursor >= written:
+                break
+
+            if written - self.cursor > self.slots:
+                self._skip(written)
+                continue
+
+            n = self.cursor
+            offset = HEADER_SIZE + n % self.slots * SLOT_SIZE
+            sequence = SEQUENCE.unpack_from(buf, offset)[0]
+
+            t, op_code, length = SLOT.unpack_from(buf, offset + SEQUENCE.size)
+            payload = bytes(buf[offset + PAYLOAD_OFFSET:offset + PAYLOAD_OFFSET + length])
+
+            # the writer lapped this reader while it copied the slot
+            if sequence != 2 * n + 2 or SEQUENCE.unpack_from(buf, offset)[0] != sequence:
+                self._skip(WORD.unpack_from(buf, WRITTEN_OFFSET)[0])
+                continue
+
+            frames.append((t, op_code, payload))
+            self.cursor = n + 1
+
+        return frames
+
+    def decoded(self, count=None):
+        """Read frames and decode their payloads with codecs
+
+        :return: list of (timestamp, op-code, record). Frames of op-codes without a schema or with a payload that
+            doesn't match it are skipped
+        """
+        records = []
+
+        for t, op_code, payload in self.read(count):
+            codec = get_codec(op_code)
+
+            if codec is None:
+                continue
+
+            try:
+                records.append((t, op_code, codec.decode(payload)))
+            except ValueError:
+                pass
+
+        return records
+
+    def close(self):
+        self._buf = None
+        self._memory.close()
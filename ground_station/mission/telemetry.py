@@ -0,0 +1,111 @@
+import time
+
+import numpy as np
+
+from .codecs import get_codec
+from .opcodes import opcode_to_hex
+
+# numpy types for the codec field types
+NUMPY_TYPES = {
+    'u8': 'u1',
+    'i8': 'i1',
+    'u16le': '<u2',
+    'i16': '<i2',
+    'i16le': '<i2',
+    'u32le': '<u4',
+    'i32': '<i4',
+    'i32le': '<i4',
+    'f32': '<f4',
+}
+
+DEFAULT_CAPACITY = 4096
+
+
+class RingBuffer(object):
+    """Fixed capacity time series of decoded telemetry
+
+    Samples are rows of a numpy structured array with a 't' timestamp column, from time.monotonic, followed by the
+    decoded fields. Once full, every append overwrites the oldest sample, so memory stays the same however long a
+    session runs. Queries return copies in time order.
+    """
+    def __init__(self, fields, capacity=DEFAULT_CAPACITY):
+        """
+        :param list fields: (field name, field type) pairs, as in codecs.SCHEMAS
+        :param int capacity: number of samples kept
+        """
+        self.dtype = np.dtype([('t', '<f8')] + [(name, NUMPY_TYPES[field_type]) for name, field_type in fields])
+        self.capacity = capacity
+
+        self._data = np.zeros(capacity, dtype=self.dtype)
+        self._appended = 0
+
+    def __len__(self):
+        return min(self._appended, self.capacity)
+
+    @property
+    def appended(self):
+        """Number of samples ever appended"""
+        return self._appended
+
+    def append(self, values, t=None):
+        """Append a sample
+
+        :param values: field values in schema order
+        :param float t: timestamp. Defaults to now
+        """
+        self._data[self._appended % self.capacity] = (time.monotonic() if t is None else t, ) + tuple(values)
+        self._appended += 1
+
+    def _segments(self):
+        """Oldest to newest slices of the underlying array"""
+        if self._appended <= self.capacity:
+            return self._data[:self._appended],
+
+        head = self._appended % self.capacity
+        return self._data[head:], self._data[:head]
+
+    def all(self):
+        return np.concatenate(self._segments())
+
+    def last(self, n):
+        """The last n samples, oldest first"""
+        n = min(n, len(self))
+        indices = np.arange(self._appended - n, self._appended) % self.capacity
+
+        return self._data[indices]
+
+    def since(self, t):
+        """Every sample with a timestamp of t or later, oldest first"""
+        return np.concatenate([segment[np.searchsorted(segment['t'], t):] for segment in self._segments()])
+
+    def clear(self):
+        self._appended = 0
+
+
+class Telemetry(object):
+    """Ring buffer per op-code, created the first time the op-code's telemetry is appended"""
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._buffers = dict()
+
+    def append(self, op_code, values, t=None):
+        try:
+            buffer = self._buffers[op_code]
+        except KeyError:
+            buffer = self._buffers[op_code] = RingBuffer(get_codec(op_code).fields, self.capacity)
+
+        buffer.append(values, t)
+
+    def get(self, op_code):
+        """Ring buffer of an op-code, by number or name. None until it has telemetry"""
+        if isinstance(op_code, str):
+            op_code = opcode_to_hex[op_code]
+
+        return self._buffers.get(op_code)
+
+    def __iter__(self):
+        return iter(self._buffers.items())
+
+
+# filled by the packet handlers
+telemetry = Telemetry()
@@ -0,0 +1,89 @@
+import os
+import time
+
+from .capture import CaptureReader, CaptureWriter, index_path
+from .opcodes import opcode_to_hex
+from .packet import generate_packet
+
+
+def test_write_and_seek(tmp_path):
+    path = str(tmp_path / 'flight.cap')
+    word = bytes(generate_packet(opcode_to_hex['word'], [1, 2]))
+    byte = bytes(generate_packet(opcode_to_hex['byte'], [3]))
+
+    with CaptureWriter(path) as writer:
+        for i in range(120):
+            writer.write(word if i % 2 else byte, valid=i != 5, t=100.0 + i)
+
+    with CaptureReader(path) as reader:
+        assert len(reader) == 120
+        assert reader.start_time == 100.0
+
+        i = reader.seek(60)
+        t, raw, valid = reader.record(i)
+        assert (t, bytes(raw), valid) == (160.0, byte, True)
+        assert not reader.record(5)[2]
+
+        words = [bytes(raw) for _, raw, _ in reader.records(start=i, op_codes=[opcode_to_hex['word']])]
+        assert words == [word] * 30
+
+
+def test_missing_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'flight.cap')
+    frame = bytes(generate_packet(opcode_to_hex['byte'], [3]))
+
+    with CaptureWriter(path) as writer:
+        writer.write(frame, t=1.0)
+        writer.write(frame, t=2.0)
+
+    (tmp_path / 'flight.cap.idx').unlink()
+
+    with CaptureReader(path) as reader:
+        assert [t for t, _, _ in reader.records()] == [1.0, 2.0]
+
+    assert index_path(path).endswith('.idx')
+
+
+def test_record_cut_off_mid_frame_is_skipped(tmp_path):
+    path = str(tmp_path / 'flight.cap')
+    frame = bytes(generate_packet(opcode_to_hex['word'], [1, 2]))
+
+    with CaptureWriter(path) as writer:
+        writer.write(frame, t=1.0)
+        writer.write(frame, t=2.0)
+
+    os.truncate(path, os.path.getsize(path) - 2)  # the last frame was still being written
+
+    with CaptureReader(path) as reader:
+        assert [(t, bytes(raw)) for t, raw, _ in reader.records()] == [(1.0, frame)]
+
+
+def test_append_after_losing_the_index(tmp_path):
+    path = str(tmp_path / 'flight.cap')
+    frame = bytes(generate_packet(opcode_to_hex['byte'], [3]))
+
+    with CaptureWriter(path) as writer:
+        writer.write(frame, t=1.0)
+
+    (tmp_path / 'flight.cap.idx').unlink()
+
+    with CaptureWriter(path) as writer:
+        writer.write(frame, t=2.0)
+
+    with CaptureReader(path) as reader:
+        assert [(t, bytes(raw)) for t, raw, _ in reader.records()] == [(1.0, frame), (2.0, frame)]
+
+
+def test_poll_flushes_a_quiet_link(tmp_path):
+    path = str(tmp_path / 'flight.cap')
+    frame = bytes(generate_packet(opcode_to_hex['byte'], [3]))
+
+    with CaptureWriter(path, flush_interval=0.05) as writer:
+        writer.write(frame, t=1.0)
+        assert os.path.getsize(path) == 0  # still buffered
+
+        time.sleep(0.05)
+        writer.poll()
+
+        with CaptureReader(path) as reader:
+            assert len(reader) == 1
@@ -0,0 +1,43 @@
+import random
+
+from .checksum import get_checksum, validate_frames
+
+
+def reference_checksum(data):
+    """get_checksum as it was before it took bytes type objects"""
+    checksum = 0
+
+    for d in data:
+        checksum += d
+
+    checksum = checksum % 0x100
+
+    return ~checksum + 2**8
+
+
+def test_matches_reference():
+    rng = random.Random(0)
+
+    for size in range(0, 70):
+        data = bytes(rng.randrange(256) for _ in range(size))
+
+        assert get_checksum(data) == reference_checksum(data)
+        assert get_checksum(bytearray(data)) == reference_checksum(data)
+        assert get_checksum(memoryview(data)) == reference_checksum(data)
+        assert get_checksum(list(data)) == reference_checksum(data)
+
+
+def test_validate_frames():
+    frames = [bytes([0x42, 2, 7, i]) for i in range(5)]
+    frames = [frame + bytes([get_checksum(frame)]) for frame in frames]
+    frames[3] = frames[3][:-1] + bytes([frames[3][-1] ^ 1])
+
+    buf = b'\x00'.join(frames)
+    starts = [i * 6 for i in range(5)]
+    stops = [start + 5 for start in starts]
+
+    assert list(validate_frames(buf, starts, stops)) == [True, True, True, False, True]
+
+
+def test_validate_no_frames():
+    assert len(validate_frames(b'\x42\x00', [], [])) == 0
@@ -0,0 +1,42 @@
+import struct
+
+import pytest
+
+from .codecs import decode, get_codec
+from .opcodes import opcode_to_hex
+from .packet import generate_packet, packet
+
+
+def test_binary_yawpitchroll():
+    data = list(struct.pack('<fff', 1.5, -2.0, 180.0))
+    p = packet(generate_packet(opcode_to_hex['yawpitchroll'], data))
+
+    assert decode(p) == (1.5, -2.0, 180.0)
+    assert decode(p).pitch == -2.0
+
+
+def test_text_yawpitchroll():
+    data = [ord(c) for c in ' 1.5, -2.0,180.0']
+    p = packet(generate_packet(opcode_to_hex['yawpitchroll'], data))
+
+    assert decode(p) == (1.5, -2.0, 180.0)
+
+
+@pytest.mark.parametrize('text', ['300,-1,50,50', '50,-1,50,50'])
+def test_text_user_input_out_of_range(text):
+    p = packet(generate_packet(opcode_to_hex['user_input'], list(text.encode())))
+
+    with pytest.raises(ValueError):
+        decode(p)
+
+
+def test_register_matches_manual_shifts():
+    p = packet(generate_packet(opcode_to_hex['register'], [0x9a, 0x00, 0x34, 0x12]))
+
+    assert decode(p) == (0x9a, 0x1234)
+
+
+def test_encode_round_trip():
+    codec = get_codec('motor_values')
+
+    assert codec.decode(codec.encode(1000, 1200, 1400, 2000)) == (1000, 1200, 1400, 2000)
@@ -0,0 +1,40 @@
+from multiprocessing import get_context
+
+from .controls import Controls
+from .opcodes import opcode_to_hex
+
+
+def test_update_is_one_change():
+    changes = []
+    controls = Controls(on_change=lambda: changes.append(controls.snapshot()))
+
+    assert controls.update(yaw=10, throttle=80)
+    assert not controls.update(yaw=10)
+
+    controls.pitch = 20
+
+    assert changes == [(10, 50, 50, 80), (10, 20, 50, 80)]
+    assert list(controls.get()) == [0x42, 5, opcode_to_hex['controls'], 10, 20, 50, 80, controls.get()[-1]]
+
+
+def _write(controls, updates):
+    for i in range(updates):
+        value = i % 200
+        controls.update(value, value, value, value)
+
+
+def test_snapshots_are_consistent_while_another_process_writes():
+    controls = Controls()
+    controls.update(0, 0, 0, 0)
+    writer = get_context('fork').Process(target=_write, args=(controls, 50000))
+    writer.start()
+
+    snapshots = set()
+
+    while writer.is_alive():
+        snapshots.add(controls.snapshot())
+
+    writer.join()
+
+    assert len(snapshots) > 1
+    assert all(len(set(snapshot)) == 1 for snapshot in snapshots)
@@ -0,0 +1,30 @@
+from .codecs import decode
+from .encoder import command, FrameTemplate
+from .opcodes import opcode_to_hex
+from .packet import generate_packet, packet
+
+
+def test_command_frames_are_built_once():
+    frame = command('flight_mode')
+
+    assert frame == bytes(generate_packet(opcode_to_hex['flight_mode']))
+    assert command(opcode_to_hex['flight_mode']) is frame
+
+
+def test_template_matches_generate_packet_and_reuses_its_buffer():
+    template = FrameTemplate('controls')
+    first = template.encode(10, 20, 30, 255)
+
+    assert first == bytearray(generate_packet(opcode_to_hex['controls'], [10, 20, 30, 255]))
+
+    second = template.encode(0, 1, 2, 3)
+
+    assert second is first
+    assert second == bytearray(generate_packet(opcode_to_hex['controls'], [0, 1, 2, 3]))
+
+
+def test_template_encodes_through_the_payload_schema():
+    template = FrameTemplate('pid_outputs')
+    record = decode(packet(bytes(template.encode(1.5, -2.0, 0.25))))
+
+    assert tuple(record) == (1.5, -2.0, 0.25)
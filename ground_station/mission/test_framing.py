@@ -0,0 +1,51 @@
+from .framing import FrameDecoder
+from .opcodes import opcode_to_hex
+from .packet import generate_packet
+
+
+def test_frames_split_across_reads():
+    frames = [bytes(generate_packet(opcode_to_hex['word'], [i, 0x42])) for i in range(3)]
+    stream = b''.join(frames)
+
+    decoder = FrameDecoder()
+    decoded = []
+
+    for i in range(len(stream)):
+        decoded += decoder.feed(stream[i:i + 1])
+
+    assert [p.raw for p in decoded] == frames
+    assert decoder.buffered == 0
+    assert decoder.bytes_discarded == 0
+
+
+def test_bytes_before_header_are_discarded():
+    frame = bytes(generate_packet(opcode_to_hex['byte'], [7]))
+
+    decoder = FrameDecoder()
+
+    assert [p.raw for p in decoder.feed(b'\x01\x02' + frame + frame[:2])] == [frame]
+    assert decoder.bytes_discarded == 2
+    assert decoder.buffered == 2
+
+
+def test_frame_inside_corrupt_frame_is_recovered():
+    good = bytes(generate_packet(opcode_to_hex['word'], [1, 2]))
+    # a header and size claiming more bytes than the good frame that follows, with no valid checksum
+    corrupt = bytes([0x42, len(good) + 2])
+
+    decoder = FrameDecoder()
+
+    assert [p.raw for p in decoder.feed(corrupt + good + b'\x00\x00\x00')] == [good]
+    assert decoder.checksum_errors == 1
+    assert decoder.frames_recovered == 1
+    assert decoder.bytes_discarded == len(corrupt) + 3
+
+
+def test_bad_size_rescans_from_next_byte():
+    good = bytes(generate_packet(opcode_to_hex['byte'], [9]))
+
+    decoder = FrameDecoder()
+
+    assert [p.raw for p in decoder.feed(b'\x42\xff' + good)] == [good]
+    assert decoder.size_errors == 1
+    assert decoder.bytes_discarded == 2
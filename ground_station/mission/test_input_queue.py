@@ -0,0 +1,55 @@
+from queue import Empty, Full
+
+import pytest
+
+from .events import CommandEvent, ControlEvent
+from .input_queue import InputQueue
+
+
+def test_latest_axis_value_wins_and_commands_keep_their_place():
+    queue = InputQueue()
+
+    for value in (10, 20, 30):
+        queue.put((ControlEvent.YAW, value))
+
+    queue.put((ControlEvent.THROTTLE, 5))
+    queue.put((CommandEvent.ENTER_FLIGHT_MODE, None))
+    queue.put((ControlEvent.YAW, 40))
+    queue.put((CommandEvent.LEVEL_QUAD, None))
+    queue.put((CommandEvent.DONE, None))
+
+    assert queue.qsize() == 5
+    assert [queue.get_nowait() for _ in range(5)] == [
+        {ControlEvent.YAW: 30, ControlEvent.THROTTLE: 5},
+        (CommandEvent.ENTER_FLIGHT_MODE, None),
+        {ControlEvent.YAW: 40},
+        (CommandEvent.LEVEL_QUAD, None),
+        (CommandEvent.DONE, None),
+    ]
+    assert queue.stats()['coalesced'] == 2
+
+    with pytest.raises(Empty):
+        queue.get_nowait()
+
+
+def test_jitter_within_the_deadband_is_dropped():
+    queue = InputQueue(deadband=2, quantum=1)
+
+    for value in (50.2, 50.9, 51.4, 49.6, 53.1):
+        queue.put((ControlEvent.ROLL, value))
+
+    assert queue.get_nowait() == {ControlEvent.ROLL: 53}
+    assert queue.stats()['filtered'] == 3
+
+
+def test_only_commands_are_bounded():
+    queue = InputQueue(maxsize=1)
+    queue.put((CommandEvent.DONE, None))
+
+    with pytest.raises(Full):
+        queue.put((CommandEvent.DONE, None), timeout=0.01)
+
+    for value in range(100):
+        queue.put((ControlEvent.PITCH, value))
+
+    assert queue.qsize() == 2
@@ -1,25 +1,31 @@
-import logging
-
-from packet import *
-from opcodes import opcode_to_hex
-
-
-log = logging.getLogger(__file__)
+from . import packet_handlers
+from .opcodes import opcode_to_hex
+from .packet import generate_packet, handle_packet, packet, PACKET_HEADER
 
 
 def test_handle_string():
     string = 'hello'
-    length = 1 + len(string) + 1  # length includes op_code, data, and crc
+    length = 1 + len(string)  # length includes op_code and data
     op_code = opcode_to_hex['string']
 
-    packet = [PACKET_HEADER, length, op_code, 'h', 'e', 'l', 'l', 'o']
+    data = generate_packet(op_code, [ord(c) for c in string])
+    p = packet(data)
+
+    assert data[:3] == [PACKET_HEADER, length, op_code]
+    assert bytes(p.data) == b'hello'
+    assert handle_packet(p)
 
-    checksum = get_checksum(packet)
 
-    packet.append(checksum)
+def test_bad_checksum_is_not_dispatched():
+    received = []
+    data = generate_packet(opcode_to_hex['byte'], [7])
+    data[-1] ^= 0xff
 
-    handle_packet(packet)
+    packet_handlers.register_handler(received.append, 'byte')
 
+    try:
+        assert not handle_packet(packet(data))
+    finally:
+        packet_handlers.register_handler(packet_handlers.handle_byte, 'byte')
 
-if __name__ == '__main__':
-    test_handle_string()
+    assert received == []
@@ -0,0 +1,57 @@
+from . import packet_handlers
+from .opcodes import opcode_to_hex
+from .packet import generate_packet, packet
+from .telemetry import telemetry
+
+
+def test_registered_handler_receives_packet():
+    received = []
+    p = packet(generate_packet(opcode_to_hex['motor_values'], [1, 2]))
+    previous = packet_handlers.get_handler('motor_values')
+
+    packet_handlers.register_handler(received.append, 'motor_values')
+
+    try:
+        packet_handlers.dispatch_packet(p)
+    finally:
+        packet_handlers.register_handler(previous, 'motor_values')  # the real handler, for the tests after this one
+
+    assert received == [p]
+    assert packet_handlers.get_handler('motor_values') is previous
+
+
+def test_unregistered_op_code_goes_to_fallback():
+    previous = packet_handlers.get_handler('motor_values')
+
+    packet_handlers.unregister_handler('motor_values')
+
+    try:
+        assert packet_handlers.get_handler('motor_values') is packet_handlers.handle_unknown
+    finally:
+        packet_handlers.register_handler(previous, 'motor_values')
+
+
+def test_unknown_op_code_goes_to_fallback():
+    received = []
+    p = packet(generate_packet(0xff))
+
+    packet_handlers.set_fallback(received.append)
+
+    try:
+        packet_handlers.dispatch_packet(p)
+    finally:
+        packet_handlers.set_fallback(packet_handlers.handle_unknown)
+
+    assert received == [p]
+
+
+def test_handler_appends_telemetry():
+    before = telemetry.get('user_input').appended if telemetry.get('user_input') else 0
+
+    packet_handlers.dispatch_packet(packet(generate_packet(opcode_to_hex['user_input'], list(b'25,50,75,100'))))
+    packet_handlers.dispatch_packet(packet(generate_packet(opcode_to_hex['user_input'], list(b'300,-1,50,50'))))
+
+    buffer = telemetry.get('user_input')
+
+    assert buffer.appended == before + 1  # the values that don't fit are logged and dropped
+    assert buffer.last(1)[['yaw', 'pitch', 'roll', 'throttle']].tolist() == [(25, 50, 75, 100)]
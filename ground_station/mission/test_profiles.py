@@ -0,0 +1,49 @@
+import os
+
+from .events import CommandEvent, ControlEvent
+from .profiles import load_profiles, Profiles
+from .user_mappings import convert_to_flight_units
+
+
+def test_default_profiles_compile_to_flat_tables():
+    profiles = load_profiles()
+    flight = profiles['flight']
+
+    assert flight.event('keyboard', 'w', 'key_down') == (ControlEvent.PITCH, 0)
+    assert flight.event('keyboard', 'f', 'key_down') == (CommandEvent.EXIT_FLIGHT_MODE,)
+    assert flight.event('keyboard', 'f', 'key_up') is None
+    assert profiles['non_flight'].event('keyboard', 'f', 'key_down') == (CommandEvent.ENTER_FLIGHT_MODE,)
+
+    axis, callback = flight.mapping['joystick']['axis'][0]
+
+    for x in (-1.0, -0.37, 0.0, 0.123, 0.5, 1.0):
+        assert flight.event('joystick', 0, 'axis', x) == (ControlEvent.ROLL, convert_to_flight_units(x))
+        assert callback(x) == convert_to_flight_units(x)
+
+
+def test_edits_are_reloaded_and_bad_files_are_ignored(tmp_path):
+    path = tmp_path / 'profiles.yaml'
+    path.write_text('flight:\n  keyboard:\n    w: {key_down: [pitch, 0]}\n')
+    reloaded = []
+    profiles = Profiles(path, poll_interval=None, on_reload=lambda: reloaded.append(True))
+
+    assert not profiles.reload()
+
+    path.write_text('flight:\n  keyboard:\n    w: {key_down: [pitch, 10]}\n')
+    os.utime(path, ns=(0, 1))
+
+    assert profiles.reload()
+    assert profiles['flight'].event('keyboard', 'w', 'key_down') == (ControlEvent.PITCH, 10)
+
+    path.write_text('flight:\n  keyboard:\n    w: {key_down: [sideways, 10]}\n')
+    os.utime(path, ns=(0, 2))
+
+    assert not profiles.reload()
+    assert profiles['flight'].event('keyboard', 'w', 'key_down') == (ControlEvent.PITCH, 10)
+
+    path.write_text('flight:\n  keyboard:\n    w: {key_down: [pitch, 300]}\n')
+    os.utime(path, ns=(0, 3))
+
+    assert not profiles.reload()
+    assert profiles['flight'].event('keyboard', 'w', 'key_down') == (ControlEvent.PITCH, 10)
+    assert reloaded == [True]
@@ -0,0 +1,119 @@
+from queue import Empty, SimpleQueue
+
+import pytest
+
+from .opcodes import opcode_to_hex
+from .packet import generate_packet, packet
+from .reliable import ack_handler, ReliableCommands
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def ack(acks, frame, t):
+    sequence, op_code = frame[3], frame[4]
+    acks.put((sequence, op_code, t))
+
+
+def test_acks_time_round_trips_and_cap_commands_in_flight():
+    acks, clock = SimpleQueue(), Clock()
+    commands = ReliableCommands(acks, max_in_flight=2, clock=clock)
+
+    for name in ('flight_mode', 'level_quad', 'done'):
+        commands.put(name)
+
+    first, second = commands.get(), commands.get()
+
+    assert first == bytes(generate_packet(opcode_to_hex['sequenced'], [0, opcode_to_hex['flight_mode']]))
+
+    with pytest.raises(Empty):
+        commands.get()  # two in flight already
+
+    ack(acks, first, 100.1)
+    clock.now = 100.1
+    third = commands.get()
+
+    assert third[3:5] == bytes([2, opcode_to_hex['done']])
+    assert commands.srtt == pytest.approx(0.1)
+    assert commands.rto == pytest.approx(0.3)  # srtt + 4 * srtt / 2
+    assert commands.stats()['latency']['flight_mode']['count'] == 1
+
+
+def test_unacknowledged_commands_are_retransmitted_with_backoff_then_dropped():
+    acks, clock = SimpleQueue(), Clock()
+    commands = ReliableCommands(acks, initial_rto=1.0, max_retries=2, clock=clock)
+    commands.put('non_flight_mode')
+
+    frame = commands.get()
+    clock.now += 1.0
+    assert commands.get() == frame
+    assert commands.rto == 2.0
+
+    clock.now += 2.0
+    assert commands.get() == frame
+
+    ack(acks, frame, clock.now + 0.5)  # acks of retransmits aren't timed
+    clock.now += 0.5
+
+    with pytest.raises(Empty):
+        commands.get()
+
+    assert commands.srtt is None
+    assert commands.stats()['retransmits'] == 2
+
+    commands.put('done')
+    commands.get()
+
+    for _ in range(2):
+        clock.now += commands.rto
+        commands.get()
+
+    clock.now += commands.rto
+
+    with pytest.raises(Empty):
+        commands.get()
+
+    assert commands.failed == 1
+    assert commands.stats()['in_flight'] == 0
+
+
+def test_commands_timing_out_together_back_off_once():
+    acks, clock = SimpleQueue(), Clock()
+    commands = ReliableCommands(acks, initial_rto=1.0, clock=clock)
+
+    for name in ('flight_mode', 'level_quad', 'done'):
+        commands.put(name)
+        commands.get()
+
+    clock.now += 1.0
+
+    for _ in range(3):
+        commands.get()
+
+    assert commands.retransmits == 3
+    assert commands.rto == 2.0
+
+    clock.now += 2.0
+    commands.get()
+
+    assert commands.rto == 4.0  # the retransmits timed out again
+
+
+def test_ack_handler_queues_sequence_and_op_code():
+    acks = SimpleQueue()
+    ack_handler(acks)(packet(generate_packet(opcode_to_hex['ack'], [7, opcode_to_hex['done']])))
+
+    sequence, op_code, _ = acks.get_nowait()
+    assert (sequence, op_code) == (7, opcode_to_hex['done'])
+
+
+def test_ack_handler_drops_short_acks():
+    acks = SimpleQueue()
+    ack_handler(acks)(packet(generate_packet(opcode_to_hex['ack'], [7])))
+
+    assert acks.empty()
@@ -0,0 +1,74 @@
+from multiprocessing import get_context
+
+from .opcodes import opcode_to_hex
+from .shared_ring import RingReader, RingWriter
+
+
+def test_readers_have_their_own_cursors():
+    writer = RingWriter(slots=8)
+    first = RingReader(writer.name)
+
+    try:
+        writer.publish(opcode_to_hex['word'], b'\x01\x00', t=1.0)
+        writer.publish(opcode_to_hex['word'], b'\x02\x00', t=2.0)
+
+        second = RingReader(writer.name, from_start=True)
+
+        assert first.read(1) == [(1.0, opcode_to_hex['word'], b'\x01\x00')]
+        assert [record.word for _, _, record in second.decoded()] == [1, 2]
+        assert [t for t, _, _ in first.read()] == [2.0]
+        assert first.read() == [] and second.read() == []
+
+        second.close()
+    finally:
+        first.close()
+        writer.close()
+        writer.unlink()
+
+
+def test_overrun_is_counted():
+    writer = RingWriter(slots=4)
+    reader = RingReader(writer.name)
+
+    try:
+        for i in range(10):
+            writer.publish(opcode_to_hex['byte'], bytes([i]))
+
+        frames = reader.read()
+
+        assert [payload[0] for _, _, payload in frames] == [7, 8, 9]
+        assert reader.lost == 7
+        assert reader.available == 0
+    finally:
+        reader.close()
+        writer.close()
+        writer.unlink()
+
+
+def _publish(writer, values):
+    for value in values:
+        writer.publish(opcode_to_hex['byte'], bytes([value]))
+
+
+def test_restarted_writer_carries_on():
+    writer = RingWriter(slots=8)
+    reader = RingReader(writer.name)
+
+    try:
+        # a receiver forked with the writer, restarted by the supervisor
+        for values in ([1, 2], [3, 4]):
+            child = get_context('fork').Process(target=_publish, args=(writer, values))
+            child.start()
+            child.join()
+
+        # a receiver that died without unlinking, replaced by one that attaches to its ring
+        attached = RingWriter(writer.name, slots=8, attach=True)
+        _publish(attached, [5])
+        attached.close()
+
+        assert [payload[0] for _, _, payload in reader.read()] == [1, 2, 3, 4, 5]
+        assert reader.available == 0 and reader.lost == 0
+    finally:
+        reader.close()
+        writer.close()
+        writer.unlink()
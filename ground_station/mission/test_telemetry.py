@@ -0,0 +1,24 @@
+from .telemetry import RingBuffer
+
+
+def test_ring_buffer_wraps():
+    ring = RingBuffer([('yaw', 'f32'), ('throttle', 'u8')], capacity=4)
+
+    for i in range(10):
+        ring.append((i / 2, i), t=float(i))
+
+    assert len(ring) == 4
+    assert ring.appended == 10
+    assert list(ring.all()['throttle']) == [6, 7, 8, 9]
+    assert list(ring.last(2)['yaw']) == [4.0, 4.5]
+    assert list(ring.since(7.5)['t']) == [8.0, 9.0]
+
+
+def test_since_before_full():
+    ring = RingBuffer([('word', 'u16le')], capacity=8)
+
+    for i in range(3):
+        ring.append((i, ), t=float(i))
+
+    assert list(ring.since(1.0)['word']) == [1, 2]
+    assert len(ring.last(5)) == 3
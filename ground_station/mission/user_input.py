@@ -1,22 +1,39 @@
-from logging import getLogger
+from logging import getLogger, DEBUG
 from map_input import Input, un_intialize, initialize
-from .events import ControlEvent, CommandEvent, EVENT_TYPE, EVENT_VALUE
-from .user_mappings import flight_controls, non_flight_controls
+from .events import ControlEvent, CommandEvent, EVENT_TYPE
+from .input_queue import InputQueue
+from .profiles import DEFAULT_PROFILES, Profiles
+
+AXIS_NAMES = {axis: axis.name.lower() for axis in ControlEvent}  # Controls.update keyword of each axis
 
 
 class UserInput(object):
-    def __init__(self, controls_obj, command_event_q):
-        from queue import Queue
-        from threading import Thread, Event
+    def __init__(self, controls_obj, command_event_q, deadband=1, quantum=1, profiles=DEFAULT_PROFILES):
+        """
+        :param controls_obj: Controls the axes are written to
+        :param command_event_q: queue command events are forwarded to
+        :param deadband: smallest axis change, in flight units, that reaches the controls. See InputQueue
+        :param quantum: axis values are rounded to multiples of this, in flight units
+        :param profiles: mapping profiles file, with flight and non_flight profiles. Reloaded when it changes
+        """
+        from threading import Event, Lock, Thread
 
         self.log = getLogger(self.__class__.__name__)
 
         initialize(joystick=True)  # initialize map_input
 
         self.stop_flag = Event()
-        self._event_queue = Queue()
+        self._event_queue = InputQueue(deadband, quantum)
+
+        self._profiles = Profiles(profiles, on_reload=self._use_profile)
+        self._profile = 'non_flight'
+        self._profile_lock = Lock()  # the profiles watcher and flight()/non_flight() both swap the mapping
+
+        for name in ('flight', 'non_flight'):
+            if name not in self._profiles:
+                raise ValueError('{}: no {} profile'.format(profiles, name))
 
-        self._input = Input(self._event_queue, self.stop_flag.is_set, non_flight_controls)
+        self._input = Input(self._event_queue, self.stop_flag.is_set, self._profiles[self._profile].mapping)
 
         self._input_thread = Thread(name='User Input', target=self._input.run)
         self._input_thread.start()
@@ -24,40 +41,56 @@ class UserInput(object):
         self._controls = controls_obj
         self._commands = command_event_q
 
+        self._profiles.start()
+
+    def _use_profile(self, name=None):
+        """Hand map_input a compiled profile. One reference assignment, the input thread never waits on it
+
+        :param str name: profile to switch to. None to reload the current one
+        """
+        with self._profile_lock:
+            if name is not None:
+                self._profile = name
+
+            self._input.mapping = self._profiles[self._profile].mapping
+
     def flight(self):
-        self._input.mapping = flight_controls
+        self._use_profile('flight')
 
     def non_flight(self):
-        self._input.mapping = non_flight_controls
+        self._use_profile('non_flight')
 
     def stop(self, kill_all=False):
         if kill_all:
             un_intialize()
 
+        self._profiles.stop()
+
         if self._input is not None:
             self.stop_flag.set()
             self._input_thread.join()
 
-    def control_event(self, event):
-        if event[EVENT_TYPE] == ControlEvent.YAW:
-            self._controls.yaw = event[EVENT_VALUE]
-        elif event[EVENT_TYPE] == ControlEvent.PITCH:
-            self._controls.pitch = event[EVENT_VALUE]
-        elif event[EVENT_TYPE] == ControlEvent.ROLL:
-            self._controls.roll = event[EVENT_VALUE]
-        elif event[EVENT_TYPE] == ControlEvent.THROTTLE:
-            self._controls.throttle = event[EVENT_VALUE]
+    def axes_event(self, axes):
+        """Write the latest value of every axis in a batch from the InputQueue in one update"""
+        self._controls.update(**{AXIS_NAMES[axis]: value for axis, value in axes.items()})
 
     def command_event(self, event):
         self._commands.put(event)  # forward event to command_handler via Command service
 
+    def stats(self):
+        return self._event_queue.stats()
+
     def run(self):
+        debug = self.log.isEnabledFor(DEBUG)
+
         while True:
             event = self._event_queue.get()
-            self.log.debug('Event: {}'.format(event))
 
-            if isinstance(event[EVENT_TYPE], ControlEvent):
-                self.control_event(event)
+            if debug:
+                self.log.debug('Event: {}'.format(event))
+
+            if type(event) is dict:
+                self.axes_event(event)
             elif isinstance(event[EVENT_TYPE], CommandEvent):
                 self.command_event(event)
             else:
@@ -0,0 +1,44 @@
+"""Print the telemetry a ground station publishes with --publish
+
+Run from the ground_station directory:
+    python monitor.py NAME [--op-code word ...] [--interval SECONDS]
+"""
+from argparse import ArgumentParser
+import sys
+import time
+
+from mission.opcodes import opcode_to_hex, opcode_to_str
+from mission.shared_ring import RingReader
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('name', help='Shared memory name given to --publish')
+    parser.add_argument('-o', '--op-code', action='append', default=None, help='Only print these op-codes')
+    parser.add_argument('-i', '--interval', type=float, default=0.05, help='Seconds between reads (Default = 0.05)')
+    parser.add_argument('--from-start', action='store_true', help='Start with the oldest frame still in the ring')
+    args = parser.parse_args()
+
+    op_codes = None if args.op_code is None else {opcode_to_hex[name] for name in args.op_code}
+    reader = RingReader(args.name, from_start=args.from_start)
+    lost = 0
+
+    try:
+        while True:
+            for t, op_code, record in reader.decoded():
+                if op_codes is None or op_code in op_codes:
+                    print('{:.3f} {:>14}: {}'.format(t, opcode_to_str.get(op_code, hex(op_code)), record))
+
+            if reader.lost != lost:
+                print('Fell behind, lost {} frames'.format(reader.lost - lost), file=sys.stderr)
+                lost = reader.lost
+
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,33 @@
 from logging import getLogger
 from mission import *
+from mission.capture import CaptureWriter
+from mission.metrics import Histogram
 import struct
+import time
 
 
 class Receiver(object):
-    def __init__(self, connection, stop):
-        """Receiver thread class"""
+    def __init__(self, connection, stop, buffered=True, capture=None, publisher=None):
+        """Receiver thread class
+
+        :param connection: serial type object that implements read(), and in_waiting for buffered mode
+        :param callable stop: returns True when the receiver should stop
+        :param bool buffered: read everything available at once and decode it with a FrameDecoder. Otherwise read
+            and decode one byte at a time
+        :param str capture: append every raw frame to this capture file
+        :param publisher: shared_ring.RingWriter to publish every valid frame to
+        """
         self._connection = connection
         self._stop = stop
+        self._buffered = buffered
+        self._decoder = FrameDecoder()
+        self._capture = capture
+        self._recorder = None
+        self._publisher = publisher
+
+        self.frames = 0
+        self.cpu_time = 0.0
+        self.dispatch_latency = Histogram()  # seconds from the read that completed a frame returning to its dispatch
 
         self.log = getLogger(self.__class__.__name__)
 
@@ -15,6 +35,10 @@ class Receiver(object):
     def connection(self):
         return self._connection
 
+    @property
+    def decoder(self):
+        return self._decoder
+
     def run(self):
         """Run the receiver thread
         This method assumes a specific packet layout with 1 byte fields
@@ -24,11 +48,77 @@ class Receiver(object):
 
         """
         self.log.info("Starting")
+        start = time.process_time()
+
+        # opened here so the file belongs to the process the receiver runs in
+        if self._capture is not None:
+            self._recorder = CaptureWriter(self._capture)
+            self._decoder.on_invalid = lambda buf, first, last: self._recorder.write(buf[first:last], False)
+            self.log.info('Recording frames to {}'.format(self._capture))
+
+        try:
+            if self._buffered:
+                self._run_buffered()
+            else:
+                self._run_bytewise()
+        finally:
+            if self._recorder is not None:
+                self._recorder.close()
+                self._recorder = None
+
+        self.cpu_time += time.process_time() - start
+        latency = self.dispatch_latency.snapshot()
+        self.log.info('Stopping. {} frames, {:.1f} us cpu/frame, dispatch latency p50 {:.1f} us p99 {:.1f} us'
+                      .format(self.frames, self.cpu_per_frame() * 1e6, latency['p50'] * 1e6, latency['p99'] * 1e6))
+
+    def cpu_per_frame(self):
+        """CPU seconds spent per received frame"""
+        return self.cpu_time / self.frames if self.frames else 0.0
+
+    def _run_buffered(self):
+        decoder = self._decoder
+
+        while not self._stop():
+            chunk = self.read_available()
+            woke = time.monotonic()
+
+            if not chunk:
+                if self._recorder is not None:
+                    self._recorder.poll()
+
+                continue
+
+            discarded = decoder.bytes_discarded
+            recovered = decoder.frames_recovered
+
+            # the decoder only hands back frames with a valid checksum
+            for p in decoder.feed(chunk):
+                self.log.debug('Received packet {}'.format(p))
+
+                if self._recorder is not None:
+                    self._recorder.write(p.raw)
+
+                self.dispatch_latency.record(time.monotonic() - woke)
+                dispatch_packet(p)
+                self.frames += 1
+
+                if self._publisher is not None:
+                    self._publisher.publish(p.op_code, p.data)
 
+            if decoder.bytes_discarded != discarded:
+                self.log.warning('Discarded {} bytes, recovered {} frames'
+                                 .format(decoder.bytes_discarded - discarded, decoder.frames_recovered - recovered))
+
+        self.log.info('Link stats {}'.format(decoder.stats()))
+
+    def _run_bytewise(self):
         while not self._stop():
             byte = self.get_byte()
 
             if byte is None:
+                if self._recorder is not None:
+                    self._recorder.poll()
+
                 continue
             elif byte == PACKET_HEADER:
                 size = self.get_byte()
@@ -48,9 +138,24 @@ class Receiver(object):
                 for _ in range(0, size + 1):  # plus 1 for checksum byte
                     data.append(self.get_byte())
 
+                if None in data:
+                    self.log.warning('Timed out waiting for the rest of a packet')
+                    continue
+
+                woke = time.monotonic()
                 p = packet([byte, size] + data)
                 self.log.debug('Received packet {}'.format(p))
-                handle_packet(p)
+                self.dispatch_latency.record(time.monotonic() - woke)
+                valid = handle_packet(p)
+
+                if self._recorder is not None:
+                    self._recorder.write(p.raw, valid)
+
+                if valid:
+                    self.frames += 1
+
+                    if self._publisher is not None:
+                        self._publisher.publish(p.op_code, p.data)
 
             else:  # byte != self.header
                 self.log.warning('Received non-header byte \'{}\''.format(byte))
@@ -61,6 +166,19 @@ class Receiver(object):
     def scan_for(self, byte):
         pass
 
+    def read_available(self):
+        """Read every byte waiting on the connection in one call
+
+        Blocks for up to the connection's timeout when nothing is waiting
+        """
+        try:
+            waiting = self.connection.in_waiting
+            return self.connection.read(waiting if waiting > 0 else 1)
+        except IOError:
+            self.log.critical("")  # Add some extra emphasis
+            self.log.critical("Device disconnected. Exiting ...")
+            return None
+
     def get_byte(self):
         """Get one byte from connection
 
@@ -76,5 +194,3 @@ class Receiver(object):
         if len(b) > 0:
             b = struct.unpack('B', b)[0]
             return b
-
-
@@ -0,0 +1,150 @@
+"""Replay a capture through the receive pipeline
+
+Run from the ground_station directory:
+    python replay.py CAPTURE [--speed SPEED | --fast]
+"""
+from argparse import ArgumentParser
+import logging
+import math
+import sys
+import time
+
+import numpy as np
+
+from mission.capture import CaptureReader
+from receiver import Receiver
+
+
+class ReplayConnection(object):
+    """Connection that plays a capture back like a serial port would
+
+    Frames become readable at their recorded times scaled by speed, or all at once when speed is None. Only valid
+    frames are replayed by default. Invalid frames in a capture are rejected candidates whose bytes can overlap the
+    valid frames after them.
+    """
+    def __init__(self, path, speed=1.0, include_invalid=False, timeout=None):
+        """
+        :param path: capture file
+        :param float speed: playback speed. 1.0 for real time, 10.0 for ten times faster. None for as fast as possible
+        :param bool include_invalid: also replay frames that had a bad checksum
+        :param float timeout: seconds read() waits for data, like serial.Serial.timeout. None waits forever
+        """
+        self.speed = speed
+        self.timeout = timeout
+        self.include_invalid = include_invalid
+        self.bytes_written = 0
+
+        self._reader = CaptureReader(path)
+        self._times = self._reader.index['t']
+        self._replayed = self._replay_mask()
+        self._next = 0
+        self._buffer = bytearray()
+        self._start = None
+
+    def _replay_mask(self):
+        """Records to replay. Checksums are checked again so frames corrupted on disk since aren't replayed"""
+        if self.include_invalid:
+            return np.ones(len(self._reader), dtype=bool)
+
+        recorded = self._reader.recorded_valid()
+        replayed = recorded & self._reader.verify()
+        corrupted = int(np.count_nonzero(recorded & ~replayed))
+
+        if corrupted:
+            logging.getLogger(self.__class__.__name__).warning('Skipping {} frames of {} that no longer pass their '
+                                                               'checksum'.format(corrupted, self._reader.path))
+
+        return replayed
+
+    @property
+    def exhausted(self):
+        """True once every frame was released and read"""
+        return self._next >= len(self._reader) and not self._buffer
+
+    @property
+    def in_waiting(self):
+        self._release()
+        return len(self._buffer)
+
+    def _playback_time(self):
+        """Capture time playback has reached"""
+        if self.speed is None or not len(self._reader):  # an empty capture is over before it starts
+            return math.inf
+
+        if self._start is None:
+            self._start = time.monotonic()
+
+        return self._reader.start_time + (time.monotonic() - self._start) * self.speed
+
+    def _release(self, size=None):
+        """Move frames whose time has come into the read buffer, stopping once it holds size bytes"""
+        now = self._playback_time()
+
+        while self._next < len(self._reader) and self._times[self._next] <= now:
+            if size is not None and len(self._buffer) >= size:
+                break
+
+            if self._replayed[self._next]:
+                self._buffer += self._reader.record(self._next)[1]
+
+            self._next += 1
+
+    def read(self, size=1):
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        self._release(size)
+
+        # only real time and scaled playback wait. as fast as possible releases until there's data or nothing left
+        while not self._buffer and self._next < len(self._reader) and self.speed is not None:
+            wait = (self._times[self._next] - self._playback_time()) / self.speed
+
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+
+                if wait <= 0:
+                    break
+
+            time.sleep(max(wait, 0))
+            self._release(size)
+
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+
+        return data
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return len(data)
+
+    def close(self):
+        self._times = None
+        self._replayed = None
+        self._reader.close()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('capture', help='Capture file written with --capture')
+    speed = parser.add_mutually_exclusive_group()
+    speed.add_argument('-s', '--speed', type=float, default=1.0, help='Playback speed (Default = 1.0, real time)')
+    speed.add_argument('-f', '--fast', action='store_true', help='Play back as fast as possible')
+    parser.add_argument('--bytewise', action='store_true', help='Decode one byte at a time')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    connection = ReplayConnection(args.capture, None if args.fast else args.speed, timeout=0.1)
+    receiver = Receiver(connection, lambda: connection.exhausted, buffered=not args.bytewise)
+
+    start = time.perf_counter()
+    receiver.run()
+    elapsed = time.perf_counter() - start
+
+    connection.close()
+
+    print('{} frames in {:.3f} s, {:.0f} frames/s, {:.2f} us cpu/frame'
+          .format(receiver.frames, elapsed, receiver.frames / elapsed, receiver.cpu_per_frame() * 1e6))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,45 @@
+import asyncio
+import heapq
 import logging
 from logging import getLogger
 from queue import Empty
-from sched import scheduler
-from time import sleep, time
-from threading import Event, Thread
+from time import monotonic, sleep
+from threading import Condition, current_thread, Lock, Thread
+
+from mission.metrics import Histogram
+
+# What a service does about periods it missed because the scheduler fell behind
+SKIP = 'skip'  # run once and move on to the next period still in the future
+CATCH_UP = 'catch_up'  # run once for every missed period, back to back
+
+
+class EveryTick(object):
+    """Uplink policy that sends every event the service gets"""
+    def should_send(self, event, now):
+        return True
+
+
+class OnChange(object):
+    """Uplink policy that sends an event only when it differs from the last one sent
+
+    An unchanged event is still sent as a keepalive once keepalive_frequency would otherwise be missed
+    """
+    def __init__(self, keepalive_frequency):
+        """
+        :param float keepalive_frequency: minimum frequency to send at when nothing changes
+        """
+        self.keepalive_interval = 1/keepalive_frequency
+        self._last = None
+        self._last_sent = None
+
+    def should_send(self, event, now):
+        if event != self._last or now - self._last_sent >= self.keepalive_interval:
+            # events from an encoder's FrameTemplate are the same buffer every time. keep what it held
+            self._last = bytes(event) if isinstance(event, (bytearray, memoryview)) else event
+            self._last_sent = now
+            return True
+
+        return False
 
 
 class Service(object):
@@ -11,7 +47,7 @@ class Service(object):
 
     Holds data about a service
     """
-    def __init__(self, name, action, events, frequency, priority=1):
+    def __init__(self, name, action, events, frequency, priority=1, policy=None, missed=SKIP):
         """Service
 
         :param str name: name of service to keep track of it. Use this when starting and stopping services
@@ -19,6 +55,8 @@ class Service(object):
         :param events: queue type object that implements a get(block=) method
         :param float frequency: frequency to run service at when it's running
         :param int priority: a higher lower number represents a higher priority
+        :param policy: decides which events are sent, EveryTick or OnChange. Defaults to EveryTick
+        :param str missed: SKIP or CATCH_UP missed periods
         """
         self.log = getLogger(str(name) + self.__class__.__name__)
 
@@ -26,76 +64,213 @@ class Service(object):
         self.events = events
         self.interval = 1/frequency
         self.priority = priority
+        self.policy = policy if policy is not None else EveryTick()
+        self.missed = missed
         self._action = action
+        self._lock = Lock()
+
+        self.sent = 0
+        self.suppressed = 0
 
     def step(self):
-        try:
-            event = self.events.get(block=False)
-        except Empty:
-            pass
-        else:
-            self.log.debug('Emitting event {}'.format(event))
-            self._action(event)
+        with self._lock:
+            try:
+                event = self.events.get(block=False)
+            except Empty:
+                return
+
+            if self.policy.should_send(event, monotonic()):
+                self.sent += 1
+                self.log.debug('Emitting event {}'.format(event))
+                self._action(event)
+            else:
+                self.suppressed += 1
+
+    def stats(self):
+        return {'sent': self.sent, 'suppressed': self.suppressed}
 
 
 class SchedulerService(object):
     """Scheduler Service container to keep track of all service data relevant to scheduler"""
-    def __init__(self, service, running, scheduler_event):
+    def __init__(self, service):
         """
 
         :param Service service: service instance
-        :param bool running: boolean of if this service is running
-        :param Event scheduler_event: event object returned by scheduler.enter
         """
         self.service = service
-        self.running = running
-        self.thread = None
-        self.stop_flag = None
-        self.scheduler_event = scheduler_event
+        self.running = False
+        self.triggered = False
+        self.deadline = None
+        self.generation = 0  # bumped on every start so stale queue entries can be told apart
+        self.missed_deadlines = 0
+        self.last_start = None
+
+        # timing of periodic steps, in seconds
+        self.period = Histogram()
+        self.duration = Histogram()
+        self.jitter = Histogram()  # how late a step started after its deadline
+        self.queue_depth = Histogram(minimum=1, maximum=10000, buckets_per_decade=10)
+
+    def advance(self, now):
+        """Move the deadline to the next period, counting the periods missed by now"""
+        service = self.service
+        deadline = self.deadline + service.interval
+
+        if deadline <= now and service.missed == SKIP:
+            missed = int((now - deadline) // service.interval) + 1
+            self.missed_deadlines += missed
+            deadline += missed * service.interval
+        elif deadline <= now:
+            self.missed_deadlines += 1
+
+        self.deadline = deadline
+
+    def record(self, deadline, start, stop):
+        """Record the timing of a periodic step"""
+        if self.last_start is not None:
+            self.period.record(start - self.last_start)
+
+        self.last_start = start
+        self.jitter.record(start - deadline)
+        self.duration.record(stop - start)
+
+        qsize = getattr(self.service.events, 'qsize', None)
+
+        if qsize is not None:
+            self.queue_depth.record(qsize())
+
+    def stats(self):
+        stats = self.service.stats()
+        stats['missed_deadlines'] = self.missed_deadlines
+        stats['period'] = self.period.snapshot()
+        stats['duration'] = self.duration.snapshot()
+        stats['jitter'] = self.jitter.snapshot()
+        stats['queue_depth'] = self.queue_depth.snapshot()
+
+        return stats
 
 
 class ServiceManager(object):
-    """Manages services"""
-    def __init__(self, services):
+    """Manages services
+
+    Every service runs on one scheduler thread. Periods are absolute deadlines on the monotonic clock, so the time a
+    step takes doesn't push the next one back.
+    """
+    def __init__(self, services, clock=monotonic, summary_interval=30.0):
         """UplinkServiceHandler
 
         :param list services: list of Service objects
+        :param callable clock: monotonic clock returning seconds
+        :param float summary_interval: seconds between timing summaries in the log. None for no summaries
         """
         self.log = getLogger(self.__class__.__name__)
 
-        self._scheduler = scheduler(time, sleep)
+        self._clock = clock
+        self._condition = Condition()
+        self._queue = []  # heap of (deadline, priority, generation, name)
+        self._thread = None
+        self._shutdown = False
         self._services = dict()
+        self._summary_interval = summary_interval
+        self._summary_at = None
 
         for service in services:
-            self._services[service.name] = SchedulerService(service, False, None)
+            self._services[service.name] = SchedulerService(service)
+
+    def _schedule(self, scheduler_service):
+        service = scheduler_service.service
+        heapq.heappush(self._queue, (scheduler_service.deadline, service.priority, scheduler_service.generation,
+                                     service.name))
 
-        # self._scheduler.run()
+    def _next_ready(self):
+        """Wait for the next service step that is due
 
-    def _periodic(self, name, action, args=()):
-        """Start a periodic event
+        Called with the condition held
 
-        :param str name: name of service
-        :param callable action: action to call at service frequency
-        :param args: arguments to pass to action
+        :return: (SchedulerService, deadline) with a deadline of None for triggered steps, (None, None) when the
+            summary is due or None on shutdown
         """
-        if self._services[name].stop_flag.is_set():
-            self.log.debug('Service {name} done'.format(**locals()))
-            self._services[name].running = False
-            self._services[name].thread = None
-            self._services[name].stop_flag = None
-            self._services[name].scheduler_event = None
-            return
+        while not self._shutdown:
+            now = self._clock()
+
+            if self._summary_at is not None and now >= self._summary_at:
+                self._summary_at = now + self._summary_interval
+                return None, None
+
+            # drop entries of services that were stopped or restarted since they were queued
+            while self._queue:
+                _, _, generation, name = self._queue[0]
+                scheduler_service = self._services[name]
+
+                if scheduler_service.running and scheduler_service.generation == generation:
+                    break
+
+                heapq.heappop(self._queue)
 
-        service = self._services[name].service
-        self._services[name].scheduler_event = \
-            self._scheduler.enter(service.interval, service.priority, self._periodic, (name, service.step, args))
-        self.log.debug('Running service step {name}'.format(**locals()))
-        action(*args)
+            # deadlines that are due go before triggers, so a service triggered over and over can't starve the rest
+            if self._queue and self._queue[0][0] <= now:
+                deadline, _, _, name = heapq.heappop(self._queue)
+                return self._services[name], deadline
+
+            for scheduler_service in self._services.values():
+                if scheduler_service.triggered:
+                    scheduler_service.triggered = False
+                    return scheduler_service, None
+
+            summary_delay = self._summary_at - now if self._summary_at is not None else None
+
+            if not self._queue:
+                self._condition.wait(summary_delay)
+                continue
+
+            delay = self._queue[0][0] - now
+            self._condition.wait(delay if summary_delay is None else min(delay, summary_delay))
+
+        return None
+
+    def _advance(self, scheduler_service):
+        """Move a service's deadline to its next period and queue it
+
+        Called with the condition held
+        """
+        scheduler_service.advance(self._clock())
+        self._schedule(scheduler_service)
+
+    def _run(self):
+        self.log.debug('Scheduler started')
+
+        while True:
+            with self._condition:
+                ready = self._next_ready()
+
+                if ready is None:
+                    break
+
+                scheduler_service, deadline = ready
+
+                if deadline is not None:
+                    self._advance(scheduler_service)
+
+            if scheduler_service is None:
+                self.log_summary()
+                continue
+
+            start = self._clock()
+
+            try:
+                scheduler_service.service.step()
+            except Exception:
+                self.log.exception('Service {} step failed'.format(scheduler_service.service.name))
+
+            if deadline is not None:
+                scheduler_service.record(deadline, start, self._clock())
+
+        self.log.debug('Scheduler stopped')
 
     def start_all(self):
         """Start all services"""
-        for service in self._services:
-            self.start(service.service.name)
+        for name in self._services:
+            self.start(name)
 
     def start(self, name):
         """Start service
@@ -107,22 +282,64 @@ class ServiceManager(object):
             return
 
         scheduler_service = self._services[name]
-        service = scheduler_service.service
 
-        if not scheduler_service.running:
-            self.log.info('Starting service {name}'.format(**locals()))
+        with self._condition:
+            if scheduler_service.running:
+                self.log.debug('Service {name} is already running'.format(**locals()))
+                return
 
-            scheduler_service.stop_flag = Event()
-            self._periodic(name, service.step)
-            scheduler_service.thread = Thread(name='{name}Service'.format(**locals()), target=self._scheduler.run)
-            # scheduler_service.thread = Thread(target=self._periodic, args=(name, service.step))
-            scheduler_service.thread.start()
+            self.log.info('Starting service {name}'.format(**locals()))
 
             scheduler_service.running = True
+            scheduler_service.generation += 1
+            scheduler_service.deadline = self._clock()
+            scheduler_service.last_start = None  # the time it was stopped isn't a period
+            self._schedule(scheduler_service)
 
-            # self._scheduler.run()
-        else:
-            self.log.debug('Service {name} is already running'.format(**locals()))
+            if self._thread is None:
+                self._shutdown = False
+
+                if self._summary_interval:
+                    self._summary_at = self._clock() + self._summary_interval
+
+                self._thread = Thread(name='ServiceScheduler', target=self._run, daemon=True)
+                self._thread.start()
+
+            self._condition.notify()
+
+    def trigger(self, name):
+        """Step a running service now instead of waiting for its next period
+
+        The step runs on the scheduler thread and doesn't move the service's periodic deadlines
+
+        :param str name: name of service to step
+        """
+        scheduler_service = self._services.get(name)
+
+        if scheduler_service is None:
+            return
+
+        with self._condition:
+            if scheduler_service.running:
+                scheduler_service.triggered = True
+                self._condition.notify()
+
+    def stats(self):
+        """Snapshot of every service's stats and timing, in seconds, keyed by service name"""
+        return {name: scheduler_service.stats() for name, scheduler_service in self._services.items()}
+
+    def log_summary(self):
+        """Log period, jitter & duration percentiles of every service that has run"""
+        for name, stats in self.stats().items():
+            if not stats['duration']['count']:
+                continue
+
+            period, jitter, duration = stats['period'], stats['jitter'], stats['duration']
+            self.log.info('{name}: period p50 {:.1f}ms p99 {:.1f}ms, jitter p50 {:.2f}ms p99 {:.2f}ms max {:.2f}ms, '
+                          'duration p99 {:.2f}ms, missed {}, sent {}, suppressed {}'
+                          .format(period['p50'] * 1e3, period['p99'] * 1e3, jitter['p50'] * 1e3,
+                                  jitter['p99'] * 1e3, jitter['max'] * 1e3, duration['p99'] * 1e3,
+                                  stats['missed_deadlines'], stats['sent'], stats['suppressed'], name=name))
 
     def stop(self, name):
         """Stop service
@@ -135,17 +352,174 @@ class ServiceManager(object):
 
         scheduler_service = self._services[name]
 
-        # if the service exists and is running
-        if self._services[name].running:
-            self.log.info('Stopping service {name}'.format(**locals()))
-            scheduler_service.stop_flag.set()
+        with self._condition:
+            # if the service exists and is running
+            if scheduler_service.running:
+                self.log.info('Stopping service {name} {stats}'.format(stats=scheduler_service.stats(), **locals()))
+                scheduler_service.running = False
+                scheduler_service.triggered = False
+                self._condition.notify()
+            else:
+                self.log.debug('Service {name} is not running'.format(**locals()))
+
+    def shutdown(self, timeout=None):
+        """Stop every service and join the scheduler thread
+
+        :param float timeout: seconds to wait for a step that is running to finish
+        :return: True if the scheduler thread exited
+        """
+        for name in self._services:
+            self.stop(name)
+
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify()
+            thread, self._thread = self._thread, None
+
+        if thread is not None and thread is not current_thread():
+            thread.join(timeout)
+            return not thread.is_alive()
+
+        return True
+
+
+class AsyncServiceManager(ServiceManager):
+    """Manages services as coroutines on an asyncio event loop
+
+    Every running service is a task that waits for its next absolute deadline on the loop's monotonic clock, so
+    services, receiving and transmitting share the loop's thread. start, stop and trigger may be called from any
+    thread and take effect on the loop.
+    """
+    def __init__(self, services, loop, summary_interval=30.0):
+        """
+        :param list services: list of Service objects
+        :param loop: asyncio event loop to run the services on
+        :param float summary_interval: seconds between timing summaries in the log. None for no summaries
+        """
+        super().__init__(services, clock=loop.time, summary_interval=summary_interval)
+
+        self._loop = loop
+        self._tasks = dict()
+        self._waiters = dict()  # name: future a waiting service wakes up on, True when triggered
+        self._summary_task = None
+
+    async def _run_service(self, scheduler_service):
+        service = scheduler_service.service
+        scheduler_service.deadline = self._clock()
+
+        while scheduler_service.running:
+            waiter = self._waiters[service.name] = self._loop.create_future()
+            timer = self._loop.call_at(scheduler_service.deadline, _resolve, waiter, False)
+
+            try:
+                triggered = await waiter
+            finally:
+                timer.cancel()
+
+                if self._waiters.get(service.name) is waiter:  # a restarted service's new task may have replaced it
+                    del self._waiters[service.name]
+
+            start = self._clock()
+
+            try:
+                service.step()
+            except Exception:
+                self.log.exception('Service {} step failed'.format(service.name))
+
+            # triggered steps don't move the periodic deadlines
+            if not triggered:
+                scheduler_service.record(scheduler_service.deadline, start, self._clock())
+                scheduler_service.advance(self._clock())
+
+    async def _run_summary(self):
+        while True:
+            await asyncio.sleep(self._summary_interval)
+            self.log_summary()
+
+    def _start(self, name):
+        scheduler_service = self._services[name]
+
+        if scheduler_service.running:
+            self.log.debug('Service {name} is already running'.format(**locals()))
+            return
+
+        self.log.info('Starting service {name}'.format(**locals()))
 
-            # scheduler_service.thread.join()
+        scheduler_service.running = True
+        scheduler_service.generation += 1
+        scheduler_service.last_start = None  # the time it was stopped isn't a period
+        self._tasks[name] = self._loop.create_task(self._run_service(scheduler_service))
 
-            # scheduler_service.thread = None
+        if self._summary_task is None and self._summary_interval:
+            self._summary_task = self._loop.create_task(self._run_summary())
+
+    def _stop(self, name):
+        scheduler_service = self._services[name]
 
-        else:
+        if not scheduler_service.running:
             self.log.debug('Service {name} is not running'.format(**locals()))
+            return
+
+        self.log.info('Stopping service {name} {stats}'.format(stats=scheduler_service.stats(), **locals()))
+
+        scheduler_service.running = False
+        self._tasks.pop(name).cancel()
+
+    def _trigger(self, name):
+        waiter = self._waiters.get(name)
+
+        if waiter is not None:
+            _resolve(waiter, True)
+
+    def _call(self, callback, name):
+        """Run callback(name) on the loop"""
+        if name not in self._services:
+            self.log.warning('Service {name} does not exist'.format(**locals()))
+            return
+
+        self._loop.call_soon_threadsafe(callback, name)
+
+    def start(self, name):
+        """Start service
+
+        :param str name: name of service to start
+        """
+        self._call(self._start, name)
+
+    def stop(self, name):
+        """Stop service
+
+        :param str name: name of service to stop
+        """
+        self._call(self._stop, name)
+
+    def trigger(self, name):
+        """Step a running service now instead of waiting for its next period
+
+        :param str name: name of service to step
+        """
+        if name in self._services:
+            self._loop.call_soon_threadsafe(self._trigger, name)
+
+    def shutdown(self, timeout=None):
+        """Cancel every service task. Called on the loop
+
+        :param float timeout: unused, steps run on the loop so none can be running
+        :return: True
+        """
+        for name in list(self._tasks):
+            self._stop(name)
+
+        if self._summary_task is not None:
+            self._summary_task.cancel()
+            self._summary_task = None
+
+        return True
+
+
+def _resolve(future, result):
+    if not future.done():
+        future.set_result(result)
 
 
 def test():
@@ -171,7 +545,8 @@ def test():
     print('here')
 
     sleep(5)
-    ush.stop('Uplink')
+    ush.shutdown()
+    print(ush.stats())
     print('done')
 
 
@@ -0,0 +1,195 @@
+from logging import getLogger
+from multiprocessing import Process
+from multiprocessing.connection import wait
+import os
+import signal
+from time import monotonic
+
+
+def _run_child(target, args, interrupt):
+    """Child process entry point. Undoes the supervisor's signal handling inherited across the fork"""
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler if interrupt else signal.SIG_IGN)
+
+    target(*args)
+
+
+class Child(object):
+    """A supervised child process and its restart state"""
+    def __init__(self, name, target, args=(), interrupt=False):
+        """
+        :param str name: name of the child in logs and process listings
+        :param callable target: called with args in the child process
+        :param tuple args: arguments for target
+        :param bool interrupt: child handles SIGINT itself and is sent one on shutdown. Otherwise it ignores SIGINT
+            and has to exit once the supervisor's stop flag is set
+        """
+        self.name = name
+        self.target = target
+        self.args = args
+        self.interrupt = interrupt
+
+        self.process = None
+        self.started = None
+        self.restarts = 0
+        self.backoff = 0.0
+        self.restart_at = None
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+
+class Supervisor(object):
+    """Runs child processes, restarts the ones that die and shuts them all down together
+
+    Between events the supervisor blocks in multiprocessing.connection.wait on the children's sentinels and on a
+    pipe that SIGINT and SIGTERM are written to, so it uses no CPU. A child that exits with an error or is killed is
+    restarted after a backoff that doubles with every failure, up to max_backoff, and starts over once the child has
+    run for stable_after seconds. A child that exits cleanly ends the session.
+    """
+    def __init__(self, stop_flag, backoff=1.0, max_backoff=30.0, stable_after=60.0, join_timeout=10.0):
+        """
+        :param stop_flag: multiprocessing.Event the children watch. Set on shutdown
+        :param float backoff: seconds before the first restart of a child
+        :param float max_backoff: most seconds between restarts
+        :param float stable_after: seconds a child has to run for its backoff to start over
+        :param float join_timeout: seconds children get to exit on shutdown before they are terminated
+        """
+        self.log = getLogger(self.__class__.__name__)
+
+        self.stop_flag = stop_flag
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.join_timeout = join_timeout
+
+        self._children = []
+        self._stopping = False
+        self._signal = None
+
+    def add(self, name, target, args=(), interrupt=False):
+        """Add a child. See Child"""
+        self._children.append(Child(name, target, args, interrupt))
+
+    def _start(self, child):
+        child.process = Process(name=child.name, target=_run_child, args=(child.target, child.args, child.interrupt))
+        child.process.start()
+        child.started = monotonic()
+        child.restart_at = None
+
+        self.log.info('Started {} (pid {})'.format(child.name, child.process.pid))
+
+    def _exited(self, child):
+        child.process.join()
+        exitcode = child.process.exitcode
+        uptime = monotonic() - child.started
+        child.process = None
+
+        if exitcode == 0:
+            self.log.info('{} exited after {:.1f} s. Shutting down'.format(child.name, uptime))
+            self._stopping = True
+            return
+
+        if uptime >= self.stable_after:
+            child.backoff = self.backoff
+        else:
+            child.backoff = min(child.backoff * 2, self.max_backoff) if child.backoff else self.backoff
+
+        child.restarts += 1
+        child.restart_at = monotonic() + child.backoff
+
+        self.log.error('{} died with exit code {} after {:.1f} s. Restart {} in {:.1f} s'
+                       .format(child.name, exitcode, uptime, child.restarts, child.backoff))
+
+    def _on_signal(self, sig_num, frame):
+        self._signal = sig_num
+        self._stopping = True
+
+    def _wait(self, wakeup):
+        """Block until a child exits, a restart is due or a signal arrives, and handle it"""
+        restarts = [child.restart_at for child in self._children if child.restart_at is not None]
+        timeout = max(0.0, min(restarts) - monotonic()) if restarts else None
+        sentinels = {child.process.sentinel: child for child in self._children if child.process is not None}
+
+        ready = wait(list(sentinels) + [wakeup], timeout)
+
+        if wakeup in ready:
+            os.read(wakeup, 512)  # signal numbers. the handler already ran
+
+        if self._stopping:
+            return
+
+        for sentinel in ready:
+            if sentinel in sentinels:
+                self._exited(sentinels[sentinel])
+
+        for child in self._children:
+            if not self._stopping and child.restart_at is not None and monotonic() >= child.restart_at:
+                self._start(child)
+
+    def run(self):
+        """Start every child and supervise them until SIGINT, SIGTERM or a child exits cleanly
+
+        Must be called from the main thread
+        """
+        wakeup, wakeup_write = os.pipe()
+        os.set_blocking(wakeup_write, False)
+
+        handlers = {sig_num: signal.signal(sig_num, self._on_signal) for sig_num in (signal.SIGINT, signal.SIGTERM)}
+        previous_wakeup = signal.set_wakeup_fd(wakeup_write)
+
+        try:
+            for child in self._children:
+                self._start(child)
+
+            while not self._stopping:
+                self._wait(wakeup)
+        finally:
+            self.shutdown()
+
+            signal.set_wakeup_fd(previous_wakeup)
+
+            for sig_num, handler in handlers.items():
+                signal.signal(sig_num, handler)
+
+            os.close(wakeup)
+            os.close(wakeup_write)
+
+    def shutdown(self):
+        """Set the stop flag and join the children, terminating the ones that don't exit within join_timeout"""
+        self._stopping = True
+        self.stop_flag.set()
+
+        children = [child for child in self._children if child.alive]
+        deadline = monotonic() + self.join_timeout
+
+        self.log.info('Stopping {}'.format(', '.join(child.name for child in children) or 'nothing'))
+
+        # ctrl-c in a terminal interrupts the whole process group. give children half the time to exit on their own
+        # before interrupting the ones that handle it
+        if self._signal == signal.SIGINT:
+            for child in children:
+                child.process.join(max(0.0, deadline - self.join_timeout / 2 - monotonic()))
+
+        for child in children:
+            if child.interrupt and child.alive:
+                os.kill(child.process.pid, signal.SIGINT)
+
+        for child in children:
+            child.process.join(max(0.0, deadline - monotonic()))
+
+        for child in children:
+            if child.alive:
+                self.log.warning('{} did not stop within {} s. Terminating'.format(child.name, self.join_timeout))
+                child.process.terminate()
+                child.process.join(1)
+
+            if child.alive:
+                child.process.kill()
+                child.process.join()
+
+        for child in self._children:
+            if child.restarts:
+                self.log.info('{} was restarted {} times'.format(child.name, child.restarts))
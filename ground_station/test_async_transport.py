@@ -0,0 +1,50 @@
+import asyncio
+import socket
+
+from async_transport import AsyncTransport
+
+
+class SocketConnection(object):
+    """Connection on one end of a socket pair, non-blocking like serial.Serial's fd"""
+    def __init__(self, sock):
+        self._sock = sock
+        self._sock.setblocking(False)
+
+    def fileno(self):
+        return self._sock.fileno()
+
+
+def test_waits_for_the_port_to_take_the_rest_of_a_packet():
+    ours, theirs = socket.socketpair()
+    ours.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    loop = asyncio.new_event_loop()
+    transport = AsyncTransport(SocketConnection(ours), loop)
+    packet = bytes(range(256)) * 1024  # far more than the socket buffers
+
+    transport.start()
+    transport.send(packet)
+
+    assert transport._writing  # the port took part of it, and send returned
+    assert transport._writer
+
+    received = bytearray()
+    theirs.setblocking(False)
+
+    async def drain():
+        while len(received) < len(packet):
+            try:
+                received.extend(theirs.recv(65536))
+            except BlockingIOError:
+                await asyncio.sleep(0.001)
+
+    loop.run_until_complete(asyncio.wait_for(drain(), 5))
+
+    assert bytes(received) == packet
+    assert not transport._writing
+    assert not transport._writer
+    assert transport.packets == 1
+
+    transport.stop()
+    loop.close()
+    ours.close()
+    theirs.close()
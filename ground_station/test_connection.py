@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from connection import ConnectionManager
+import connection
+
+
+def test_probes_one_port_at_a_time(monkeypatch):
+    manager = ConnectionManager(['/dev/a', '/dev/b', '/dev/c'], last_port_file=None, discover=False)
+    probed = []
+
+    def probe(port):
+        probed.append(port)
+        return 'serial' if port == '/dev/b' else None
+
+    monkeypatch.setattr(manager, 'probe', probe)
+
+    assert manager.open(timeout=1.0) == 'serial'
+    assert manager.port == '/dev/b'
+    assert probed == ['/dev/a', '/dev/b']  # /dev/c is never opened, so never reset
+
+
+def test_discovers_only_wanted_usb_devices(monkeypatch):
+    ports = [
+        SimpleNamespace(device='/dev/ttyACM0', vid=0x2341, pid=0x0043),  # Arduino Uno
+        SimpleNamespace(device='/dev/ttyACM1', vid=0x2341, pid=0x0042),  # Arduino Mega
+        SimpleNamespace(device='/dev/ttyUSB0', vid=0x0403, pid=0x6001),  # FTDI adapter
+        SimpleNamespace(device='/dev/ttyS0', vid=None, pid=None),
+    ]
+    monkeypatch.setattr(connection.list_ports, 'comports', lambda: ports)
+
+    assert ConnectionManager([], usb_ids=[(0x2341, 0x0043)]).candidates() == ['/dev/ttyACM0']
+    assert ConnectionManager([], usb_ids=[(0x2341, None)]).candidates() == ['/dev/ttyACM0', '/dev/ttyACM1']
+    assert ConnectionManager([]).candidates() == ['/dev/ttyACM0', '/dev/ttyACM1', '/dev/ttyUSB0']
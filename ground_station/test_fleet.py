@@ -0,0 +1,67 @@
+import logging
+from multiprocessing import Event
+from threading import Timer
+import time
+
+import pytest
+
+from fleet import load_fleet, run_fleet
+
+
+def write_fleet(tmp_path, text):
+    path = tmp_path / 'fleet.yaml'
+    path.write_text(text)
+    return str(path)
+
+
+def test_load_fleet(tmp_path):
+    links = load_fleet(write_fleet(tmp_path, '''
+links:
+  - {vehicle: quad1, port: /dev/ttyACM0, input: true, uplink_frequency: 20}
+  - {vehicle: quad2, port: /dev/ttyACM1, baudrate: 115200, cpu: 3}
+'''))
+
+    assert [(link.vehicle, link.port, link.baudrate, link.input) for link in links] == [
+        ('quad1', '/dev/ttyACM0', 38400, True),
+        ('quad2', '/dev/ttyACM1', 115200, False),
+    ]
+    assert links[0].uplink_frequency == 20
+    assert links[1].cpu == 3
+
+
+@pytest.mark.parametrize('text', [
+    'links: []',
+    'links: [{vehicle: quad1}]',
+    'links: [{vehicle: quad1, port: /dev/ttyACM0, colour: red}]',
+    'links: [{vehicle: quad1, port: /dev/ttyACM0, uplink_frequency: 20}]',
+    'links: [{vehicle: quad1, port: /dev/ttyACM0}, {vehicle: quad1, port: /dev/ttyACM1}]',
+    'links: [{vehicle: quad1, port: /dev/ttyACM0}, {vehicle: quad2, port: /dev/ttyACM0}]',
+    'links: [{vehicle: quad1, port: /dev/ttyACM0, input: true}, {vehicle: quad2, port: /dev/ttyACM1, input: true}]',
+])
+def test_load_fleet_rejects(tmp_path, text):
+    with pytest.raises(ValueError):
+        load_fleet(write_fleet(tmp_path, text))
+
+
+def test_unplugged_vehicles_do_not_hold_up_the_fleet(tmp_path, caplog):
+    links = load_fleet(write_fleet(tmp_path, '''
+links:
+  - {vehicle: quad1, port: /dev/ground-station-test-quad1}
+  - {vehicle: quad2, port: /dev/ground-station-test-quad2}
+'''))
+    stop_flag = Event()
+    stopping = Timer(2.0, stop_flag.set)
+
+    caplog.set_level(logging.INFO)
+    start = time.time()
+    stopping.start()
+
+    try:
+        run_fleet(links, stop_flag)
+    finally:
+        stopping.cancel()
+
+    started = [record for record in caplog.records if record.getMessage().startswith('Started ')]
+
+    assert [record.getMessage().split()[1] for record in started] == ['Receiver-quad1', 'Receiver-quad2']
+    assert all(record.created - start < 1.0 for record in started)  # not after waiting for the ports
@@ -0,0 +1,53 @@
+from mission.capture import CaptureWriter
+from mission.opcodes import opcode_to_hex
+from mission.packet import generate_packet
+from replay import ReplayConnection
+
+
+def test_replays_frames_in_order(tmp_path):
+    path = str(tmp_path / 'flight.cap')
+    frames = [bytes(generate_packet(opcode_to_hex['byte'], [i])) for i in range(3)]
+
+    with CaptureWriter(path) as writer:
+        for i, frame in enumerate(frames):
+            writer.write(frame, t=10.0 + i / 1000)
+
+    connection = ReplayConnection(path, speed=100.0, timeout=1.0)
+
+    assert connection.read(100) + connection.read(100) + connection.read(100) == b''.join(frames)
+    assert connection.exhausted
+
+    connection.close()
+
+
+def test_empty_capture_is_exhausted(tmp_path):
+    path = str(tmp_path / 'empty.cap')
+    CaptureWriter(path).close()
+
+    connection = ReplayConnection(path, speed=1.0, timeout=0.1)
+
+    assert connection.read(1) == b''
+    assert connection.in_waiting == 0
+    assert connection.exhausted
+
+    connection.close()
+
+
+def test_skips_frames_corrupted_since_recorded(tmp_path):
+    path = str(tmp_path / 'flight.cap')
+    frames = [bytes(generate_packet(opcode_to_hex['byte'], [i])) for i in range(3)]
+
+    with CaptureWriter(path) as writer:
+        for frame in frames:
+            writer.write(frame, t=10.0)
+
+    with open(path, 'r+b') as f:  # flip the data byte of the middle frame
+        data = f.read()
+        f.seek(data.index(frames[1]) + 3)
+        f.write(bytes([frames[1][3] ^ 1]))
+
+    connection = ReplayConnection(path, speed=None, timeout=0.1)
+
+    assert connection.read(100) == frames[0] + frames[2]
+
+    connection.close()
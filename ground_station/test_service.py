@@ -0,0 +1,87 @@
+from threading import Event, Thread
+import time
+
+from service import OnChange, Service, ServiceManager
+
+
+class Always(object):
+    """Event source that always has an event"""
+    def get(self, block=False):
+        return 1
+
+
+def test_triggers_do_not_starve_periodic_services():
+    steps = {'Controls': 0, 'Commands': 0}
+
+    def count(name):
+        def step(event):
+            steps[name] += 1
+
+            if name == 'Controls':
+                time.sleep(0.002)  # long enough for the next trigger to arrive while it runs
+
+        return step
+
+    services = [
+        Service('Controls', count('Controls'), Always(), 10, 1),
+        Service('Commands', count('Commands'), Always(), 20, 2),
+    ]
+    manager = ServiceManager(services, summary_interval=None)
+    stop = Event()
+
+    def trigger():
+        while not stop.is_set():
+            manager.trigger('Controls')
+            time.sleep(0.0005)
+
+    manager.start_all()
+    triggering = Thread(target=trigger)
+    triggering.start()
+    time.sleep(1.0)
+    stop.set()
+    triggering.join()
+    manager.shutdown(1)
+
+    assert steps['Controls'] > 20
+    assert 16 <= steps['Commands'] <= 22
+
+
+def test_restart_does_not_record_the_stopped_time_as_a_period():
+    service = Service('Commands', lambda event: None, Always(), 20, 1)
+    manager = ServiceManager([service], summary_interval=None)
+
+    manager.start('Commands')
+    time.sleep(0.2)
+    manager.stop('Commands')
+    time.sleep(0.3)
+    manager.start('Commands')
+    time.sleep(0.2)
+    manager.shutdown(1)
+
+    assert manager.stats()['Commands']['period']['max'] < 0.2
+
+
+def test_on_change_suppresses_unchanged_events_until_the_keepalive():
+    policy = OnChange(keepalive_frequency=2)
+    frame = bytearray(b'\x42\x04\x30\x32\x32\x32\x00\x00')  # FrameTemplate refills the same buffer
+
+    assert policy.should_send(frame, 10.0)
+    assert not policy.should_send(frame, 10.1)
+    assert not policy.should_send(frame, 10.49)
+    assert policy.should_send(frame, 10.5)  # keepalive
+
+    frame[3] = 0x33
+
+    assert policy.should_send(frame, 10.6)  # changed in place
+    assert not policy.should_send(frame, 10.7)
+
+
+def test_service_counts_sent_and_suppressed_events():
+    sent = []
+    service = Service('Controls', sent.append, Always(), 10, policy=OnChange(keepalive_frequency=0.001))
+
+    for _ in range(3):
+        service.step()
+
+    assert sent == [1]
+    assert service.stats() == {'sent': 1, 'suppressed': 2}
@@ -0,0 +1,49 @@
+from multiprocessing import Event
+import os
+import time
+
+from supervisor import Supervisor
+
+
+def crash():
+    os._exit(1)
+
+
+def finish(seconds):
+    time.sleep(seconds)
+
+
+def wait_for(stop_flag):
+    stop_flag.wait()
+
+
+def test_crashed_children_are_restarted_with_backoff():
+    stop_flag = Event()
+    supervisor = Supervisor(stop_flag, backoff=0.05, max_backoff=0.2, join_timeout=1.0)
+    supervisor.add('Crashing', crash)
+    supervisor.add('Finishing', finish, (0.8,))
+
+    supervisor.run()
+
+    crashing, finishing = supervisor._children
+
+    assert 3 <= crashing.restarts <= 6  # after 0.05, 0.1, 0.2, 0.2 ... s
+    assert crashing.backoff == 0.2
+    assert finishing.restarts == 0
+    assert stop_flag.is_set()
+
+
+def test_a_clean_exit_stops_every_child():
+    stop_flag = Event()
+    supervisor = Supervisor(stop_flag, backoff=0.05, join_timeout=5.0)
+    supervisor.add('Finishing', finish, (0.1,))
+    supervisor.add('Waiting', wait_for, (stop_flag,))
+    start = time.monotonic()
+
+    supervisor.run()
+
+    finishing, waiting = supervisor._children
+
+    assert time.monotonic() - start < 2.0
+    assert finishing.restarts == 0
+    assert waiting.process.exitcode == 0  # exited on the stop flag, not terminated
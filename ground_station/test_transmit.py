@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+from transmit import RateLimiter, Transmitter
+
+
+class Port(object):
+    baudrate = 1000  # 100 bytes per second
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append((time.monotonic(), bytes(data)))
+        return len(data)
+
+
+def test_rate_limiter_waits_for_room_in_the_buffer():
+    limiter = RateLimiter(rate=100.0, burst=10)
+    now = time.monotonic()
+
+    assert limiter.delay(10, now) == 0.0
+
+    limiter.consume(10, now)
+
+    assert limiter.delay(5, now) == pytest.approx(0.05)
+    assert limiter.delay(5, now + 0.02) == pytest.approx(0.03)
+    assert limiter.delay(5, now + 0.1) == 0.0
+
+
+def test_rate_limiter_spaces_frames():
+    limiter = RateLimiter(rate=100.0, burst=10, frame_interval=0.2)
+    now = time.monotonic()
+    limiter.consume(1, now)
+
+    assert limiter.delay(1, now + 0.05) == pytest.approx(0.15)
+
+
+def test_transmitter_writes_each_frame_once_at_the_vehicles_rate():
+    port = Port()
+    transmitter = Transmitter(port, rx_buffer_size=10)
+    frames = [bytes([0x42, 2, 7, i, 0xff]) * 2 for i in range(3)]  # 10 bytes, the vehicle's whole buffer
+
+    for frame in frames:
+        transmitter.send(frame)
+
+    assert [data for _, data in port.writes] == frames
+    assert port.writes[2][0] - port.writes[0][0] >= 0.19  # 10 bytes every 0.1 s once the buffer is full
+    assert transmitter.stats()['packets'] == 3
@@ -0,0 +1,47 @@
+import io
+import logging
+
+from utils import LogListener
+
+
+def queued_logger(name, listener):
+    log = logging.getLogger(name)
+    log.handlers = [listener.queue_handler]
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+
+    return log
+
+
+def test_records_are_routed_by_log_and_level(tmp_path):
+    listener = LogListener(flush_interval=60.0)  # only stop flushes
+    stream = io.StringIO()
+    path = tmp_path / 'logs' / 'receiver.log'
+
+    listener.route('test.receiver', listener.file_handler(str(path), '%(name)s %(message)s', None), logging.DEBUG)
+    listener.route('test.receiver', listener.stream_handler(stream, '%(message)s', None), logging.WARNING)
+    listener.route('test.commands', listener.stream_handler(stream, '%(message)s', None), logging.INFO)
+
+    receiver = queued_logger('test.receiver', listener)
+    commands = queued_logger('test.commands', listener)
+
+    listener.start()
+    receiver.debug('frame %d', 1)
+    receiver.warning('discarded %d bytes', 3)
+    commands.debug('not routed at debug')
+    commands.info('sent')
+    listener.stop()
+
+    assert path.read_text() == 'test.receiver frame 1\ntest.receiver discarded 3 bytes\n'
+    assert stream.getvalue() == 'discarded 3 bytes\nsent\n'
+    assert listener.stats()['records'] == 4
+
+
+def test_records_that_do_not_fit_are_dropped_and_counted():
+    listener = LogListener(queue_size=2)
+    log = queued_logger('test.dropping', listener)
+
+    for i in range(5):
+        log.info('record %d', i)
+
+    assert listener.stats()['dropped'] == 3
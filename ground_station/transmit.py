@@ -1,27 +1,129 @@
-from logging import getLogger
-import struct
+from logging import getLogger, DEBUG
+from threading import Lock
 import time
 
+BITS_PER_BYTE = 10  # start bit, 8 data bits & stop bit
+
+
+class RateLimiter(object):
+    """Token bucket for bytes headed to the vehicle
+
+    Models the vehicle's receive buffer: it holds up to burst bytes and drains at rate bytes per second. A write
+    waits only as long as it takes for the buffer to have room for it.
+    """
+    def __init__(self, rate, burst, frame_interval=0.0):
+        """
+        :param float rate: bytes per second the vehicle drains, at most the line rate
+        :param int burst: bytes the vehicle can buffer
+        :param float frame_interval: minimum seconds between the start of two writes
+        """
+        self.rate = rate
+        self.burst = burst
+        self.frame_interval = frame_interval
+
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._last_write = 0.0
+
+    def delay(self, size, now):
+        """Seconds to wait before size bytes can be written"""
+        tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        wait = max(0.0, min(size, self.burst) - tokens) / self.rate
+
+        return max(wait, self._last_write + self.frame_interval - now)
+
+    def consume(self, size, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate) - size
+        self._last = now
+        self._last_write = now
+
+    def wait(self, size):
+        """Block until size bytes can be written and take them from the bucket"""
+        delay = self.delay(size, time.monotonic())
+
+        if delay > 0:
+            time.sleep(delay)
+
+        self.consume(size, time.monotonic())
+
 
 class Transmitter(object):
-    def __init__(self, connection):
+    def __init__(self, connection, baudrate=None, rx_buffer_size=64, frame_interval=0.0, byte_delay=None):
+        """Transmitter
+
+        Writes each packet with one write() call. Pacing comes from a RateLimiter at the line rate sized to the
+        vehicle's receive buffer.
+
+        :param connection: serial type object that implements write()
+        :param int baudrate: line rate. Defaults to connection.baudrate. No pacing if neither is known
+        :param int rx_buffer_size: bytes the vehicle can buffer. None to only pace at the line rate
+        :param float frame_interval: minimum seconds between packets
+        :param float byte_delay: write one byte at a time with this many seconds between bytes instead
+        """
         # Initialize logger
         self.log = getLogger(self.__class__.__name__)
 
         # Save connection
         self.connection = connection
 
+        self.byte_delay = byte_delay
+        self._lock = Lock()
+        self._limiter = None
+
+        baudrate = baudrate or getattr(connection, 'baudrate', None)
+
+        if baudrate:
+            rate = baudrate / BITS_PER_BYTE
+            self._limiter = RateLimiter(rate, rx_buffer_size or rate, frame_interval)
+
+        # send latency stats, in seconds
+        self.packets = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_last = 0.0
+
     def send(self, packet):
-        for byte in packet:
-            if self.connection is not None:
-                self.log.info('Sending {}'.format(packet))
-                self.write(struct.pack('B', byte))
-                time.sleep(0.005)  # Delay so apm has time to receive byte
+        """Send a packet
+
+        :param packet: bytes type object or list of ints
+        """
+        if self.connection is None:
+            return
 
-    def write(self, byte):
+        start = time.perf_counter()
+        # written before send returns, so a reused frame doesn't need copying
+        data = packet if isinstance(packet, (bytes, bytearray)) else bytes(packet)
+
+        if self.log.isEnabledFor(DEBUG):  # not worth formatting every packet for a level that's off
+            self.log.debug('Sending {}'.format(list(data)))
+
+        with self._lock:
+            if self.byte_delay is not None:
+                for i in range(len(data)):
+                    self.write(data[i:i + 1])
+                    time.sleep(self.byte_delay)  # Delay so apm has time to receive byte
+            else:
+                if self._limiter is not None:
+                    self._limiter.wait(len(data))
+
+                self.write(data)
+
+        latency = time.perf_counter() - start
+        self.packets += 1
+        self.latency_total += latency
+        self.latency_last = latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def write(self, data):
         try:
-            self.connection.write(struct.pack('B', byte))
+            self.connection.write(data)
         except Exception:
             self.log.warning('Failed to write to connection')
 
-
+    def stats(self):
+        return {
+            'packets': self.packets,
+            'latency_mean': self.latency_total / self.packets if self.packets else 0.0,
+            'latency_max': self.latency_max,
+            'latency_last': self.latency_last,
+        }
@@ -1,14 +1,23 @@
-from errno import EPERM, EACCES
 import logging
 import logging.config
+from logging.handlers import QueueHandler
+from multiprocessing import Queue, Value
 from pathlib import Path
-import serial
+from queue import Empty, Full
 import sys
+from threading import Thread
 import time
 
+from connection import ConnectionManager
+
 LOGGING_FORMAT = '%(asctime)s %(levelname)-8s %(name)s: %(message)s'
 LOGGING_DATEFMT = '%H:%M:%S'
 
+NO_VEHICLE = '-'
+
+_vehicle = NO_VEHICLE
+_record_factory = logging.getLogRecordFactory()
+
 
 def configure_logging(verbosity):
     logging_config = {
@@ -47,49 +56,45 @@ def configure_logging(verbosity):
     logging.config.dictConfig(logging_config)
 
 
-def connect():
-    timeout = 0  # Seconds
-    start_time = time.time()
-    ports = ['/dev/ttyACM0', '/dev/ttyACM1', '/dev/ttyACM2', '/dev/ttyUSB0']
-    connection = None
+def _vehicle_record_factory(*args, **kwargs):
+    record = _record_factory(*args, **kwargs)
+    record.vehicle = _vehicle
+    return record
 
-    logging.info("Attempting to connect to device")
-    while connection is None:
-        if 0 < timeout < time.time() - start_time:
-            logging.error("Timed out connecting to device")
-            break
 
-        for port in ports:
-            try:
-                connection = serial.Serial(port=port,
-                                           baudrate=38400,
-                                           bytesize=serial.EIGHTBITS,
-                                           parity=serial.PARITY_NONE,
-                                           stopbits=serial.STOPBITS_ONE,
-                                           timeout=2)  # This timeout is for if the port actually exists
-            except Exception as e:
-                errno = e.errno if hasattr(e, 'errno') else None
-                # Check if the exception was due to permissions
-                if errno == EPERM or errno == EACCES:
-                    logging.error("Permissions denied to create serial connection")
-                    sys.exit(EPERM)
-            else:
-                logging.info("Connected on {}".format(port))
-                break
-
-    return connection
+def set_vehicle(vehicle):
+    """Tag every log record this process creates from now on with a vehicle ID, formatted with %(vehicle)s"""
+    global _vehicle
+    _vehicle = vehicle
+    logging.setLogRecordFactory(_vehicle_record_factory)
+
+
+def connect(timeout=None):
+    """Open the device's serial port, waiting up to timeout seconds for it. See connection.ConnectionManager"""
+    return ConnectionManager().open(timeout)
 
 
 def config_log(log_name, log_filename=None, file_fmt='%(asctime)8s %(levelname)7s: %(message)s',
                file_datefmt='%H:%M:%S', file_level=logging.DEBUG, log_stream=None,
                stream_fmt='%(asctime)8s %(levelname)7s: %(message)s', stream_datefmt='%H:%M:%S',
-               stream_level=logging.INFO):
+               stream_level=logging.INFO, listener=None):
 
     # Get log and set level to lowest level
     log = logging.getLogger(log_name)
     log.propagate = False  # don't propagate to root logger. not sure this is what we want but stops duplicate prints
     log.setLevel(logging.DEBUG)
 
+    # Queued logging. The listener owns the file & stream handlers, the log only enqueues records
+    if listener is not None:
+        if log_filename:
+            listener.route(log_name, listener.file_handler(log_filename, file_fmt, file_datefmt), file_level)
+
+        if log_stream:
+            listener.route(log_name, listener.stream_handler(log_stream, stream_fmt, stream_datefmt), stream_level)
+
+        log.addHandler(listener.queue_handler)
+        return log
+
     # Create file handler & add it to log
     if log_filename:
         if not Path(log_filename).parent.exists():
@@ -116,9 +121,23 @@ def config_log(log_name, log_filename=None, file_fmt='%(asctime)8s %(levelname)7
     return log
 
 
-def config_logs(logs):
+def config_logs(logs, queued=False, flush_interval=1.0, queue_size=10000, vehicles=False):
+    """Configure all logs
+
+    :param logs: iterable of config_log kwargs dicts, plus a log_ms key
+    :param bool queued: logs only enqueue records and a single LogListener does the formatting and writing
+    :param float flush_interval: seconds between flushes of the listener's files & streams
+    :param int queue_size: records the queue holds before new ones are dropped
+    :param bool vehicles: put the vehicle ID of each record's process in the log lines. See set_vehicle
+    :return: the started LogListener when queued, otherwise None
+    """
     max_name_length = 0
     log_ms = False
+    listener = LogListener(flush_interval, queue_size) if queued else None
+    vehicle = '%(vehicle)s ' if vehicles else ''
+
+    if vehicles:
+        set_vehicle(_vehicle)
 
     for log in logs:
         name = log['log_name']
@@ -130,14 +149,183 @@ def config_logs(logs):
 
         ms = '.%(msecs)3d' if log_ms else ''
 
-        file_fmt = '%(asctime)8s{ms} %(name){name_length}s: %(levelname)7s: %(message)s'.format(ms=ms,
-                                                                                                name_length=
-                                                                                                max_name_length)
+        file_fmt = '%(asctime)8s{ms} {vehicle}%(name){name_length}s: %(levelname)7s: %(message)s' \
+            .format(ms=ms, vehicle=vehicle, name_length=max_name_length)
 
-        stream_fmt = '%(asctime)8s{ms}: %(name){name_length}s %(levelname)7s: %(message)s'.format(ms=ms,
-                                                                                                  name_length=max_name_length)
+        stream_fmt = '%(asctime)8s{ms}: {vehicle}%(name){name_length}s %(levelname)7s: %(message)s' \
+            .format(ms=ms, vehicle=vehicle, name_length=max_name_length)
         datefmt = '%H:%M:%S'
 
         log.pop('log_ms', None)  # remove log_ms from log dict because config_log doesn't take a log_ms kwarg
 
-        config_log(**log, file_fmt=file_fmt, file_datefmt=datefmt, stream_fmt=stream_fmt, stream_datefmt=datefmt)
+        config_log(**log, file_fmt=file_fmt, file_datefmt=datefmt, stream_fmt=stream_fmt, stream_datefmt=datefmt,
+                   listener=listener)
+
+    if listener is not None:
+        listener.start()
+
+    return listener
+
+
+class BatchedFileHandler(logging.FileHandler):
+    """FileHandler that leaves flushing to the LogListener"""
+    def flush(self):
+        pass
+
+    def flush_now(self):
+        super().flush()
+
+
+class BatchedStreamHandler(logging.StreamHandler):
+    """StreamHandler that leaves flushing to the LogListener"""
+    def flush(self):
+        pass
+
+    def flush_now(self):
+        super().flush()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks. Records that don't fit in the queue are counted and dropped"""
+    def __init__(self, queue, dropped):
+        """
+        :param queue: multiprocessing.Queue shared with the LogListener
+        :param dropped: multiprocessing.Value counting dropped records across processes
+        """
+        super().__init__(queue)
+        self.dropped = dropped
+
+    def prepare(self, record):
+        # merge the args into the message so the record pickles. formatting is left to the listener
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+
+        if record.exc_info:
+            record.msg = '{}\n{}'.format(record.msg, logging.Formatter().formatException(record.exc_info))
+            record.exc_info = None
+
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            with self.dropped.get_lock():
+                self.dropped.value += 1
+
+
+class LogListener(object):
+    """Single consumer for queued logging
+
+    Records from every log, in every process forked after config_logs, come through one queue. The listener
+    routes them to one handler per file and per stream, and flushes those every flush_interval seconds instead of
+    after every record.
+    """
+    def __init__(self, flush_interval=1.0, queue_size=10000):
+        self.flush_interval = flush_interval
+        self.records = 0
+
+        self._queue = Queue(queue_size)
+        self._dropped = Value('L', 0)
+        self._routes = dict()  # log name -> [(handler, level), ...]
+        self._files = dict()
+        self._streams = dict()
+        self._thread = None
+
+        self.queue_handler = DroppingQueueHandler(self._queue, self._dropped)
+
+    def file_handler(self, log_filename, fmt, datefmt):
+        """Get the one handler for log_filename"""
+        key = str(Path(log_filename).resolve())
+
+        if key not in self._files:
+            if not Path(log_filename).parent.exists():
+                Path(log_filename).parent.mkdir()
+
+            self._files[key] = BatchedFileHandler(log_filename)
+
+        # logs are configured shortest name width first. the last format has the widest name column
+        self._files[key].setFormatter(logging.Formatter(fmt=fmt, datefmt=datefmt))
+        return self._files[key]
+
+    def stream_handler(self, stream, fmt, datefmt):
+        """Get the one handler for stream"""
+        if id(stream) not in self._streams:
+            self._streams[id(stream)] = BatchedStreamHandler(stream=stream)
+
+        self._streams[id(stream)].setFormatter(logging.Formatter(fmt=fmt, datefmt=datefmt))
+        return self._streams[id(stream)]
+
+    def route(self, log_name, handler, level):
+        self._routes.setdefault(log_name, []).append((handler, level))
+
+    @property
+    def handlers(self):
+        return list(self._files.values()) + list(self._streams.values())
+
+    def start(self):
+        self._thread = Thread(name='LogListener', target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Write out everything queued so far and close the files"""
+        if self._thread is None:
+            return
+
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+        for handler in self.handlers:
+            handler.flush_now()
+            handler.close()
+
+    def stats(self):
+        try:
+            depth = self._queue.qsize()
+        except NotImplementedError:  # macOS
+            depth = None
+
+        return {'queue_depth': depth, 'dropped': self._dropped.value, 'records': self.records}
+
+    def _handle(self, record):
+        self.records += 1
+
+        for handler, level in self._routes.get(record.name, ()):
+            if record.levelno >= level:
+                handler.handle(record)
+
+    def _flush(self):
+        for handler in self.handlers:
+            handler.flush_now()
+
+    def _run(self):
+        last_flush = time.monotonic()
+
+        while True:
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+            except Empty:
+                record = False
+
+            # drain everything that's already queued, flushing at most once per interval
+            while record is not False:
+                if record is None:
+                    self._flush()
+                    return
+
+                self._handle(record)
+
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    self._flush()
+                    last_flush = time.monotonic()
+
+                try:
+                    record = self._queue.get_nowait()
+                except Empty:
+                    record = False
+
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time.monotonic()